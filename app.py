@@ -1,8 +1,53 @@
-from flask import Flask, render_template, request, Response
-from scheduler import get_docks_from_db, get_inbounds_from_db, calculate_schedules, po_from_csv, docks_from_csv_to_db
+import atexit
+import json
+import os
+import time
+from datetime import datetime
+from flask import Flask, g, jsonify, render_template, request, Response, url_for
+from scheduler import get_inbounds_from_db, schedule_upload, po_from_csv, docks_from_csv_to_db, get_history_filters, \
+    iter_inbounds_from_db, get_scheduling_slots, get_slot_performances, get_utilisation, DocksMissingError
+from scenarios import STRATEGIES, run_scenarios
+from ingest import DATETIME_FORMAT, InvalidFileError, peek
+from utils import DBLockTimeoutError, DBWriteError
+from jobs import JobQueue
+from knapsack import SOLVER_BUDGET_SCOPE, SOLVER_TIME_BUDGET, SolverCache
+from run_output import OutputRun
+import metrics
 
 app = Flask(__name__)
 
+# Schedules of uploads sent to /jobs are calculated here in worker processes
+job_queue = JobQueue()
+atexit.register(job_queue.shutdown)
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+    if metrics.PROFILE_REQUESTS and request.headers.get("X-Profile"):
+        g.profiler = metrics.start_profile()
+
+
+@app.after_request
+def record_request(response):
+    """Request latency by endpoint. Streamed pages are timed until their first chunk is handed over."""
+    elapsed = time.perf_counter() - g.request_started
+    metrics.REQUEST_SECONDS.observe(
+        elapsed,
+        endpoint=request.endpoint or "unknown",
+        method=request.method,
+        status=response.status_code
+    )
+
+    profiler = g.pop('profiler', None)
+
+    if profiler is not None:
+        print("Profile of {} {}\n{}".format(request.method, request.path, metrics.profile_summary(profiler)))
+        response.headers['X-Profile-Seconds'] = "{:.6f}".format(elapsed)
+
+    return response
+
 
 def stream_template(template_name, ** context):
     """Streaming content and sending on the fly instead of storing in memory"""
@@ -18,29 +63,113 @@ def index():
     """PO upload front view"""
     results = []
     if request.method == "POST":
-        request_file = request.files['file'].read()
-        pos = po_from_csv(request_file)
-        docks = get_docks_from_db()
+        try:
+            pos = peek(po_from_csv(request.files['file']))
 
-        if len(list(set(['po_id', 'item_id', 'quantity']) & set(pos[0].keys()))) != 3:
-            data = {"message": "Invalid File uploaded", "status": 400}
-        elif not docks:
-            data = {"message": "Docks missing", "status": 400}
-        elif not pos:
-            data = {"message": "No POs in file", "status": 400}
-        else:
-            results = calculate_schedules(pos, docks)
-            if results:
-                data = {"message": "Done", "status": 200}
+            if not pos:
+                data = {"message": "No POs in file", "status": 400}
             else:
-                results = []
-                data = {"message": "Couldn't calculate schedules!", "status": 201}
+                # Same POs against the same docks as an earlier upload come back from the result cache
+                solver_cache = SolverCache()
+                output = OutputRun()
+                results, performances, rejected = schedule_upload(pos, solver_cache, output=output)
+                if results:
+                    data = {
+                        "message": "Done" + rejected_note(rejected) + cut_off_note(solver_cache) + files_note(output),
+                        "status": 200
+                    }
+                else:
+                    results = []
+                    data = {"message": "Couldn't calculate schedules!", "status": 201}
+        except InvalidFileError:
+            results = []
+            data = {"message": "Invalid File uploaded", "status": 400}
+        except DocksMissingError as e:
+            # Either no docks at all or no slot left which hasn't ended
+            results = []
+            data = {"message": str(e), "status": 400}
+        except DBLockTimeoutError:
+            results = []
+            data = {"message": "Another upload is still being scheduled, try again later", "status": 503}
+        except DBWriteError as e:
+            # The schedule (or a window of it) isn't booked, the next upload would take the same capacity
+            results = []
+            data = {"message": str(e), "status": 500}
 
         return Response(stream_template('index.html', results=results, error=0, data=data))
     else:
         return render_template('index.html', results=results, error=0)
 
 
+@app.route("/jobs", methods=["POST"])
+def submit_job():
+    """
+    Accepts a PO upload and calculates its schedules in the background.
+    :return: job id and where to poll for progress and results
+    """
+    po_file = job_queue.save_upload(request.files['file'])
+
+    try:
+        # Header and first row are checked right away, the rest is up to the worker
+        pos = po_from_csv(po_file)
+        first = next(pos, None)
+        pos.close()
+    except InvalidFileError:
+        first = None
+
+    if first is None:
+        os.remove(po_file)
+        return jsonify({"message": "Invalid File uploaded or no POs in file", "status": 400}), 400
+
+    job_id = job_queue.submit(po_file)
+
+    return jsonify({
+        "job_id": job_id,
+        "status_url": url_for('job_status', job_id=job_id),
+        "result_url": url_for('job_result', job_id=job_id)
+    }), 202
+
+
+@app.route("/jobs/<job_id>")
+def job_status(job_id):
+    """Progress of a job: slots processed out of total and POs placed so far"""
+    status = job_queue.status(job_id)
+
+    if status is None:
+        return jsonify({"message": "Unknown job", "status": 404}), 404
+
+    return jsonify(status)
+
+
+@app.route("/jobs/<job_id>/result")
+def job_result(job_id):
+    """Schedules of a finished job, rendered same as a direct PO upload"""
+    status = job_queue.status(job_id)
+
+    if status is None:
+        return jsonify({"message": "Unknown job", "status": 404}), 404
+    elif status['status'] in ("failed", "cancelled"):
+        return jsonify(status), 500
+    elif status['status'] != "done":
+        return jsonify(status), 202
+
+    result = job_queue.result(job_id)
+
+    # Results of old jobs are dropped, that can happen right after the status was read
+    if result is None:
+        return jsonify({"message": "Unknown job", "status": 404}), 404
+
+    results, performances, rejected = result
+
+    if results:
+        data = {"message": "Done" + rejected_note(rejected), "status": 200}
+    else:
+        results = []
+        data = {"message": "Couldn't calculate schedules!", "status": 201}
+
+    return Response(stream_template('index.html', results=results, error=0, data=data))
+
+
 @app.route("/upload_docks", methods=["GET", "POST"])
 def upload_docks():
     """
@@ -48,13 +177,17 @@ def upload_docks():
     :return:
     """
     if request.method == "POST":
-        request_file = request.files['file'].read()
-        docks = docks_from_csv_to_db(request_file)
-
-        if not docks:
-            data = {"message": "No Docks in file", "status": 400}
+        try:
+            docks = docks_from_csv_to_db(request.files['file'])
+        except InvalidFileError:
+            data = {"message": "Invalid File uploaded", "status": 400}
+        except DBWriteError:
+            data = {"message": "Couldn't save docks, nothing was saved", "status": 500}
         else:
-            data = {"message": "Done", "status": 200}
+            if not docks:
+                data = {"message": "No Docks in file", "status": 400}
+            else:
+                data = {"message": "Done", "status": 200}
 
         return Response(stream_template('docks_upload.html', error=0, data=data))
     else:
@@ -63,20 +196,24 @@ def upload_docks():
 
 @app.route("/history", methods=["GET", "POST"])
 def history():
-    results = get_inbounds_from_db()
-    dock_dates = list(set([i['slot_start_date'].date() for i in results]))
-    dock_ids = list(set([i['dock_id'] for i in results]))
-    selected_slot = None
-    selected_dock = None
+    """Inbound history, filtered by dock and slot date and read one page at a time"""
+    selected_slot = request.values.get('slot_date') or None
+    selected_dock = request.values.get('dock_id') or None
+    date_from = date_arg('date_from') or date_arg('slot_date')
+    date_to = date_arg('date_to') or date_arg('slot_date')
 
-    if request.method == "POST":
-        selected_slot = request.form.get('slot_date', None)
-        selected_dock = request.form.get('dock_id', None)
+    try:
+        results, next_page = get_inbounds_from_db(
+            dock_id=selected_dock,
+            date_from=date_from,
+            date_to=date_to,
+            after=request.values.get('after') or None
+        )
+    except ValueError:
+        # Cursor was tampered with or is from an older version, start from the first page
+        results, next_page = get_inbounds_from_db(dock_id=selected_dock, date_from=date_from, date_to=date_to)
 
-        results = [result for result in results
-                   if (not selected_dock or str(result['dock_id']) == selected_dock)
-                        and (not selected_slot or (selected_slot == str(result['slot_start_date'].date())
-                                           or selected_slot == str(result['slot_end_date'].date())))]
+    dock_dates, dock_ids = get_history_filters()
 
     return render_template(
         'history.html',
@@ -84,9 +221,276 @@ def history():
         dock_dates=dock_dates,
         dock_ids=dock_ids,
         selected_slot=selected_slot,
+        selected_dock=selected_dock,
+        next_page=next_page
+    )
+
+
+@app.route("/utilisation")
+def utilisation():
+    """Dock utilisation per dock and day between date_from and date_to, read from the summary table only"""
+    date_from = date_arg('date_from')
+    date_to = date_arg('date_to')
+    selected_dock = request.values.get('dock_id') or None
+    days, docks = get_utilisation(date_from=date_from, date_to=date_to, dock_id=selected_dock)
+
+    return render_template(
+        'utilisation.html',
+        days=days,
+        docks=docks,
+        date_from=date_from,
+        date_to=date_to,
         selected_dock=selected_dock
     )
 
 
+@app.route("/metrics")
+def metrics_view():
+    """Counters and histograms in Prometheus text format"""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+# JSON API. Big results are sent as NDJSON, one JSON object per line, written while they are read.
+
+# Lines sent to the client at once
+NDJSON_BATCH = 500
+
+
+@app.route("/api/docks", methods=["POST"])
+def api_upload_docks():
+    """Saves a dock calendar sent as a `file` form field or as the CSV request body"""
+    try:
+        saved = docks_from_csv_to_db(uploaded_file())
+    except InvalidFileError as e:
+        return api_error(str(e), 400)
+    except DBWriteError:
+        return api_error("Couldn't save docks, nothing was saved", 500)
+
+    if not saved:
+        return api_error("No Docks in file", 400)
+
+    return jsonify({"saved": saved, "status": 200})
+
+
+@app.route("/api/schedules", methods=["POST"])
+def api_schedules():
+    """
+    Schedules POs sent as a `file` form field or as the CSV request body. po_order and dock_choice arguments pick
+    another strategy, e.g. the best one from /api/scenarios. time_budget (seconds) and budget_scope (request or slot)
+    limit the time spent in the solver, cut off calls settle for the best fill found so far.
+    :return: NDJSON, {"type": "inbound", ...} for every inbounded item, {"type": "performance", ...} for every slot,
+    {"type": "rejected", ...} for every item no dock can ever take, a {"type": "solver", ...} with how many
+    solver calls finished optimally and how many were cut off and a last {"type": "run", ...} with the run id and
+    directory the CSV files and manifest were written to
+    """
+    try:
+        pos = peek(po_from_csv(uploaded_file()))
+
+        if not pos:
+            return api_error("No POs in file", 400)
+
+        solver_cache = SolverCache(
+            budget=float(request.args.get('time_budget', SOLVER_TIME_BUDGET)),
+            budget_scope=request.args.get('budget_scope', SOLVER_BUDGET_SCOPE)
+        )
+        output = OutputRun()
+        results, performances, rejected = schedule_upload(
+            pos,
+            solver_cache,
+            po_order=request.args.get('po_order', "arrival"),
+            dock_choice=request.args.get('dock_choice', "best_fit"),
+            output=output
+        )
+    except InvalidFileError as e:
+        return api_error(str(e), 400)
+    except DocksMissingError as e:
+        return api_error(str(e), 400)
+    except DBLockTimeoutError:
+        return api_error("Another upload is still being scheduled, try again later", 503)
+    except DBWriteError as e:
+        return api_error(str(e), 500)
+    except ValueError as e:
+        return api_error(str(e), 400)
+
+    return ndjson(schedule_records(
+        results, performances, rejected, solver_cache.info(), {"run_id": output.run_id, "path": output.path}
+    ))
+
+
+@app.route("/api/scenarios", methods=["POST"])
+def api_scenarios():
+    """
+    Schedules POs with every strategy against the current dock calendar without saving anything.
+    :return: comparison table, best strategy first
+    """
+    try:
+        pos = peek(po_from_csv(uploaded_file()))
+
+        if not pos:
+            return api_error("No POs in file", 400)
+
+        slots = get_scheduling_slots()
+
+        if not slots:
+            return api_error("Docks missing", 400)
+
+        return jsonify({"strategies": run_scenarios(pos, slots, STRATEGIES), "status": 200})
+    except InvalidFileError as e:
+        return api_error(str(e), 400)
+
+
+@app.route("/api/jobs/<job_id>/schedules")
+def api_job_schedules(job_id):
+    """Schedules of a finished background job, same NDJSON as /api/schedules"""
+    status = job_queue.status(job_id)
+
+    if status is None:
+        return api_error("Unknown job", 404)
+    elif status['status'] in ("failed", "cancelled"):
+        return jsonify(status), 500
+    elif status['status'] != "done":
+        return jsonify(status), 202
+
+    result = job_queue.result(job_id)
+
+    # Results of old jobs are dropped, that can happen right after the status was read
+    if result is None:
+        return api_error("Unknown job", 404)
+
+    return ndjson(schedule_records(*result))
+
+
+@app.route("/api/utilisation")
+def api_utilisation():
+    """
+    Dock utilisation between date_from and date_to (YYYY-MM-DD), optionally of one dock_id, from the summary tables.
+    :return: {"days": per dock and day, "docks": per dock over the range, "slots": slot performances}, utilisation
+    is quantity inbounded / capacity
+    """
+    date_from = date_arg('date_from')
+    date_to = date_arg('date_to')
+    days, docks = get_utilisation(date_from=date_from, date_to=date_to, dock_id=request.args.get('dock_id') or None)
+    slots = get_slot_performances(date_from=date_from, date_to=date_to, dock_group=request.args.get('dock_group'))
+
+    return Response(
+        json.dumps({"days": days, "docks": docks, "slots": slots, "status": 200}, default=json_value),
+        mimetype="application/json"
+    )
+
+
+@app.route("/api/history")
+def api_history():
+    """
+    Every inbound matching dock_id, date_from and date_to (YYYY-MM-DD), streamed from the db as NDJSON.
+    No paging, rows are read from a server side cursor while they are sent.
+    """
+    return ndjson(iter_inbounds_from_db(
+        dock_id=request.args.get('dock_id') or None,
+        date_from=date_arg('date_from'),
+        date_to=date_arg('date_to')
+    ))
+
+
+def uploaded_file():
+    """CSV upload of an API call, either the `file` form field or the request body itself"""
+    return request.files.get('file') or request.stream
+
+
+def api_error(message, status):
+    return jsonify({"message": message, "status": status}), status
+
+
+def schedule_records(results, performances, rejected=(), solver=None, run=None):
+    for row in results:
+        yield dict(row, type="inbound")
+
+    for row in performances:
+        yield dict(row, type="performance")
+
+    for row in rejected:
+        yield dict(row, type="rejected")
+
+    if solver is not None:
+        yield dict(solver, type="solver")
+
+    if run is not None:
+        yield dict(run, type="run")
+
+
+def rejected_note(rejected):
+    """
+    :param rejected: items no dock can ever take
+    :return: str | how many items were rejected, empty if none
+    """
+    if not rejected:
+        return ""
+
+    return " ({} items can't fit into any dock, see rejected_items.csv)".format(len(rejected))
+
+
+def files_note(output):
+    """
+    :param output: OutputRun the schedule was written to
+    :return: str | where the CSV files of the upload are
+    """
+    return " (files in {})".format(output.path)
+
+
+def cut_off_note(solver_cache):
+    """
+    :param solver_cache: SolverCache the schedule was calculated with
+    :return: str | how many solver calls the time budget cut off, empty if none
+    """
+    info = solver_cache.info()
+
+    if not info['cut_off']:
+        return ""
+
+    return " ({} of {} solver calls cut off by the time budget)".format(
+        info['cut_off'],
+        info['optimal'] + info['approximate'] + info['cut_off']
+    )
+
+
+def ndjson(rows):
+    """
+    :param rows: iterable of dicts, only read while the response is sent
+    :return: Response
+    """
+    def generate():
+        lines = []
+
+        for row in rows:
+            lines.append(json.dumps(row, default=json_value))
+
+            if len(lines) == NDJSON_BATCH:
+                yield "\n".join(lines) + "\n"
+                lines = []
+
+        if lines:
+            yield "\n".join(lines) + "\n"
+
+    return Response(generate(), mimetype="application/x-ndjson")
+
+
+def json_value(value):
+    """Values json doesn't know, like datetimes and dates from db rows"""
+    if isinstance(value, datetime):
+        return value.strftime(DATETIME_FORMAT)
+
+    return str(value)
+
+
+def date_arg(name):
+    """
+    :param name: request argument holding a YYYY-MM-DD date
+    :return: date or None if missing or invalid
+    """
+    try:
+        return datetime.strptime(request.values.get(name, ''), '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+
 if __name__ == "__main__":
     app.run(threaded=True, host='0.0.0.0', port=8080, debug=True)
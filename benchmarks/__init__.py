@@ -0,0 +1 @@
+"""Benchmarks for the scheduler. Run them as modules, e.g. python -m benchmarks.memory"""
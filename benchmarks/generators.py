@@ -0,0 +1,198 @@
+"""
+Seeded generators for PO files and dock slot calendars. Same seed and settings always give the same rows,
+so benchmark runs on different commits schedule exactly the same input.
+    python -m benchmarks.generators --pos 1000 --docks 20 --days 7 --po-file pos.csv --dock-file docks.csv
+"""
+import argparse
+import csv
+import random
+from datetime import datetime, timedelta
+
+from ingest import DOCK_COLUMNS, DOCK_GROUP_COLUMN, PO_COLUMNS
+
+# How item quantities are spread. Values are drawn between 1 and max_quantity.
+QUANTITY_DISTRIBUTIONS = ("uniform", "normal", "lognormal")
+
+# First slot of every generated calendar
+CALENDAR_START = datetime(2018, 8, 1)
+
+
+def quantity(rand, distribution, max_quantity):
+    """
+    :param rand: random.Random
+    :param distribution: one of QUANTITY_DISTRIBUTIONS
+    :param max_quantity: int
+    :return: int between 1 and max_quantity
+    """
+    if distribution == "uniform":
+        value = rand.randint(1, max_quantity)
+    elif distribution == "normal":
+        # Most items around a quarter of the biggest quantity
+        value = round(rand.gauss(max_quantity / 4, max_quantity / 8))
+    elif distribution == "lognormal":
+        # Lots of small items and a few very big ones
+        value = round(rand.lognormvariate(0, 1) * max_quantity / 10)
+    else:
+        raise ValueError("Unknown quantity distribution {}".format(distribution))
+
+    return min(max(value, 1), max_quantity)
+
+
+def po_rows(pos=1000, lines=(1, 20), distribution="uniform", max_quantity=500, distinct_items=5000,
+            invalid_fraction=0.01, groups=1, seed=0):
+    """
+    PO rows the way ingest yields them.
+    :param pos: int | number of POs
+    :param lines: tuple | least and most items per PO
+    :param distribution: one of QUANTITY_DISTRIBUTIONS
+    :param max_quantity: int | biggest regular item quantity
+    :param distinct_items: int | item ids are picked from this many
+    :param invalid_fraction: float | share of items with no quantity or too big for any dock
+    :param groups: int | dock groups the POs are spread over, round robin. 1 leaves dock_group out.
+    :param seed: int
+    :return: generator of dicts with po_id, item_id and quantity (and dock_group)
+    """
+    rand = random.Random(seed)
+
+    for po in range(pos):
+        for line in range(rand.randint(*lines)):
+            if rand.random() < invalid_fraction:
+                item_quantity = rand.choice((0, max_quantity * 100))
+            else:
+                item_quantity = quantity(rand, distribution, max_quantity)
+
+            row = {
+                "po_id": str(1000 + po),
+                "item_id": str(rand.randrange(distinct_items)),
+                "quantity": item_quantity
+            }
+
+            if groups > 1:
+                row['dock_group'] = "G{}".format(po % groups)
+
+            yield row
+
+
+def dock_rows(docks=20, slots_per_day=24, days=7, capacity=(1, 1000), missing_fraction=0.1, closed_fraction=0,
+              groups=1, seed=0):
+    """
+    Dock slot rows the way they come from the dock_slots table.
+    :param docks: int | number of docks
+    :param slots_per_day: int | slots of equal length every day
+    :param days: int | horizon of the calendar
+    :param capacity: tuple | least and most capacity of a dock in a slot
+    :param missing_fraction: float | share of dock slots left out, e.g. a closed dock
+    :param closed_fraction: float | share of slots where every dock has capacity 0, e.g. maintenance
+    :param groups: int | dock groups the docks are spread over, round robin. 1 leaves dock_group out.
+    :param seed: int
+    :return: generator of dicts with dock_id, slot_start_date, slot_end_date and capacity
+    """
+    rand = random.Random(seed)
+    slot_length = timedelta(days=1) / slots_per_day
+
+    for slot in range(slots_per_day * days):
+        slot_start = CALENDAR_START + slot * slot_length
+
+        # Random numbers are only drawn for this if asked, so calendars without closed slots stay the same
+        closed = closed_fraction and rand.random() < closed_fraction
+
+        for dock in range(docks):
+            if rand.random() < missing_fraction:
+                continue
+
+            row = {
+                "dock_id": str(dock + 1),
+                "slot_start_date": slot_start,
+                "slot_end_date": slot_start + slot_length,
+                "capacity": 0 if closed else rand.randint(*capacity)
+            }
+
+            if groups > 1:
+                row['dock_group'] = "G{}".format(dock % groups)
+
+            yield row
+
+
+def write_po_file(rows, file):
+    """
+    Writes PO rows as an upload file
+    :param rows: iterable of po_rows
+    :param file: str path
+    """
+    with open(file, 'w', newline='') as f:
+        writer = csv.DictWriter(f, PO_COLUMNS + (DOCK_GROUP_COLUMN,))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def write_dock_file(rows, file):
+    """
+    Writes dock slot rows as an /upload_docks file
+    :param rows: iterable of dock_rows
+    :param file: str path
+    """
+    with open(file, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(DOCK_COLUMNS + (DOCK_GROUP_COLUMN,))
+
+        for row in rows:
+            writer.writerow([
+                row['dock_id'],
+                row['slot_start_date'].isoformat(),
+                row['slot_end_date'].isoformat(),
+                row['capacity'],
+                row.get('dock_group', "")
+            ])
+
+
+def add_arguments(parser):
+    """Generator settings shared by all benchmarks"""
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--pos", type=int, default=1000, help="number of POs")
+    parser.add_argument("--min-lines", type=int, default=1, help="least items per PO")
+    parser.add_argument("--max-lines", type=int, default=20, help="most items per PO")
+    parser.add_argument("--distribution", choices=QUANTITY_DISTRIBUTIONS, default="uniform")
+    parser.add_argument("--max-quantity", type=int, default=500)
+    parser.add_argument("--docks", type=int, default=20, help="number of docks")
+    parser.add_argument("--slots-per-day", type=int, default=24)
+    parser.add_argument("--days", type=int, default=7, help="calendar horizon")
+    parser.add_argument("--max-capacity", type=int, default=1000, help="most capacity of a dock in a slot")
+    parser.add_argument("--closed-fraction", type=float, default=0, help="share of slots with every dock closed")
+    parser.add_argument("--dock-groups", type=int, default=1, help="buildings docks and POs are spread over")
+
+
+def generate(args):
+    """
+    :param args: parsed arguments from add_arguments
+    :return: po rows, dock rows
+    """
+    pos = po_rows(
+        args.pos,
+        (args.min_lines, args.max_lines),
+        args.distribution,
+        args.max_quantity,
+        groups=args.dock_groups,
+        seed=args.seed
+    )
+    docks = dock_rows(
+        args.docks,
+        args.slots_per_day,
+        args.days,
+        (1, args.max_capacity),
+        closed_fraction=args.closed_fraction,
+        groups=args.dock_groups,
+        seed=args.seed
+    )
+    return pos, docks
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_arguments(parser)
+    parser.add_argument("--po-file", default="pos.csv")
+    parser.add_argument("--dock-file", default="docks.csv")
+    args = parser.parse_args()
+
+    pos, docks = generate(args)
+    write_po_file(pos, args.po_file)
+    write_dock_file(docks, args.dock_file)
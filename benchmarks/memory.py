@@ -0,0 +1,105 @@
+"""
+Memory footprint of PO items and dock slots, before and after the compact representations.
+    python -m benchmarks.memory --items 1000000 --slots 100000
+"""
+import argparse
+import json
+import random
+import tracemalloc
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from models import Interner
+from scheduler import arrange_pos, arrange_slots
+
+
+def po_rows(items, items_per_po=20, distinct_items=50000, seed=0):
+    """PO rows the way ingest yields them. Every row gets its own strings, same as csv.DictReader gives them."""
+    rand = random.Random(seed)
+
+    for n in range(items):
+        yield {
+            "po_id": str(n // items_per_po),
+            "item_id": str(rand.randrange(distinct_items)),
+            "quantity": rand.randint(1, 500)
+        }
+
+
+def slot_rows(slots, docks=100, seed=0):
+    rand = random.Random(seed)
+    start = datetime(2018, 8, 1)
+
+    for n in range(slots):
+        slot_start = start + timedelta(hours=n // docks)
+        yield {
+            "dock_id": n % docks,
+            "slot_start_date": slot_start,
+            "slot_end_date": slot_start + timedelta(hours=1),
+            "capacity": rand.randint(0, 1000)
+        }
+
+
+def legacy_arrange_pos(pos):
+    """How POs were held before: a dict per item in a plain list per PO"""
+    arranged_pos = defaultdict(list)
+
+    for po in pos:
+        arranged_pos[po['po_id']].append({"item_id": po['item_id'], "quantity": int(po['quantity'])})
+
+    return dict(arranged_pos)
+
+
+def legacy_arrange_slots(slots):
+    """How slots were held before: every slot row copied into a new dict with its max capacity"""
+    slots = list(slots)
+    arranged_slots = defaultdict(list)
+    dock_max_capacities = {}
+
+    for slot in slots:
+        dock_max_capacities[slot['dock_id']] = max(dock_max_capacities.get(slot['dock_id'], 0), slot['capacity'])
+
+    for slot in slots:
+        arranged_slots["{}:{}".format(slot['slot_start_date'], slot['slot_end_date'])].append({
+            **slot,
+            'max_capacity': dock_max_capacities[slot['dock_id']]
+        })
+
+    return sorted(arranged_slots.items())
+
+
+def measure(build, rows):
+    """
+    :return: bytes still allocated by what build returned
+    """
+    tracemalloc.start()
+    result = build(rows)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def run(items, slots):
+    results = {
+        "items": items,
+        "slots": slots,
+        "po_items_before": measure(legacy_arrange_pos, po_rows(items)),
+        "po_items_after": measure(lambda rows: arrange_pos(rows, Interner()), po_rows(items)),
+        "slots_before": measure(legacy_arrange_slots, slot_rows(slots)),
+        "slots_after": measure(arrange_slots, slot_rows(slots)),
+    }
+
+    for name, count in (("po_items", items), ("slots", slots)):
+        for when in ("before", "after"):
+            results["{}_{}_per_row".format(name, when)] = round(results["{}_{}".format(name, when)] / count, 1)
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=200000)
+    parser.add_argument("--slots", type=int, default=50000)
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.items, args.slots), indent=2))
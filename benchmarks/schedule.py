@@ -0,0 +1,159 @@
+"""
+Times every stage of calculate_schedules on generated POs and dock slots, without a database.
+Prints JSON so runs on different commits can be compared.
+    python -m benchmarks.schedule --pos 2000 --docks 30 --days 14 --engine numpy --output before.json
+"""
+import argparse
+import json
+import platform
+import resource
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.generators import add_arguments, generate
+from benchmarks.stub_db import StubDB
+from knapsack import SolverCache
+from models import Interner
+from scenarios import mean_performance
+from run_output import OutputRun
+from scheduler import (ENGINES, SHARD_WORKERS, arrange_pos, get_scheduling_slots, remove_invalid_items, save_inbound_to_db,
+                       schedule_shards, write_outputs)
+
+
+def run_stages(po_rows, db, engine="python", output_dir=None, workers=SHARD_WORKERS):
+    """
+    Runs the same steps as calculate_schedules one by one and times them.
+    :param po_rows: list of PO rows
+    :param db: StubDB with the dock slots
+    :param engine: one of scheduler.ENGINES
+    :param output_dir: str | where the run directory with the CSV files goes, a temporary directory if not given
+    :param workers: int | processes scheduling dock groups side by side. Per slot times are then per dock group.
+    :return: dict | seconds per stage, per slot solve times, mean performance and counts
+    """
+    timings = {}
+    solver_cache = SolverCache()
+
+    with db.installed():
+        started = time.perf_counter()
+        item_ids = Interner()
+        pos = arrange_pos(po_rows, item_ids)
+        slots = get_scheduling_slots(incremental=False)
+        timings['arrange'] = time.perf_counter() - started
+
+        # Engines filter again when they start, which costs next to nothing once invalid items are gone
+        started = time.perf_counter()
+        rejected = remove_invalid_items(pos, slots, item_ids)
+        timings['filter'] = time.perf_counter() - started
+
+        slot_times = []
+        last = [time.perf_counter()]
+
+        def progress(slots_done, slots_total, pos_placed):
+            now = time.perf_counter()
+            slot_times.append(now - last[0])
+            last[0] = now
+
+        started = time.perf_counter()
+        solver_cache.start_budget()
+
+        outputs, performances = schedule_shards(pos, slots, item_ids, solver_cache, engine, progress, workers=workers)
+
+        timings['solve'] = time.perf_counter() - started
+
+        with tempfile.TemporaryDirectory() as tmp:
+            directory = output_dir or tmp
+            started = time.perf_counter()
+
+            with OutputRun(directory) as output:
+                write_outputs(output, outputs, performances, rejected)
+
+            save_inbound_to_db(outputs, performances)
+            timings['output'] = time.perf_counter() - started
+
+    timings['total'] = sum(timings.values())
+
+    return {
+        "seconds": {stage: round(seconds, 6) for stage, seconds in timings.items()},
+        "slot_solve_seconds": {
+            "mean": round(statistics.mean(slot_times), 6) if slot_times else 0,
+            "median": round(statistics.median(slot_times), 6) if slot_times else 0,
+            "max": round(max(slot_times, default=0), 6),
+        },
+        "mean_performance": mean_performance(performances),
+        "slots": len(slots),
+        "pos": len(pos),
+        "items_inbounded": len(outputs),
+        "items_rejected": len(rejected),
+        "rows_written": dict(db.rows_written),
+        "solver_cache": solver_cache.info(),
+    }
+
+
+def peak_memory(po_rows, dock_slots, engine="python"):
+    """
+    Runs the stages again under tracemalloc, it slows everything down so timings come from a separate run
+    :return: int | most bytes allocated at once
+    """
+    tracemalloc.start()
+
+    try:
+        run_stages(po_rows, StubDB(dock_slots), engine)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    po_rows, dock_slots = generate(args)
+    po_rows, dock_slots = list(po_rows), list(dock_slots)
+
+    runs = [run_stages(po_rows, StubDB(dock_slots), args.engine, workers=args.workers) for n in range(args.repeat)]
+
+    # Fastest run per stage, the others only had more noise
+    best = min(runs, key=lambda result: result['seconds']['total'])
+
+    results = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "settings": vars(args),
+        "po_rows": len(po_rows),
+        "dock_slots": len(dock_slots),
+        **best,
+        "seconds_per_run": [result['seconds']['total'] for result in runs],
+        "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+    if args.memory:
+        results['peak_traced_bytes'] = peak_memory(po_rows, dock_slots, args.engine)
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_arguments(parser)
+    parser.add_argument("--engine", choices=ENGINES, default="python")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs, the fastest one is reported")
+    parser.add_argument("--workers", type=int, default=SHARD_WORKERS, help="processes for dock groups")
+    parser.add_argument("--no-memory", dest="memory", action="store_false", help="skip the tracemalloc run")
+    parser.add_argument("--output", help="also write the JSON to this file")
+    args = parser.parse_args()
+
+    results = json.dumps(run(args), indent=2)
+    print(results)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(results + "\n")
@@ -0,0 +1,205 @@
+"""Reads uploaded CSV files row by row so big uploads never sit in memory as a whole"""
+import csv
+import io
+from datetime import datetime, timedelta, timezone
+from itertools import chain, islice
+
+PO_COLUMNS = ('po_id', 'item_id', 'quantity')
+DOCK_COLUMNS = ('dock_id', 'slot_start_dt', 'slot_end_dt', 'capacity')
+
+# Optional column of both files. POs are only scheduled into docks of the same group, e.g. the same building.
+# Without it everything is one group.
+DOCK_GROUP_COLUMN = 'dock_group'
+
+# Rows handed over to the DB writer at once
+CHUNK_SIZE = 5000
+
+# Slot times are scheduled as integer seconds since EPOCH and only formatted back for files, db and pages.
+# Times without timezone are taken as they are, like the db stores them.
+EPOCH = datetime(1970, 1, 1)
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+class InvalidFileError(ValueError):
+    """Uploaded file is not a CSV with the columns we need"""
+
+
+def open_text(file):
+    """
+    Opens whatever we've got as a text stream.
+    :param file: str path, bytes content or binary file like object (FileStorage, request stream)
+    :return: text file object
+    """
+    if isinstance(file, str):
+        return open(file, newline='', encoding='utf-8')
+    elif isinstance(file, bytes):
+        return io.StringIO(file.decode('utf-8'), newline='')
+
+    stream = getattr(file, 'stream', file)
+    return io.TextIOWrapper(stream, encoding='utf-8', newline='')
+
+
+def read_csv(file, columns, convert):
+    """
+    Checks the header straight away and returns a generator of converted rows. Nothing else is read
+    until the generator is consumed.
+    :param file: str path, bytes content or binary file like object
+    :param columns: columns the file must have
+    :param convert: function turning a csv row dict into the row we want
+    :return: generator of rows
+    """
+    try:
+        text = open_text(file)
+    except OSError:
+        raise InvalidFileError("File could not be read")
+    except UnicodeDecodeError:
+        raise InvalidFileError("File is not utf-8 encoded")
+
+    reader = csv.DictReader(text)
+
+    try:
+        header = reader.fieldnames or []
+    except UnicodeDecodeError:
+        raise InvalidFileError("File is not utf-8 encoded")
+    except csv.Error as e:
+        raise InvalidFileError("Invalid CSV header: {}".format(e))
+
+    missing = set(columns) - set(header)
+
+    if missing:
+        text.close()
+        raise InvalidFileError("Missing columns: {}".format(", ".join(sorted(missing))))
+
+    return _convert_rows(text, reader, convert)
+
+
+def _convert_rows(text, reader, convert):
+    with text:
+        rows = iter(reader)
+
+        while True:
+            # Bytes are decoded and lines split as rows are read, so a bad file may only show far into it
+            try:
+                row = next(rows, None)
+            except UnicodeDecodeError:
+                raise InvalidFileError("File is not utf-8 encoded, after line {}".format(reader.line_num))
+            except csv.Error as e:
+                raise InvalidFileError("Invalid CSV on line {}: {}".format(reader.line_num, e))
+
+            if row is None:
+                return
+
+            try:
+                converted = convert(row)
+            except (ValueError, TypeError, AttributeError):
+                raise InvalidFileError("Invalid value on line {}".format(reader.line_num))
+
+            yield converted
+
+
+def po_row(row):
+    return {
+        "po_id": row['po_id'],
+        "item_id": row['item_id'],
+        "quantity": int(row['quantity']),
+        "dock_group": dock_group(row)
+    }
+
+
+def dock_row(row):
+    """Dock rows are named the same as in dock_slots table so they can be scheduled directly"""
+    return {
+        "dock_id": row['dock_id'],
+        "slot_start_date": parse_datetime(row['slot_start_dt']),
+        "slot_end_date": parse_datetime(row['slot_end_dt']),
+        "capacity": int(row['capacity']),
+        "dock_group": dock_group(row)
+    }
+
+
+def dock_group(row):
+    """
+    :param row: csv or db row
+    :return: str | dock group of the row, empty if it has none
+    """
+    return (row.get(DOCK_GROUP_COLUMN) or "").strip()
+
+
+def parse_datetime(value):
+    """
+    :param value: str like 2018-08-01T00:00:00 or 2018-08-01 00:00:00
+    :return: datetime
+    """
+    return datetime.fromisoformat(value.strip())
+
+
+def to_epoch(value):
+    """
+    :param value: datetime, str like 2018-08-01T00:00:00 or already an int epoch
+    :return: int | seconds since EPOCH
+    """
+    if isinstance(value, int):
+        return value
+    elif isinstance(value, str):
+        value = parse_datetime(value)
+
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+
+    return (value - EPOCH) // timedelta(seconds=1)
+
+
+def format_epoch(epoch):
+    """
+    :param epoch: int seconds since EPOCH
+    :return: str like 2018-08-01 00:00:00
+    """
+    return (EPOCH + timedelta(seconds=epoch)).strftime(DATETIME_FORMAT)
+
+
+def read_pos(file):
+    """
+    :param file: str path, bytes content or binary file like object
+    :return: generator of PO item rows with int quantity
+    """
+    return read_csv(file, PO_COLUMNS, po_row)
+
+
+def read_docks(file):
+    """
+    :param file: str path, bytes content or binary file like object
+    :return: generator of dock slot rows with parsed dates and int capacity
+    """
+    return read_csv(file, DOCK_COLUMNS, dock_row)
+
+
+def chunks(rows, size=CHUNK_SIZE):
+    """
+    Splits an iterable into lists of at most size rows
+    :param rows: iterable
+    :param size: int
+    :return: generator of lists
+    """
+    rows = iter(rows)
+
+    while True:
+        chunk = list(islice(rows, size))
+
+        if not chunk:
+            return
+
+        yield chunk
+
+
+def peek(rows):
+    """
+    Checks whether an iterable has anything in it without losing the first row.
+    :param rows: iterable
+    :return: None if it is empty, otherwise an iterator giving all rows
+    """
+    rows = iter(rows)
+
+    for first in rows:
+        return chain([first], rows)
+
+    return None
@@ -0,0 +1,168 @@
+"""Runs schedule calculations in a local process pool so uploads don't have to wait for them"""
+import multiprocessing
+import os
+import tempfile
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from threading import Lock
+
+# Schedule calculations running at the same time
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+
+# Finished jobs are forgotten after this many seconds
+JOB_RESULTS_TTL = int(os.environ.get("JOB_RESULTS_TTL", "3600"))
+
+
+def run_schedule_job(po_file, progress):
+    """
+    Worker side of a job. Reads the saved PO upload, calculates schedules and removes the upload again.
+    :param po_file: str path of the saved PO file
+    :param progress: shared dict the web process reads progress from
+    :return: inbound results, slot performances, rejected items
+    """
+    # Imported in the worker so the web process doesn't need a db connection for this
+    from knapsack import SolverCache
+    from run_output import OutputRun
+    from scheduler import po_from_csv, schedule_upload
+
+    def report(slots_done, slots_total, pos_placed):
+        progress.update(slots_done=slots_done, slots_total=slots_total, pos_placed=pos_placed)
+
+    solver_cache = SolverCache()
+
+    # Where the CSV files of the job are written is known before it starts
+    output = OutputRun()
+    progress.update(run_id=output.run_id, output_path=output.path)
+
+    try:
+        progress['status'] = "running"
+        result = schedule_upload(po_from_csv(po_file), solver_cache, progress=report, output=output)
+
+        # Solver calls which finished optimally and which the time budget cut off show up in the job status
+        info = solver_cache.info()
+        progress.update(solver_optimal=info['optimal'], solver_cut_off=info['cut_off'])
+        return result
+    finally:
+        os.remove(po_file)
+
+
+class JobQueue:
+    """
+    Keeps track of submitted schedule jobs. Workers are separate processes (spawned, not forked, as the web
+    process runs threads) and report progress through a manager dict.
+    """
+
+    def __init__(self, workers=JOB_WORKERS):
+        self.workers = workers
+        self._executor = None
+        self._manager = None
+        self._jobs = {}
+        self._lock = Lock()
+
+    def _start(self):
+        if self._executor is None:
+            context = multiprocessing.get_context("spawn")
+            self._manager = context.Manager()
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+
+    def save_upload(self, file):
+        """
+        Saves an uploaded file where the workers can read it from.
+        :param file: FileStorage obj
+        :return: str path of the saved file
+        """
+        fd, path = tempfile.mkstemp(prefix="po_upload_", suffix=".csv")
+
+        with os.fdopen(fd, 'wb') as f:
+            file.save(f)
+
+        return path
+
+    def submit(self, po_file):
+        """
+        Queues a schedule calculation for a saved PO file. The job owns the file from now on.
+        :param po_file: str path from save_upload
+        :return: str job id
+        """
+        job_id = uuid.uuid4().hex
+
+        with self._lock:
+            self._start()
+            self._forget_old_jobs()
+
+            progress = self._manager.dict(status="queued", slots_done=0, slots_total=0, pos_placed=0)
+            self._jobs[job_id] = {
+                "future": self._executor.submit(run_schedule_job, po_file, progress),
+                "progress": progress,
+                "finished": None,
+            }
+
+        return job_id
+
+    def status(self, job_id):
+        """
+        :param job_id: str
+        :return: dict with status (queued, running, done, failed, cancelled) and progress, None for unknown jobs
+        """
+        job = self._jobs.get(job_id)
+
+        if job is None:
+            return None
+
+        status = dict(job['progress'])
+        status['job_id'] = job_id
+        future = job['future']
+
+        if future.done():
+            if job['finished'] is None:
+                job['finished'] = time.monotonic()
+
+            # A job still queued when the queue shut down never ran, exception() would raise for it
+            if future.cancelled():
+                status['status'] = "cancelled"
+                return status
+
+            error = future.exception()
+            status['status'] = "failed" if error else "done"
+
+            if error:
+                status['error'] = str(error)
+
+        return status
+
+    def result(self, job_id):
+        """
+        :param job_id: str
+        :return: inbound results, slot performances and rejected items of a finished job, None if it is unknown, not
+        finished, failed or cancelled
+        """
+        job = self._jobs.get(job_id)
+
+        if job is None:
+            return None
+
+        future = job['future']
+
+        if not future.done() or future.cancelled() or future.exception():
+            return None
+
+        return future.result()
+
+    def _forget_old_jobs(self):
+        now = time.monotonic()
+
+        for job_id, job in list(self._jobs.items()):
+            if job['future'].done() and job['finished'] is None:
+                job['finished'] = now
+
+            if job['finished'] is not None and now - job['finished'] > JOB_RESULTS_TTL:
+                del self._jobs[job_id]
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._manager.shutdown()
+                self._executor = None
+                self._manager = None
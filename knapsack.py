@@ -0,0 +1,381 @@
+"""Subset-sum / 0-1 knapsack solver used to decide which items of a PO go into a dock"""
+import os
+import time
+from collections import OrderedDict
+from threading import Lock
+
+# Above this many (capacity x item) cells we don't run the exact DP anymore and approximate instead, see
+# SOLVER_EPSILON.
+EXACT_SOLVER_LIMIT = 2000000
+
+# Problems above EXACT_SOLVER_LIMIT are filled to at least (1 - SOLVER_EPSILON) of the best possible fill
+SOLVER_EPSILON = float(os.environ.get("SOLVER_EPSILON", "0.01"))
+
+# How many (items, capacity) results a SolverCache keeps before dropping the least recently used ones.
+SOLVER_CACHE_SIZE = 4096
+
+# Seconds the solver may spend on one schedule calculation (or on every slot, see SOLVER_BUDGET_SCOPE) before it
+# settles for the best fill found so far. 0 lets every call run to the end.
+SOLVER_TIME_BUDGET = float(os.environ.get("SOLVER_TIME_BUDGET", "0"))
+
+# "request" for one budget for the whole calculation, "slot" for a fresh budget in every slot
+SOLVER_BUDGET_SCOPES = ("request", "slot")
+SOLVER_BUDGET_SCOPE = os.environ.get("SOLVER_BUDGET_SCOPE", "request")
+
+# How a solver call ended: best possible fill, fill within SOLVER_EPSILON of it or best fill found before the deadline
+OPTIMAL = "optimal"
+APPROXIMATE = "approximate"
+CUT_OFF = "cut_off"
+
+
+def solve(quantities, capacity, deadline=None):
+    """
+    Picks the subset of quantities with the biggest sum which still fits in capacity.
+    Runs an exact bitset DP over the capacity when the problem is small enough, otherwise an approximation which
+    fills at least (1 - SOLVER_EPSILON) of the best fill (see _solve_trimmed).
+    :param quantities: list of integer quantities
+    :param capacity: Integer capacity of the dock
+    :param deadline: time.perf_counter() value to stop at with the best fill found so far, None to run to the end
+    :return: list | ascending indexes of the chosen quantities
+    """
+    return solve_anytime(quantities, capacity, deadline)[0]
+
+
+def solve_anytime(quantities, capacity, deadline=None):
+    """
+    solve() which also tells how the result was found.
+    With a deadline a greedy fill is made first. If it already fills the dock completely nothing else runs,
+    otherwise the DP tries to beat it until the deadline.
+    :param quantities: list of integer quantities
+    :param capacity: Integer capacity of the dock
+    :param deadline: time.perf_counter() value to stop at, None to run to the end
+    :return: list of ascending indexes of the chosen quantities, OPTIMAL, APPROXIMATE or CUT_OFF
+    """
+    if capacity <= 0:
+        return [], OPTIMAL
+
+    # Items with no quantity or which can never fit are not part of the problem at all
+    candidates = [i for i, quantity in enumerate(quantities) if 0 < quantity <= capacity]
+
+    if not candidates:
+        return [], OPTIMAL
+
+    # Everything fits, nothing to decide
+    if sum(quantities[i] for i in candidates) <= capacity:
+        return candidates, OPTIMAL
+
+    for i in candidates:
+        if quantities[i] == capacity:
+            # One item takes in the whole dock, can't do any better
+            return [i], OPTIMAL
+
+    seed = None
+
+    if deadline is not None:
+        seed = _greedy(quantities, candidates, capacity)
+
+        if sum(quantities[i] for i in seed) == capacity:
+            return seed, OPTIMAL
+
+    if capacity * len(candidates) <= EXACT_SOLVER_LIMIT:
+        chosen, finished = _solve_exact(quantities, candidates, capacity, deadline)
+        how = OPTIMAL
+    else:
+        chosen, finished = _solve_trimmed(quantities, candidates, capacity, deadline)
+        how = APPROXIMATE
+
+    if finished:
+        return chosen, how
+
+    # Out of time, whatever is better of the DP so far and the greedy fill
+    if sum(quantities[i] for i in seed) > sum(quantities[i] for i in chosen):
+        chosen = seed
+
+    return chosen, CUT_OFF
+
+
+def _greedy(quantities, candidates, capacity):
+    """
+    Biggest quantities first, every one that still fits goes in
+    :return: list | ascending indexes of the chosen quantities
+    """
+    chosen = []
+    left = capacity
+
+    for i in sorted(candidates, key=lambda i: -quantities[i]):
+        if quantities[i] <= left:
+            chosen.append(i)
+            left -= quantities[i]
+
+    return sorted(chosen)
+
+
+def _solve_exact(quantities, candidates, capacity, deadline=None):
+    """
+    Exact subset-sum. Bit n of a reachable mask is set if a sum of n can be built with the items seen so far.
+    We keep the mask after every item so the chosen items can be walked back at the end.
+    :param quantities: list of integer quantities
+    :param candidates: indexes of quantities which can be used
+    :param capacity: Integer capacity
+    :param deadline: time.perf_counter() value to stop at
+    :return: list of ascending indexes of the chosen quantities, False if the deadline cut it short
+    """
+    weights = [quantities[i] for i in candidates]
+    chosen, finished = _reconstruct(candidates, weights, capacity, deadline)
+
+    if not finished:
+        chosen = _top_up(quantities, candidates, capacity, chosen)
+
+    return chosen, finished
+
+
+def _solve_trimmed(quantities, candidates, capacity, deadline=None, epsilon=None):
+    """
+    Approximate subset-sum with trimmed lists of reachable sums for large problems. The sums reachable with the items
+    seen so far are kept sorted and after every item all sums within a factor of (1 + delta) of a kept smaller one
+    are dropped, delta = epsilon / (2 x items). Every dropped sum is then within (1 + epsilon) of a kept one after the
+    last item, so the best kept sum is at least best fill / (1 + epsilon) >= (1 - epsilon) x best fill. A list holds
+    at most about 2 x items x ln(capacity) / epsilon sums, whatever the capacity is.
+    The best fill is never bigger than capacity, so a fill of capacity / (1 + epsilon) is good enough as soon as it is
+    found, greedy or in the lists. Leftover space is greedily filled with items which still fit afterwards, that only
+    makes the fill bigger.
+    :param quantities: list of integer quantities
+    :param candidates: indexes of quantities which can be used
+    :param capacity: Integer capacity
+    :param deadline: time.perf_counter() value to stop at
+    :param epsilon: float | allowed error, defaults to SOLVER_EPSILON
+    :return: list of ascending indexes of the chosen quantities, False if the deadline cut it short
+    """
+    if epsilon is None:
+        epsilon = SOLVER_EPSILON
+
+    enough = capacity / (1 + epsilon)
+    greedy = _greedy(quantities, candidates, capacity)
+
+    # Mostly the case with many items, the last ones fill the gaps
+    if sum(quantities[i] for i in greedy) >= enough:
+        return greedy, True
+
+    stretch = 1 + epsilon / (2 * len(candidates))
+
+    # Every reachable sum with how it was built: None, or the last item added and the entry it was added to
+    sums = [(0, None)]
+    finished = True
+
+    for i in candidates:
+        if deadline is not None and time.perf_counter() >= deadline:
+            # Best sum of the items seen so far is still a valid fill
+            finished = False
+            break
+
+        quantity = quantities[i]
+        added = [(entry[0] + quantity, (i, entry)) for entry in sums if entry[0] + quantity <= capacity]
+
+        # Both lists are sorted already, sorting them together is a merge
+        merged = sorted(sums + added, key=lambda entry: entry[0])
+
+        if merged[-1][0] >= enough:
+            # Close enough to a completely filled dock, no need to look at the rest of the items
+            sums = [merged[-1]]
+            break
+
+        sums = [merged[0]]
+
+        for entry in merged:
+            if entry[0] > sums[-1][0] * stretch:
+                sums.append(entry)
+
+    chosen = []
+    entry = sums[-1]
+
+    # Walk back from the biggest sum kept
+    while entry[1] is not None:
+        i, entry = entry[1]
+        chosen.append(i)
+
+    return _top_up(quantities, candidates, capacity, chosen), finished
+
+
+def _top_up(quantities, candidates, capacity, chosen):
+    """
+    Adds candidates which still fit next to the chosen ones, in their order
+    :return: list | ascending indexes of the chosen quantities
+    """
+    chosen = set(chosen)
+    left = capacity - sum(quantities[i] for i in chosen)
+
+    for i in candidates:
+        if i not in chosen and quantities[i] <= left:
+            chosen.add(i)
+            left -= quantities[i]
+
+    return sorted(chosen)
+
+
+def _reconstruct(candidates, weights, capacity, deadline=None):
+    """
+    Bitset DP over weights and walk back of the best reachable sum.
+    :param candidates: indexes matching the weights
+    :param weights: integer weights, each <= capacity
+    :param capacity: Integer capacity
+    :param deadline: time.perf_counter() value after which no more items are added to the DP
+    :return: list of ascending indexes of the chosen candidates, False if the deadline stopped it before all
+    items were looked at
+    """
+    mask = (1 << (capacity + 1)) - 1
+    full = 1 << capacity
+    reachable = [1]
+    finished = True
+
+    for weight in weights:
+        if deadline is not None and time.perf_counter() >= deadline:
+            # Best sum of the items seen so far is still a valid fill
+            finished = False
+            break
+
+        current = reachable[-1]
+        current = (current | (current << weight)) & mask
+        reachable.append(current)
+
+        if current & full:
+            # Dock can be filled completely, no need to look at the rest of the items
+            break
+
+    best = reachable[-1].bit_length() - 1
+    chosen = []
+
+    # Walk back. If best was already reachable without an item we don't take it, so earlier items are preferred.
+    for n in range(len(reachable) - 1, 0, -1):
+        if not (reachable[n - 1] >> best) & 1:
+            chosen.append(candidates[n - 1])
+            best -= weights[n - 1]
+
+    chosen.reverse()
+    return chosen, finished
+
+
+class Fingerprint:
+    """
+    Canonical form of a list of item quantities. Same quantities in any order give the same fingerprint,
+    order keeps track of where every sorted quantity came from so results can be mapped back to the items.
+    """
+    __slots__ = ('quantities', 'order', 'total', '_hash')
+
+    def __init__(self, quantities):
+        self.order = sorted(range(len(quantities)), key=quantities.__getitem__)
+        self.quantities = tuple(quantities[i] for i in self.order)
+        self.total = sum(self.quantities)
+        self._hash = hash(self.quantities)
+
+    def __hash__(self):
+        return self._hash
+
+    def __eq__(self, other):
+        return self._hash == other._hash and self.quantities == other.quantities
+
+
+class SolverCache:
+    """
+    LRU cache in front of solve(). The same PO is checked against many docks and slots which mostly
+    share capacities, so most solver calls are repeats.
+    Solver calls stop at deadline (a time.perf_counter() value) if one is set. Results cut off by it are not cached,
+    so a later call with more time can still do better.
+    :param maxsize: int | results kept
+    :param budget: float | seconds solver calls may take per calculation or per slot, 0 or None for no limit
+    :param budget_scope: one of SOLVER_BUDGET_SCOPES
+    """
+
+    def __init__(self, maxsize=SOLVER_CACHE_SIZE, budget=SOLVER_TIME_BUDGET, budget_scope=SOLVER_BUDGET_SCOPE):
+        if budget_scope not in SOLVER_BUDGET_SCOPES:
+            raise ValueError("Unknown solver budget scope {}".format(budget_scope))
+
+        if budget is not None and budget < 0:
+            raise ValueError("Solver budget can't be negative")
+
+        self.maxsize = maxsize
+        self.budget = budget
+        self.budget_scope = budget_scope
+        self.deadline = None
+        self.hits = 0
+        self.misses = 0
+        self.outcomes = {OPTIMAL: 0, APPROXIMATE: 0, CUT_OFF: 0}
+        self._results = OrderedDict()
+        self._lock = Lock()
+
+    def start_budget(self, slot=False):
+        """
+        Starts the clock of the time budget. Called once per calculation before any engine or dock group runs and by
+        the engines again for every slot, only the call matching budget_scope sets a new deadline.
+        :param slot: boolean | a new slot starts
+        """
+        if self.budget and slot == (self.budget_scope == "slot"):
+            self.deadline = time.perf_counter() + self.budget
+
+    def solve(self, quantities, capacity, fingerprint=None):
+        """
+        Same as solve() but reuses earlier results for the same quantities and capacity.
+        :param quantities: list of integer quantities
+        :param capacity: Integer capacity of the dock
+        :param fingerprint: Fingerprint of quantities if the caller already has one
+        :return: list | ascending indexes of the chosen quantities
+        """
+        if fingerprint is None:
+            fingerprint = Fingerprint(quantities)
+
+        key = (fingerprint, capacity)
+
+        with self._lock:
+            chosen = self._results.get(key)
+
+            if chosen is not None:
+                self._results.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        if chosen is None:
+            # Solve on the sorted quantities so the result only depends on the key
+            chosen, how = solve_anytime(fingerprint.quantities, capacity, self.deadline)
+            chosen = tuple(chosen)
+
+            with self._lock:
+                self.outcomes[how] += 1
+
+                if how != CUT_OFF:
+                    self._results[key] = chosen
+
+                    if len(self._results) > self.maxsize:
+                        self._results.popitem(last=False)
+
+        return sorted(fingerprint.order[i] for i in chosen)
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+            self.hits = 0
+            self.misses = 0
+            self.outcomes = dict.fromkeys(self.outcomes, 0)
+
+    def add_counts(self, info):
+        """
+        Adds the counters of another cache, e.g. one used in a worker process
+        :param info: dict from info() of the other cache
+        """
+        with self._lock:
+            self.hits += info['hits']
+            self.misses += info['misses']
+
+            for outcome in self.outcomes:
+                self.outcomes[outcome] += info[outcome]
+
+    def info(self):
+        """
+        :return: dict | hits, misses, current size of the cache and how the solver calls behind the misses ended
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._results),
+            "maxsize": self.maxsize,
+            **self.outcomes
+        }
@@ -0,0 +1,202 @@
+"""
+Counters and histograms of where the time goes, shown in Prometheus text format on /metrics.
+Everything is recorded once per stage, db call or request, never per item, so it costs next to nothing.
+Numbers are kept per process, schedules calculated by job workers are counted in the workers.
+"""
+import cProfile
+import io
+import os
+import pstats
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from threading import Lock
+
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") == "1"
+
+# Requests sent with an X-Profile header are run under cProfile and the summary is printed. Off unless enabled,
+# profiling slows the request down a lot.
+PROFILE_REQUESTS = os.environ.get("PROFILE_REQUESTS", "0") == "1"
+PROFILE_LINES = int(os.environ.get("PROFILE_LINES", "30"))
+
+# Buckets for durations in seconds and for sizes like item counts
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+SIZE_BUCKETS = (10, 100, 1000, 10000, 100000, 1000000, 10000000)
+
+_registry = []
+
+
+class Metric:
+    """
+    :param name: str metric name
+    :param documentation: str help text
+    :param labels: label names every value is recorded with
+    """
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = Lock()
+        _registry.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels[label]) for label in self.labels)
+
+    def _label_text(self, key, extra=()):
+        pairs = list(zip(self.labels, key)) + list(extra)
+
+        if not pairs:
+            return ""
+
+        return "{" + ",".join('{}="{}"'.format(label, escape(value)) for label, value in pairs) + "}"
+
+    def render(self):
+        lines = ["# HELP {} {}".format(self.name, self.documentation), "# TYPE {} {}".format(self.name, self.kind)]
+
+        with self._lock:
+            values = sorted(self._values.items())
+
+        for key, value in values:
+            lines.extend(self._render_value(key, value))
+
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        if not METRICS_ENABLED:
+            return
+
+        key = self._key(labels)
+
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _render_value(self, key, value):
+        return ["{}{} {}".format(self.name, self._label_text(key), value)]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=SECONDS_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        if not METRICS_ENABLED:
+            return
+
+        key = self._key(labels)
+
+        with self._lock:
+            counts = self._values.get(key)
+
+            if counts is None:
+                # One count per bucket plus +Inf, then the sum of all values
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0]
+
+            counts[bisect_left(self.buckets, value)] += 1
+            counts[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observes how long the block took"""
+        started = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _render_value(self, key, counts):
+        lines = []
+        total = 0
+
+        for bound, count in zip(self.buckets + ("+Inf",), counts):
+            total += count
+            lines.append("{}_bucket{} {}".format(self.name, self._label_text(key, [("le", bound)]), total))
+
+        lines.append("{}_sum{} {}".format(self.name, self._label_text(key), counts[-1]))
+        lines.append("{}_count{} {}".format(self.name, self._label_text(key), total))
+        return lines
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def render():
+    """
+    :return: str | all metrics in Prometheus text format
+    """
+    lines = []
+
+    for metric in _registry:
+        lines.extend(metric.render())
+
+    return "\n".join(lines) + "\n"
+
+
+def stage(name):
+    """
+    Times a stage of the scheduling, e.g. with stage("arrange"): ...
+    :param name: str stage name
+    """
+    return STAGE_SECONDS.time(stage=name)
+
+
+def start_profile():
+    """
+    :return: cProfile.Profile which is already running
+    """
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def profile_summary(profiler, lines=PROFILE_LINES):
+    """
+    Stops the profiler
+    :param profiler: cProfile.Profile from start_profile
+    :param lines: int | functions to show
+    :return: str | functions with the most cumulative time first
+    """
+    profiler.disable()
+    summary = io.StringIO()
+    pstats.Stats(profiler, stream=summary).sort_stats("cumulative").print_stats(lines)
+    return summary.getvalue()
+
+
+STAGE_SECONDS = Histogram(
+    "po_scheduler_stage_seconds", "Time spent in every stage of scheduling and uploads", ["stage"]
+)
+SCHEDULES = Counter("po_scheduler_schedules_total", "Schedules calculated", ["engine"])
+SCHEDULE_ITEMS = Histogram("po_scheduler_schedule_items", "PO items per schedule calculation", buckets=SIZE_BUCKETS)
+SCHEDULE_SLOTS = Histogram("po_scheduler_schedule_slots", "Slots per schedule calculation", buckets=SIZE_BUCKETS)
+SCHEDULE_SHARDS = Histogram(
+    "po_scheduler_schedule_shards",
+    "Dock groups scheduled on their own per schedule calculation",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128)
+)
+RESULT_CACHE_LOOKUPS = Counter("po_scheduler_result_cache_total", "Uploads looked up in the result cache", ["result"])
+SOLVER_CALLS = Counter("po_scheduler_solver_calls_total", "Knapsack solver calls by cache result", ["result"])
+SOLVER_OUTCOMES = Counter(
+    "po_scheduler_solver_outcomes_total",
+    "Knapsack solver runs by how they ended: optimal, approximate or cut_off by the time budget",
+    ["result"]
+)
+ITEMS_REJECTED = Counter("po_scheduler_items_rejected_total", "PO items no dock can ever take", ["reason"])
+DB_ROUND_TRIPS = Counter("po_scheduler_db_round_trips_total", "Statements sent to the db", ["operation"])
+DB_ROWS_READ = Counter("po_scheduler_db_rows_read_total", "Rows read from the db")
+DB_ROWS_WRITTEN = Counter("po_scheduler_db_rows_written_total", "Rows written to the db", ["table"])
+REQUEST_SECONDS = Histogram(
+    "po_scheduler_http_request_seconds",
+    "Time until a response was handed over, streamed pages keep rendering after that",
+    ["endpoint", "method", "status"]
+)
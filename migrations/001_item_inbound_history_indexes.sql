@@ -0,0 +1,5 @@
+-- Indexes for the paginated /history page.
+-- Pages are read in (slot_start_date, dock_id, po_id, item_id) order, with or without a dock filter.
+ALTER TABLE po_scheduler.item_inbound
+    ADD INDEX idx_item_inbound_slot (slot_start_date, dock_id, po_id, item_id),
+    ADD INDEX idx_item_inbound_dock_slot (dock_id, slot_start_date, po_id, item_id);
@@ -0,0 +1,6 @@
+-- Dock groups, e.g. buildings. POs are only scheduled into docks of their own group and every group is scheduled
+-- on its own. Rows without a group all belong to the same (empty) one.
+ALTER TABLE po_scheduler.dock_slots
+    ADD COLUMN dock_group VARCHAR(64) NOT NULL DEFAULT '';
+ALTER TABLE po_scheduler.po_items
+    ADD COLUMN dock_group VARCHAR(64) NOT NULL DEFAULT '';
@@ -0,0 +1,34 @@
+-- Summary tables for the utilisation dashboard, kept up to date in the same transaction as item_inbound so reports
+-- never have to read the raw inbounds.
+-- Performance of every slot and dock group from the latest schedule calculated into it.
+CREATE TABLE po_scheduler.slot_performance (
+    slot_start_date DATETIME NOT NULL,
+    slot_end_date DATETIME NOT NULL,
+    dock_group VARCHAR(64) NOT NULL DEFAULT '',
+    performance DOUBLE NULL,
+    PRIMARY KEY (slot_start_date, slot_end_date, dock_group)
+);
+-- Capacity of every dock per day (slots starting that day) and what has been inbounded into it.
+CREATE TABLE po_scheduler.dock_daily_utilisation (
+    day DATE NOT NULL,
+    dock_id VARCHAR(64) NOT NULL,
+    dock_group VARCHAR(64) NOT NULL DEFAULT '',
+    capacity BIGINT NOT NULL DEFAULT 0,
+    quantity BIGINT NOT NULL DEFAULT 0,
+    items INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, dock_id),
+    INDEX idx_dock_daily_utilisation_dock (dock_id, day)
+);
+-- Filled once from what is already there, afterwards every save and dock upload refreshes the days it touches.
+INSERT INTO po_scheduler.dock_daily_utilisation (day, dock_id, dock_group, capacity, quantity, items)
+SELECT s.day, s.dock_id, s.dock_group, s.capacity, COALESCE(i.quantity, 0), COALESCE(i.items, 0)
+FROM (
+    SELECT DATE(slot_start_date) AS day, dock_id, MAX(dock_group) AS dock_group, SUM(capacity) AS capacity
+    FROM po_scheduler.dock_slots
+    GROUP BY DATE(slot_start_date), dock_id
+) s
+LEFT JOIN (
+    SELECT DATE(slot_start_date) AS day, dock_id, SUM(quantity) AS quantity, COUNT(*) AS items
+    FROM po_scheduler.item_inbound
+    GROUP BY DATE(slot_start_date), dock_id
+) i ON i.day = s.day AND i.dock_id = s.dock_id;
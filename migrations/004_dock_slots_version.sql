@@ -0,0 +1,8 @@
+-- Version of the dock calendar, raised in the same transaction as every dock upload. Scheduling reads this one row
+-- to know whether its cached calendar is still current instead of checksumming all of dock_slots.
+-- Anything changing dock_slots outside of the app has to raise it as well.
+CREATE TABLE po_scheduler.dock_slots_version (
+    id TINYINT NOT NULL PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
+);
+INSERT INTO po_scheduler.dock_slots_version (id, version) VALUES (1, 0);
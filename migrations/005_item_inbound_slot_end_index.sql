@@ -0,0 +1,4 @@
+-- Index for reading the capacity already used in slots which haven't ended (get_used_capacities), every upload
+-- reads it. Covers the whole query, only the inbounds of open slots are read instead of all of item_inbound.
+ALTER TABLE po_scheduler.item_inbound
+    ADD INDEX idx_item_inbound_slot_end (slot_end_date, dock_id, slot_start_date, quantity);
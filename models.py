@@ -1,31 +1,47 @@
+from array import array
+from bisect import bisect_left, insort
+from ingest import format_epoch
+from knapsack import Fingerprint
+
+
 class Dock:
-    def __init__(self, dock_id, start, end, capacity, max_capacity=None):
+    __slots__ = ('po_id', 'dock_id', 'slot_start_date', 'slot_end_date', 'capacity', 'slot_capacity', 'max_capacity',
+                 'index', 'rank')
+
+    def __init__(self, dock_id, start, end, capacity, max_capacity=None, slot_capacity=None):
         self.po_id = None
         self.dock_id = dock_id
         self.slot_start_date = start
         self.slot_end_date = end
         self.capacity = capacity
-        self.slot_capacity = capacity
+        self.slot_capacity = capacity if slot_capacity is None else slot_capacity
         self.max_capacity = max_capacity
 
+        # Set once the dock is added to a DockIndex
+        self.index = None
+        self.rank = None
+
     def set_max_capacity(self, capacity):
         self.max_capacity = capacity
 
-    def set_slot_values(self, capacity, start, end):
+    def set_slot_values(self, capacity, start, end, slot_capacity=None):
         self.capacity = capacity
-        self.slot_capacity = capacity
+        self.slot_capacity = capacity if slot_capacity is None else slot_capacity
         self.slot_start_date = start
         self.slot_end_date = end
+        self._reindex()
 
     def occupy_dock(self, po_id):
         if self.capacity > 0:
             self.po_id = po_id
+            self._reindex()
             return True, "dock_occupied"
         else:
             return False, "no_capacity"
 
     def release_dock(self):
         self.po_id = None
+        self._reindex()
 
     def inbound_item_to_dock(self, quantity):
         if self.capacity == 0:
@@ -36,20 +52,143 @@ class Dock:
             return False, "inbounded_failed_quantity"
 
         self.capacity -= int(quantity)
+        self._reindex()
         return True, ""
 
+    def is_free(self):
+        return self.po_id is None and self.capacity > 0
+
+    def _reindex(self):
+        if self.index is not None:
+            self.index.update(self)
+
+
+class DockIndex:
+    """
+    Free docks (no PO and some capacity left) bucketed by their remaining capacity, every bucket ordered by rank
+    (the order docks were added in). A max tree over the ranks finds the first added free dock with at least some
+    capacity without going through all of them.
+    Docks keep it up to date themselves whenever they get occupied, released or filled.
+    """
+
+    def __init__(self):
+        self.capacities = []
+        self._buckets = {}
+        self._indexed = {}
+        self._docks = []
+
+        # Leaves hold the free capacity of the dock with that rank, -1 if it isn't free. Every inner node holds the
+        # biggest of its two children, the root the biggest free capacity.
+        self._size = 1
+        self._tree = [-1, -1]
+
+    def add(self, dock):
+        dock.index = self
+        dock.rank = len(self._docks)
+        self._docks.append(dock)
+        self._indexed[dock.dock_id] = None
+
+        if dock.rank == self._size:
+            self._grow()
+
+        self.update(dock)
+
+    def update(self, dock):
+        capacity = dock.capacity if dock.is_free() else None
+        previous = self._indexed[dock.dock_id]
+
+        if capacity == previous:
+            return
+
+        if previous is not None:
+            bucket = self._buckets[previous]
+            del bucket[bisect_left(bucket, (dock.rank,))]
+
+            if not bucket:
+                del self._buckets[previous]
+                del self.capacities[bisect_left(self.capacities, previous)]
+
+        if capacity is not None:
+            bucket = self._buckets.get(capacity)
+
+            if bucket is None:
+                bucket = self._buckets[capacity] = []
+                insort(self.capacities, capacity)
+
+            # Ranks are unique, docks themselves are never compared
+            insort(bucket, (dock.rank, dock))
+
+        self._indexed[dock.dock_id] = capacity
+        self._set_leaf(dock.rank, -1 if capacity is None else capacity)
+
+    def first_dock(self, capacity):
+        """
+        :param capacity: one of the free capacities
+        :return: Dock obj | the earliest added free dock with exactly this capacity
+        """
+        return self._buckets[capacity][0][1]
+
+    def first_fit(self, capacity):
+        """
+        :param capacity: int | capacity the dock needs at least
+        :return: Dock obj or None | the earliest added free dock with at least this capacity
+        """
+        tree = self._tree
+
+        if tree[1] < capacity:
+            return None
 
-class Item:
-    def __init__(self, item_id, quantity):
-        self.item_id = item_id
-        self.quantity = quantity
+        # Down the tree, left whenever the left half has a dock big enough
+        node = 1
+
+        while node < self._size:
+            node *= 2
+
+            if tree[node] < capacity:
+                node += 1
+
+        return self._docks[node - self._size]
+
+    def _set_leaf(self, rank, capacity):
+        tree = self._tree
+        node = self._size + rank
+        tree[node] = capacity
+
+        while node > 1:
+            node //= 2
+            tree[node] = max(tree[2 * node], tree[2 * node + 1])
+
+    def _grow(self):
+        """Doubles the leaves of the tree, every dock is added once so this happens log(docks) times"""
+        leaves = self._tree[self._size:] + [-1] * self._size
+        self._size *= 2
+        self._tree = [-1] * self._size + leaves
+
+        for node in range(self._size - 1, 0, -1):
+            self._tree[node] = max(self._tree[2 * node], self._tree[2 * node + 1])
 
 
 class PurchaseOrder:
-    def __init__(self, po_id):
+    """
+    Items are kept as two parallel arrays instead of an object per item. item_ids holds interned ids,
+    see Interner, quantities the quantity of every item. A PO only goes into docks of its dock_group.
+    """
+    __slots__ = ('po_id', 'dock_group', 'item_ids', 'quantities', 'dock_id', '_fingerprint')
+
+    def __init__(self, po_id, dock_group=""):
         self.po_id = po_id
-        self.items = []
+        self.dock_group = dock_group
+        self.item_ids = array('q')
+        self.quantities = array('q')
         self.dock_id = None
+        self._fingerprint = None
+
+    def fingerprint(self):
+        """Canonical solver key of the current items. Computed once and dropped whenever items change"""
+        if self._fingerprint is None:
+            self._fingerprint = Fingerprint(self.quantities)
+
+        return self._fingerprint
 
     def set_dock(self, dock_id):
         self.dock_id = dock_id
@@ -57,21 +196,275 @@ class PurchaseOrder:
     def release_dock(self):
         self.dock_id = None
 
-    def insert_item(self, item):
-        self.items.append(item)
+    def insert_item(self, item_id, quantity):
+        self.item_ids.append(item_id)
+        self.quantities.append(quantity)
+        self._fingerprint = None
+
+    def remove_items(self, positions):
+        """
+        Removes items in place, keeping the rest in order
+        :param positions: ascending item positions to remove
+        """
+        if not positions:
+            return
+
+        # From the back, so positions still to remove don't move
+        for i in reversed(positions):
+            del self.item_ids[i]
+            del self.quantities[i]
 
-    def insert_multiple_items(self, items):
-        self.items += items
+        self._fingerprint = None
+
+    def has_items(self):
+        return len(self.quantities) > 0
 
     def get_items(self):
-        return self.items
+        return list(zip(self.item_ids, self.quantities))
+
+
+class InboundColumns:
+    """
+    Inbound results stored column by column in lists allocated once for the most rows a schedule can give
+    (every item is inbounded at most once). Slot times are stored as epochs. Iterating gives the rows as dicts
+    with formatted times.
+    """
+    FIELDS = ('slot_start_date', 'slot_end_date', 'dock_id', 'po_id', 'item_id', 'quantity', 'dock_current_capacity')
+    TIME_FIELDS = ('slot_start_date', 'slot_end_date')
+    __slots__ = FIELDS + ('size',)
+
+    def __init__(self, max_rows):
+        for field in self.FIELDS:
+            setattr(self, field, [None] * max_rows)
+
+        self.size = 0
+
+    def append(self, start, end, dock_id, po_id, item_id, quantity, dock_current_capacity):
+        n = self.size
+        self.slot_start_date[n] = start
+        self.slot_end_date[n] = end
+        self.dock_id[n] = dock_id
+        self.po_id[n] = po_id
+        self.item_id[n] = item_id
+        self.quantity[n] = quantity
+        self.dock_current_capacity[n] = dock_current_capacity
+        self.size = n + 1
+
+    def extend(self, start, end, dock_id, po_id, item_ids, quantities, dock_current_capacities):
+        """Adds rows of one dock and PO at once, item_ids, quantities and dock_current_capacities are lists"""
+        n = self.size
+        m = n + len(item_ids)
+        self.slot_start_date[n:m] = [start] * len(item_ids)
+        self.slot_end_date[n:m] = [end] * len(item_ids)
+        self.dock_id[n:m] = [dock_id] * len(item_ids)
+        self.po_id[n:m] = [po_id] * len(item_ids)
+        self.item_id[n:m] = item_ids
+        self.quantity[n:m] = quantities
+        self.dock_current_capacity[n:m] = dock_current_capacities
+        self.size = m
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        columns = [getattr(self, field) for field in self.FIELDS]
+        formatted = {}
+
+        for n in range(self.size):
+            row = {field: column[n] for field, column in zip(self.FIELDS, columns)}
+
+            # Few distinct slot times repeat on many rows, each is only formatted once
+            for field in self.TIME_FIELDS:
+                epoch = row[field]
+                text = formatted.get(epoch)
 
+                if text is None:
+                    text = formatted[epoch] = format_epoch(epoch)
 
-class ItemInbound:
-    def __init__(self, start, end, dock_id, po_id, item_id, quantity):
+                row[field] = text
+
+            yield row
+
+    @classmethod
+    def merge(cls, parts):
+        """
+        Rows of several results, e.g. of independently scheduled dock groups, in one.
+        Rows are ordered by slot start and end, on a tie parts keep the order they are given in.
+        :param parts: list of InboundColumns
+        :return: InboundColumns
+        """
+        merged = cls(sum(len(part) for part in parts))
+        rows = sorted(
+            (part.slot_start_date[n], part.slot_end_date[n], position, n)
+            for position, part in enumerate(parts)
+            for n in range(len(part))
+        )
+
+        for start, end, position, n in rows:
+            part = parts[position]
+            merged.append(
+                start,
+                end,
+                part.dock_id[n],
+                part.po_id[n],
+                part.item_id[n],
+                part.quantity[n],
+                part.dock_current_capacity[n]
+            )
+
+        return merged
+
+    @classmethod
+    def concat(cls, parts):
+        """
+        Rows of several results one after another, e.g. of the windows of one schedule
+        :param parts: list of InboundColumns
+        :return: InboundColumns
+        """
+        joined = cls(0)
+
+        for field in cls.FIELDS:
+            setattr(joined, field, [value for part in parts for value in getattr(part, field)[:part.size]])
+
+        joined.size = sum(part.size for part in parts)
+        return joined
+
+    def trim(self):
+        """Drops the room left over once no more rows are added, so it isn't kept around, cached or pickled"""
+        for field in self.FIELDS:
+            del getattr(self, field)[self.size:]
+
+    def __getstate__(self):
+        # Only the rows, never the padding, e.g. when results are handed back from a shard process
+        return self.to_columns()
+
+    def __setstate__(self, state):
+        for field in self.FIELDS:
+            setattr(self, field, state[field])
+
+        self.size = len(self.slot_start_date)
+
+    def to_columns(self):
+        """
+        :return: dict | every field with its values, only as many as there are rows
+        """
+        return {field: getattr(self, field)[:self.size] for field in self.FIELDS}
+
+    @classmethod
+    def from_columns(cls, columns):
+        """
+        :param columns: dict from to_columns
+        :return: InboundColumns
+        """
+        inbounds = cls(0)
+
+        for field in cls.FIELDS:
+            setattr(inbounds, field, list(columns[field]))
+
+        inbounds.size = len(inbounds.slot_start_date)
+        return inbounds
+
+    def __getitem__(self, n):
+        if not -self.size <= n < self.size:
+            raise IndexError(n)
+
+        n %= self.size
+        row = {field: getattr(self, field)[n] for field in self.FIELDS}
+
+        for field in self.TIME_FIELDS:
+            row[field] = format_epoch(row[field])
+
+        return row
+
+
+class DockSlot:
+    """
+    One dock in one slot as it comes from dock_slots. Start and end are epoch seconds.
+    max_capacity is set once all slots have been read.
+    """
+    __slots__ = ('dock_id', 'slot_start_date', 'slot_end_date', 'capacity', 'slot_capacity', 'max_capacity',
+                 'dock_group')
+
+    def __init__(self, dock_id, start, end, capacity, slot_capacity=None, dock_group=""):
+        self.dock_id = dock_id
+        self.dock_group = dock_group
         self.slot_start_date = start
         self.slot_end_date = end
-        self.dock_id = dock_id
-        self.po_id = po_id
-        self.item_id = item_id
-        self.quantity = quantity
+        self.capacity = capacity
+        self.slot_capacity = capacity if slot_capacity is None else slot_capacity
+        self.max_capacity = None
+
+
+class SlotCalendar:
+    """
+    Dock calendar arranged once, as arrange_slots gives it, and kept for as long as dock_slots doesn't change.
+    Slots and their DockSlot objects are only read while scheduling, so every upload can use the same ones.
+    :param slots: list | arranged slots
+    :param version: stamp of dock_slots the slots were read at
+    """
+    __slots__ = ('slots', 'version')
+
+    def __init__(self, slots, version):
+        self.slots = slots
+        self.version = version
+
+    def residual(self, used, after):
+        """
+        Slots of an incremental schedule, only the ones which haven't ended with what is left of their capacity.
+        :param used: dict | quantity already inbounded by (dock_id, slot start, slot end) with epoch times
+        :param after: int epoch | slots ending before or at this are left out
+        :return: list | arranged slots with what is left of their capacity
+        """
+        slots = []
+        dock_max_capacities = {}
+
+        for (start, end), docks in self.slots:
+            if end <= after:
+                continue
+
+            residual_docks = []
+
+            for dock in docks:
+                capacity = max(dock.slot_capacity - used.get((dock.dock_id, start, end), 0), 0)
+                residual_docks.append(
+                    DockSlot(dock.dock_id, start, end, capacity, dock.slot_capacity, dock.dock_group)
+                )
+
+                if dock_max_capacities.get(dock.dock_id, 0) < capacity:
+                    dock_max_capacities[dock.dock_id] = capacity
+
+            slots.append(((start, end), residual_docks))
+
+        # Max capacity of a dock is what is left of its biggest future slot, same as in arrange_slots
+        for slot, docks in slots:
+            for dock in docks:
+                dock.max_capacity = dock_max_capacities.get(dock.dock_id, 0)
+
+        return slots
+
+
+class Interner:
+    """
+    Hands out small consecutive ints for repeated values, like item ids read from a CSV, so they can be stored in
+    int arrays. The original value is looked up again with interner[id].
+    """
+    __slots__ = ('ids', 'values')
+
+    def __init__(self):
+        self.ids = {}
+        self.values = []
+
+    def intern(self, value):
+        interned = self.ids.get(value)
+
+        if interned is None:
+            interned = self.ids[value] = len(self.values)
+            self.values.append(value)
+
+        return interned
+
+    def __getitem__(self, interned):
+        return self.values[interned]
+
+    def __len__(self):
+        return len(self.values)
@@ -0,0 +1,268 @@
+"""
+Array based scheduling engine. Same results as scheduler.schedule_slots but docks and items live in NumPy arrays
+instead of Dock and PurchaseOrder objects, so filtering and performance checks run over whole arrays at once.
+"""
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    raise ImportError("The numpy scheduling engine needs numpy installed. Run: pip install numpy")
+
+from ingest import format_epoch
+from knapsack import Fingerprint
+from models import InboundColumns
+
+
+def build_slot_matrix(slots):
+    """
+    Turns arranged slots into a (slot x dock) capacity matrix.
+    Docks are numbered in the order they first show up, same order the object engine creates them in.
+    :param slots: list | slots with their docks from arrange_slots
+    :return: dict | dock ids, capacity and slot capacity matrices, presence mask, max capacities, first slot of
+    every dock and slot rows
+    """
+    dock_positions = {}
+    dock_ids = []
+    max_capacities = []
+
+    for slot, docks_dict in slots:
+        for dock in docks_dict:
+            if dock.dock_id not in dock_positions:
+                dock_positions[dock.dock_id] = len(dock_ids)
+                dock_ids.append(dock.dock_id)
+                max_capacities.append(dock.max_capacity)
+
+    capacities = np.zeros((len(slots), len(dock_ids)), dtype=np.int64)
+    slot_capacities = np.zeros((len(slots), len(dock_ids)), dtype=np.int64)
+    present = np.zeros((len(slots), len(dock_ids)), dtype=bool)
+    rows = []
+
+    for slot_position, (slot, docks_dict) in enumerate(slots):
+        rows.append(docks_dict)
+
+        for dock in docks_dict:
+            capacities[slot_position, dock_positions[dock.dock_id]] = dock.capacity
+            slot_capacities[slot_position, dock_positions[dock.dock_id]] = dock.slot_capacity
+            present[slot_position, dock_positions[dock.dock_id]] = True
+
+    return {
+        "dock_ids": dock_ids,
+        "capacities": capacities,
+        "slot_capacities": slot_capacities,
+        "present": present,
+        "max_capacities": np.array(max_capacities, dtype=np.int64),
+        "first_slot": present.argmax(axis=0),
+        "rows": rows,
+    }
+
+
+def build_item_arrays(pos):
+    """
+    Joins the item arrays of all POs. Items of a PO stay next to each other and in their original order.
+    :param pos: list | PurchaseOrder objects from arrange_pos
+    :return: interned item ids array, quantities array, list with the item positions of every PO
+    """
+    item_ids = np.concatenate([np.frombuffer(po.item_ids, dtype=np.int64) for po in pos] or [np.zeros(0, np.int64)])
+    quantities = np.concatenate([np.frombuffer(po.quantities, dtype=np.int64) for po in pos] or [np.zeros(0, np.int64)])
+    ends = np.cumsum([len(po.quantities) for po in pos], dtype=np.int64)
+    po_items = [np.arange(end - len(po.quantities), end) for po, end in zip(pos, ends.tolist())]
+
+    return item_ids, quantities, po_items
+
+
+def remove_invalid_items(quantities, po_items, max_capacity):
+    """
+    Array version of scheduler.remove_invalid_items.
+    :param quantities: array of all item quantities
+    :param po_items: list with the item positions of every PO
+    :param max_capacity: biggest capacity any dock has
+    :return: list with the item positions of every PO which can be inbounded
+    """
+    valid = (quantities > 0) & (quantities <= max_capacity)
+
+    return [positions[valid[positions]] for positions in po_items]
+
+
+def check_performance(capacities, slot_capacities, docks_mask):
+    """
+    Array version of scheduler.check_performance over the docks selected by docks_mask.
+    Ratios are added up in the same order as the object engine so both give exactly the same number.
+    """
+    # Closed docks are left out, same as the object engine
+    docks_mask = docks_mask & (slot_capacities > 0)
+
+    if not docks_mask.any():
+        return None
+
+    ratios = capacities[docks_mask] / slot_capacities[docks_mask]
+
+    return sum(ratios.tolist()) / len(ratios)
+
+
+def schedule_slots(pos, slots, interned_item_ids, solver_cache, progress=None):
+    """
+    Goes through the slots in order and inbounds PO items to docks.
+    :param pos: list | PurchaseOrder objects from arrange_pos
+    :param slots: list | slots with their docks from arrange_slots
+    :param interned_item_ids: Interner the PO item ids were interned with
+    :param solver_cache: SolverCache
+    :param progress: function called after every slot with (slots done, total slots, POs fully placed so far)
+    :return: InboundColumns with the inbound results, list of slot performances
+    """
+    matrix = build_slot_matrix(slots)
+    dock_ids = matrix['dock_ids']
+    max_capacities = matrix['max_capacities']
+
+    item_ids, quantities, po_items = build_item_arrays(pos)
+
+    # Same as the object engine, the biggest capacity of the whole calendar decides what can never be inbounded
+    po_items = remove_invalid_items(quantities, po_items, max_capacities.max() if len(max_capacities) else 0)
+
+    # Current state of every dock. A dock keeps its values from the last slot it was part of.
+    capacities = np.zeros(len(dock_ids), dtype=np.int64)
+    slot_capacities = np.zeros(len(dock_ids), dtype=np.int64)
+    last_slot = np.zeros(len(dock_ids), dtype=np.int64)
+    occupied_by = np.full(len(dock_ids), -1, dtype=np.int64)
+
+    # Dock of every PO, -1 if it has none
+    po_docks = np.full(len(pos), -1, dtype=np.int64)
+    fingerprints = [None] * len(pos)
+
+    # Only POs with items left are looked at. Once a PO is fully inbounded it is dropped from here.
+    active_pos = [po_position for po_position in range(len(pos)) if len(po_items[po_position])]
+
+    # Docks and slots with less capacity than this can't take anything, see scheduler.schedule_windows
+    smallest = _smallest_quantity(quantities, po_items, active_pos)
+    useful = max_capacities >= smallest if smallest is not None else np.zeros(len(dock_ids), dtype=bool)
+    outputs = InboundColumns(sum(len(po_items[po_position]) for po_position in active_pos))
+    performances = []
+    placed_pos = 0
+
+    for slot_position, docks_dict in enumerate(matrix['rows']):
+        solver_cache.start_budget(slot=True)
+        present = matrix['present'][slot_position]
+        capacities[present] = matrix['capacities'][slot_position, present]
+        slot_capacities[present] = matrix['slot_capacities'][slot_position, present]
+        last_slot[present] = slot_position
+        known = matrix['first_slot'] <= slot_position
+
+        completed_pos = False
+
+        if smallest is None or capacities.max() < smallest:
+            schedule_pos = []
+        else:
+            schedule_pos = active_pos
+
+        for po_position in schedule_pos:
+            po = pos[po_position]
+            positions = po_items[po_position]
+            po_quantities = quantities[positions]
+
+            if fingerprints[po_position] is None:
+                fingerprints[po_position] = Fingerprint(po_quantities.tolist())
+
+            if po_docks[po_position] >= 0:
+                dock = int(po_docks[po_position])
+                chosen = solver_cache.solve(po_quantities, int(capacities[dock]), fingerprints[po_position])
+            else:
+                dock, chosen = _get_dock_for_po(
+                    po_quantities,
+                    fingerprints[po_position],
+                    capacities,
+                    known & useful & (occupied_by < 0) & (capacities > 0),
+                    solver_cache
+                )
+
+            if dock is None:
+                continue
+
+            if capacities[dock] > 0:
+                occupied_by[dock] = po_position
+
+            po_docks[po_position] = dock
+
+            if chosen:
+                chosen_positions = positions[chosen]
+                chosen_quantities = po_quantities[chosen]
+                dock_current_capacities = capacities[dock] - np.cumsum(chosen_quantities)
+                capacities[dock] = dock_current_capacities[-1]
+                dock_row = matrix['rows'][last_slot[dock]][0]
+
+                outputs.extend(
+                    dock_row.slot_start_date,
+                    dock_row.slot_end_date,
+                    dock_ids[dock],
+                    po.po_id,
+                    [interned_item_ids[item_id] for item_id in item_ids[chosen_positions].tolist()],
+                    chosen_quantities.tolist(),
+                    dock_current_capacities.tolist()
+                )
+
+                po_items[po_position] = np.delete(positions, chosen)
+                fingerprints[po_position] = None
+
+            if not len(po_items[po_position]):
+                occupied_by[dock] = -1
+                po_docks[po_position] = -1
+                placed_pos += 1
+                completed_pos = True
+
+        if completed_pos:
+            active_pos = [po_position for po_position in active_pos if len(po_items[po_position])]
+            smallest = _smallest_quantity(quantities, po_items, active_pos)
+
+        performances.append({
+            "slot_start_date": format_epoch(docks_dict[0].slot_start_date),
+            "slot_end_date": format_epoch(docks_dict[0].slot_end_date),
+            "performance": check_performance(capacities, slot_capacities, known)
+        })
+
+        if progress:
+            progress(len(performances), len(slots), placed_pos)
+
+    outputs.trim()
+    return outputs, performances
+
+
+def _smallest_quantity(quantities, po_items, active_pos):
+    """
+    :return: int | smallest item quantity left in the active POs, None if there are no items
+    """
+    return min((int(quantities[po_items[po_position]].min()) for po_position in active_pos), default=None)
+
+
+def _get_dock_for_po(po_quantities, fingerprint, capacities, free, solver_cache):
+    """
+    Array version of scheduler.get_dock_for_po. Every distinct free capacity is solved once, smallest first,
+    until bigger capacities can't leave less space unused.
+    :param po_quantities: array of the PO item quantities
+    :param fingerprint: Fingerprint of the PO items
+    :param capacities: current capacity of every dock
+    :param free: mask of docks without PO and with capacity left
+    :param solver_cache: SolverCache
+    :return: dock position or None, list of chosen item indexes
+    """
+    best_capacity = None
+    best_unused = None
+    best_chosen = []
+
+    if not fingerprint.quantities:
+        return None, []
+
+    # Docks the smallest item doesn't fit into are skipped, same as the object engine
+    for capacity in np.unique(capacities[free & (capacities >= fingerprint.quantities[0])]).tolist():
+        if best_unused is not None and capacity - fingerprint.total >= best_unused:
+            break
+
+        chosen = solver_cache.solve(po_quantities, capacity, fingerprint)
+        unused = capacity - int(po_quantities[chosen].sum())
+
+        if best_unused is None or unused < best_unused:
+            best_capacity, best_unused, best_chosen = capacity, unused, chosen
+
+            if not unused:
+                break
+
+    if best_capacity is None:
+        return None, []
+
+    return int(np.flatnonzero(free & (capacities == best_capacity))[0]), best_chosen
@@ -0,0 +1,210 @@
+"""
+Schedules of PO uploads kept on local disk. The same PO content scheduled against the same dock calendar always
+gives the same schedule, so a re-upload is answered from here instead of being calculated and saved again.
+Results are stored as JSON, never as pickles, so a file planted in the directory can't run any code.
+"""
+import hashlib
+import json
+import os
+import stat
+import tempfile
+from threading import Lock
+
+from models import InboundColumns
+
+RESULT_CACHE_ENABLED = os.environ.get("RESULT_CACHE", "1") == "1"
+
+# Private to the user the app runs as, the directory is refused if anybody else owns it or could write into it
+RESULT_CACHE_DIR = os.environ.get(
+    "RESULT_CACHE_DIR",
+    os.path.join(tempfile.gettempdir(), "po_scheduler_results-{}".format(os.getuid()))
+)
+
+# Least recently used results are deleted once all files together are bigger than this
+RESULT_CACHE_MAX_BYTES = int(os.environ.get("RESULT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+SUFFIX = ".json"
+
+# Part of every key, raised whenever what is stored changes so older files are never read back
+FORMAT = 3
+
+
+def po_digest(pos, item_ids):
+    """
+    Hash of arranged POs. Anything the csv parser already evens out (quoting, column order, whitespace, rows of a
+    PO spread over the file) gives the same hash, a different PO, item, quantity or dock group or another PO order
+    doesn't.
+    :param pos: list | PurchaseOrder objects from arrange_pos
+    :param item_ids: Interner the item ids were interned with
+    :return: str hex digest
+    """
+    digest = hashlib.sha256()
+
+    for po in pos:
+        digest.update(str(po.po_id).encode('utf-8'))
+        digest.update(b"\x1e")
+        digest.update(po.dock_group.encode('utf-8'))
+        digest.update(b"\x1e")
+        digest.update("\x1f".join(str(item_ids[item_id]) for item_id in po.item_ids).encode('utf-8'))
+        digest.update(b"\x1e")
+        digest.update(po.quantities.tobytes())
+        digest.update(b"\x1d")
+
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    One file per schedule, named after its key. Files are written to a temporary name first and renamed, so
+    web and job worker processes can share the directory.
+    :param directory: str
+    :param max_bytes: int | size all files may take together
+    """
+
+    def __init__(self, directory=RESULT_CACHE_DIR, max_bytes=RESULT_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = Lock()
+        self._checked = False
+
+    def _safe_directory(self, create=False):
+        """
+        :param create: boolean | make the directory if it isn't there yet
+        :return: boolean | the directory exists, belongs to this user and nobody else can write into it
+        """
+        if self._checked:
+            return True
+
+        try:
+            if create:
+                os.makedirs(self.directory, mode=0o700, exist_ok=True)
+
+            info = os.lstat(self.directory)
+        except OSError:
+            return False
+
+        private = (
+            stat.S_ISDIR(info.st_mode)
+            and info.st_uid == os.getuid()
+            and not info.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+        )
+
+        if not private:
+            # We can log this
+            print("Result cache directory {} isn't private to this user, not using it".format(self.directory))
+            return False
+
+        self._checked = True
+        return True
+
+    @staticmethod
+    def key(digest, version):
+        """
+        :param digest: str | po_digest of the upload
+        :param version: str | version of the dock calendar it is scheduled against
+        :return: str
+        """
+        return hashlib.sha256("{}:{}:{}".format(FORMAT, digest, version).encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + SUFFIX)
+
+    def get(self, key):
+        """
+        :param key: str from key()
+        :return: tuple of outputs, performances and rejected items, None if there is nothing for key
+        """
+        if not self._safe_directory():
+            return None
+
+        path = self._path(key)
+
+        try:
+            with open(path, encoding='utf-8') as f:
+                stored = json.load(f)
+
+            result = (InboundColumns.from_columns(stored['outputs']), stored['performances'], stored['rejected'])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+        try:
+            # Mark it as recently used
+            os.utime(path)
+        except OSError:
+            pass
+
+        return result
+
+    def put(self, key, outputs, performances, rejected):
+        """
+        :param key: str from key()
+        :param outputs: InboundColumns with the inbound results
+        :param performances: list of slot performances
+        :param rejected: list of items no dock can ever take
+        """
+        if not self._safe_directory(create=True):
+            return
+
+        tmp = None
+
+        try:
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(
+                    {"outputs": outputs.to_columns(), "performances": performances, "rejected": rejected},
+                    f,
+                    separators=(",", ":")
+                )
+
+            os.replace(tmp, self._path(key))
+        except OSError:
+            print("Couldn't cache schedule {}".format(key))  # We can log this
+
+            if tmp is not None:
+                _remove(tmp)
+
+            return
+
+        self._evict()
+
+    def _evict(self):
+        with self._lock:
+            files = []
+
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(SUFFIX):
+                    try:
+                        info = entry.stat()
+                    except OSError:
+                        continue
+
+                    files.append((info.st_mtime, info.st_size, entry.path))
+
+            size = sum(file_size for mtime, file_size, path in files)
+
+            for mtime, file_size, path in sorted(files):
+                if size <= self.max_bytes:
+                    break
+
+                _remove(path)
+                size -= file_size
+
+    def clear(self):
+        """Forgets every result, e.g. after the dock calendar has changed"""
+        with self._lock:
+            try:
+                entries = list(os.scandir(self.directory))
+            except OSError:
+                return
+
+            for entry in entries:
+                if entry.name.endswith(SUFFIX):
+                    _remove(entry.path)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
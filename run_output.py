@@ -0,0 +1,256 @@
+"""
+Output files of schedule calculations. Every run writes into a directory of its own, so uploads running at the same
+time never touch each other's files. Rows are written as they come, a manifest with row counts, checksums and timing
+is added once the run is done and old runs are rotated away by age and total size.
+"""
+import csv
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from datetime import datetime
+
+OUTPUT_DIR = os.environ.get("OUTPUT_DIR", "runs")
+OUTPUT_GZIP = os.environ.get("OUTPUT_GZIP", "0") == "1"
+
+# Finished runs older than this many seconds are deleted, then the oldest ones until all together fit into max bytes
+OUTPUT_MAX_AGE = int(os.environ.get("OUTPUT_MAX_AGE", str(7 * 24 * 3600)))
+OUTPUT_MAX_BYTES = int(os.environ.get("OUTPUT_MAX_BYTES", str(1024 * 1024 * 1024)))
+
+MANIFEST = "manifest.json"
+
+
+class OutputRun:
+    """
+    Directory with the files of one run. Opened with `with run:`, closing it writes the manifest and rotates old runs.
+    Files are named after their table, e.g. po_schedular_output.csv or po_schedular_output.csv.gz.
+    :param directory: str | where run directories are made
+    :param compress: boolean | gzip the files
+    :param max_age: int | seconds finished runs are kept
+    :param max_bytes: int | size all runs may take together
+    """
+
+    def __init__(self, directory=OUTPUT_DIR, compress=OUTPUT_GZIP, max_age=OUTPUT_MAX_AGE, max_bytes=OUTPUT_MAX_BYTES):
+        self.directory = directory
+        self.compress = compress
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+
+        # Sorts by start time, the random part keeps runs started in the same second apart
+        self.run_id = "{:%Y%m%dT%H%M%S}-{}".format(datetime.now(), uuid.uuid4().hex[:8])
+        self.path = os.path.join(directory, self.run_id)
+
+        # Anything the caller wants in the manifest, e.g. strategy or solver counts
+        self.info = {}
+        self._files = {}
+        self._started = None
+        self._started_at = None
+
+    def __enter__(self):
+        os.makedirs(self.path, exist_ok=True)
+        self._started = time.perf_counter()
+        self._started_at = datetime.now()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close("failed" if exc_type else "done")
+
+    def table(self, name, fields=None):
+        """
+        :param name: str | file name without extension. The same name always gives the same file.
+        :param fields: column names, taken from the first row if not given
+        :return: TableFile to write rows to
+        """
+        table = self._files.get(name)
+
+        if table is None:
+            file_name = name + (".csv.gz" if self.compress else ".csv")
+            table = self._files[name] = TableFile(os.path.join(self.path, file_name), fields, self.compress)
+
+        return table
+
+    def write(self, name, rows, fields=None):
+        """
+        Adds rows to a table
+        :param name: str | file name without extension
+        :param rows: iterable of row dicts, read one at a time
+        :param fields: column names, taken from the first row if not given
+        :return: int | rows written
+        """
+        return self.table(name, fields).write_rows(rows)
+
+    def close(self, status="done"):
+        """
+        Closes all files and writes the manifest
+        :param status: str | done or failed
+        """
+        files = {}
+
+        for table in self._files.values():
+            table.close()
+            files[os.path.basename(table.path)] = {
+                "rows": table.rows,
+                "bytes": os.path.getsize(table.path),
+                "sha256": file_checksum(table.path)
+            }
+
+        manifest = {
+            "run_id": self.run_id,
+            "status": status,
+            "started": self._started_at.isoformat(),
+            "finished": datetime.now().isoformat(),
+            "seconds": round(time.perf_counter() - self._started, 6),
+            "files": files,
+            "info": self.info
+        }
+
+        # Written to a temporary name first, a manifest is always complete. Runs without one are still going.
+        fd, tmp = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+
+        with os.fdopen(fd, 'w') as f:
+            json.dump(manifest, f, indent=2, default=str)
+
+        os.replace(tmp, os.path.join(self.path, MANIFEST))
+
+        try:
+            rotate_runs(self.directory, self.max_age, self.max_bytes, keep=self.run_id)
+        except OSError:
+            # This run is complete, old ones are rotated away next time
+            print("Couldn't rotate runs in {}".format(self.directory))  # We can log this
+
+
+class TableFile:
+    """
+    One CSV file of a run, written row by row
+    :param path: str
+    :param fields: column names, taken from the first row if not given
+    :param compress: boolean | gzip the file
+    """
+
+    def __init__(self, path, fields=None, compress=False):
+        self.path = path
+        self.fields = fields
+        self.rows = 0
+
+        if compress:
+            self._file = gzip.open(path, 'wt', newline='', encoding='utf-8')
+        else:
+            self._file = open(path, 'w', newline='', encoding='utf-8')
+
+        self._writer = None
+
+        if fields is not None:
+            self._start(fields)
+
+    def _start(self, fields):
+        self.fields = fields
+        self._writer = csv.DictWriter(self._file, fields)
+        self._writer.writeheader()
+
+    def write_rows(self, rows):
+        """
+        :param rows: iterable of row dicts
+        :return: int | rows written
+        """
+        written = 0
+
+        for row in rows:
+            if self._writer is None:
+                self._start(list(row.keys()))
+
+            self._writer.writerow(row)
+            written += 1
+
+        self.rows += written
+        return written
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+
+def file_checksum(path):
+    """
+    :param path: str
+    :return: str | sha256 hex digest of the file as it is stored
+    """
+    digest = hashlib.sha256()
+
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+
+def rotate_runs(directory, max_age=OUTPUT_MAX_AGE, max_bytes=OUTPUT_MAX_BYTES, keep=None):
+    """
+    Deletes finished runs older than max_age, then the oldest ones until all runs together are at most max_bytes.
+    Runs without a manifest are still being written and left alone.
+    :param directory: str | where run directories are
+    :param max_age: int | seconds
+    :param max_bytes: int
+    :param keep: str | run id which is never deleted, e.g. the one just finished
+    """
+    runs = []
+    total = 0
+
+    try:
+        entries = list(os.scandir(directory))
+    except OSError:
+        return
+
+    for entry in entries:
+        if not entry.is_dir(follow_symlinks=False):
+            continue
+
+        size = directory_size(entry.path)
+        total += size
+
+        try:
+            finished = os.stat(os.path.join(entry.path, MANIFEST)).st_mtime
+        except OSError:
+            continue
+
+        if entry.name != keep:
+            runs.append((finished, size, entry.path))
+
+    now = time.time()
+
+    for finished, size, path in sorted(runs):
+        if now - finished <= max_age and total <= max_bytes:
+            break
+
+        # Another process might be rotating at the same time
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+
+
+def directory_size(path):
+    """
+    :param path: str
+    :return: int | bytes of all files right in path, 0 if it is gone meanwhile
+    """
+    size = 0
+
+    try:
+        entries = list(os.scandir(path))
+    except OSError:
+        # Another process rotated it away
+        return 0
+
+    for entry in entries:
+        try:
+            if entry.is_file():
+                size += entry.stat().st_size
+        except OSError:
+            pass
+
+    return size
@@ -0,0 +1,113 @@
+"""
+What-if runs of different scheduling strategies over the same POs and dock calendar, side by side in a process pool.
+Nothing is saved to db or written to files, the best strategy can be scheduled for real afterwards.
+"""
+import multiprocessing
+import os
+import pickle
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+from knapsack import SolverCache
+from models import Interner
+from scheduler import DOCK_CHOICES, PO_ORDERS, arrange_pos, check_strategy, order_pos, schedule_shards
+
+# Strategies calculated at the same time
+SCENARIO_WORKERS = int(os.environ.get("SCENARIO_WORKERS", str(min(os.cpu_count() or 1, 4))))
+
+# Every PO order with every dock choice
+STRATEGIES = [
+    {"po_order": po_order, "dock_choice": dock_choice} for po_order in PO_ORDERS for dock_choice in DOCK_CHOICES
+]
+
+
+def run_strategy(pos, item_ids, slots, strategy):
+    """
+    Schedules arranged POs with one strategy. POs are changed while they are scheduled, so every strategy needs its
+    own copy of them.
+    :param pos: list | PurchaseOrder objects from arrange_pos
+    :param item_ids: Interner the PO item ids were interned with
+    :param slots: list | slots with their docks from arrange_slots
+    :param strategy: dict | po_order and dock_choice
+    :return: dict | the strategy with its mean slot performance (None if every slot is closed), items placed and
+    unplaced and seconds it took
+    """
+    started = time.perf_counter()
+    items = sum(len(po.quantities) for po in pos)
+
+    solver_cache = SolverCache()
+    solver_cache.start_budget()
+
+    # Strategies already run side by side, dock groups of one strategy are scheduled one after another
+    outputs, performances = schedule_shards(
+        order_pos(pos, strategy['po_order']),
+        slots,
+        item_ids,
+        solver_cache,
+        dock_choice=strategy['dock_choice'],
+        workers=1
+    )
+
+    return {
+        "po_order": strategy['po_order'],
+        "dock_choice": strategy['dock_choice'],
+        "mean_performance": mean_performance(performances),
+        "items_placed": len(outputs),
+        "items_unplaced": items - len(outputs),
+        "seconds": round(time.perf_counter() - started, 6),
+    }
+
+
+def mean_performance(performances):
+    """
+    :param performances: list of slot performances
+    :return: float | mean over the slots with open docks, None if there are none
+    """
+    values = [p['performance'] for p in performances if p['performance'] is not None]
+    return statistics.mean(values) if values else None
+
+
+def run_scenarios(po_list, slots, strategies=STRATEGIES, workers=SCENARIO_WORKERS):
+    """
+    Schedules the same POs and slots with every strategy.
+    :param po_list: list or iterable of all pos to inbound
+    :param slots: list | arranged slots, from arrange_slots or scheduler.get_scheduling_slots
+    :param strategies: list of dicts with po_order and dock_choice
+    :param workers: int | processes to run strategies in, 1 runs them one after another in this process
+    :raises ValueError: for an unknown po_order or dock_choice
+    :return: list | comparison table, one row per strategy. Fewest unplaced items first, then the lowest mean
+    performance (least capacity left unused).
+    """
+    for strategy in strategies:
+        check_strategy("python", strategy['po_order'], strategy['dock_choice'])
+
+    item_ids = Interner()
+    pos = arrange_pos(po_list, item_ids)
+
+    if not slots or not strategies:
+        return []
+
+    if workers <= 1:
+        # Same copies a worker process would get
+        data = pickle.dumps((pos, item_ids, slots), protocol=pickle.HIGHEST_PROTOCOL)
+        results = [run_strategy(*pickle.loads(data), strategy) for strategy in strategies]
+    else:
+        # Spawned, not forked, as the web process runs threads
+        context = multiprocessing.get_context("spawn")
+
+        with ProcessPoolExecutor(max_workers=min(workers, len(strategies)), mp_context=context) as executor:
+            results = list(executor.map(run_strategy, repeat(pos), repeat(item_ids), repeat(slots), strategies))
+
+    # Without any open dock there is no performance, None can't be compared with numbers
+    results.sort(key=lambda row: (
+        row['items_unplaced'],
+        row['mean_performance'] is None,
+        row['mean_performance'] or 0
+    ))
+
+    for rank, row in enumerate(results, 1):
+        row['rank'] = rank
+
+    return results
@@ -1,403 +1,1530 @@
-import io
+import base64
+import binascii
+import json
+import multiprocessing
+import os
+import time
+from bisect import bisect_left
 from collections import defaultdict
-from operator import itemgetter
-import csv
-from utils import get_results_as_dict, write_to_db
-from models import Dock, PurchaseOrder, ItemInbound
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+from threading import Lock
+from utils import DB_CONNECTION, DBWriteError, bulk_writer, get_results_as_dict, get_results_as_dict_iter, named_lock
+from ingest import chunks, format_epoch, parse_datetime, read_docks, read_pos, to_epoch
+from models import Dock, DockIndex, DockSlot, InboundColumns, Interner, PurchaseOrder, SlotCalendar
+from knapsack import APPROXIMATE, CUT_OFF, OPTIMAL, SolverCache
+from metrics import (ITEMS_REJECTED, RESULT_CACHE_LOOKUPS, SCHEDULE_ITEMS, SCHEDULE_SHARDS, SCHEDULE_SLOTS, SCHEDULES,
+                     SOLVER_CALLS, SOLVER_OUTCOMES, stage)
+from result_cache import RESULT_CACHE_ENABLED, ResultCache, po_digest
+from run_output import OutputRun
+
+# Scheduling engines calculate_schedules can run with
+ENGINES = ("python", "numpy")
+
+# Order POs get a dock in: as they come in the file, biggest total quantity first or smallest first
+PO_ORDERS = ("arrival", "largest_first", "smallest_first")
+
+# How a PO picks its dock: the one left with least unused space or the first free one something fits into.
+# Either way a PO goes into the earliest slot which has a dock for it.
+DOCK_CHOICES = ("best_fit", "first_fit")
+
+PO_ITEM_COLUMNS = ("item_id", "po_id", "quantity", "dock_group")
+DOCK_SLOT_COLUMNS = ("dock_id", "slot_start_date", "slot_end_date", "capacity", "dock_group")
+ITEM_INBOUND_COLUMNS = ("dock_id", "item_id", "po_id", "quantity", "slot_start_date", "slot_end_date")
+
+# Summary tables kept up to date with every save, see migrations/003_utilisation_summary.sql
+SLOT_PERFORMANCE_COLUMNS = ("slot_start_date", "slot_end_date", "dock_group", "performance")
+
+# Capacity and inbounds of every dock per day, recalculated for the days a save or dock upload touched. Only those
+# days of dock_slots and item_inbound are read (both are indexed by slot_start_date), and the result is the same no
+# matter how often it runs or which rows were skipped as duplicates.
+REFRESH_DAILY_UTILISATION = """INSERT INTO po_scheduler.dock_daily_utilisation
+    (day, dock_id, dock_group, capacity, quantity, items)
+SELECT s.day, s.dock_id, s.dock_group, s.capacity, COALESCE(i.quantity, 0), COALESCE(i.items, 0)
+FROM (
+    SELECT DATE(slot_start_date) AS day, dock_id, MAX(dock_group) AS dock_group, SUM(capacity) AS capacity
+    FROM po_scheduler.dock_slots
+    WHERE slot_start_date >= :date_from AND slot_start_date < :date_to
+    GROUP BY DATE(slot_start_date), dock_id
+) s
+LEFT JOIN (
+    SELECT DATE(slot_start_date) AS day, dock_id, SUM(quantity) AS quantity, COUNT(*) AS items
+    FROM po_scheduler.item_inbound
+    WHERE slot_start_date >= :date_from AND slot_start_date < :date_to
+    GROUP BY DATE(slot_start_date), dock_id
+) i ON i.day = s.day AND i.dock_id = s.dock_id
+ON DUPLICATE KEY UPDATE dock_group = VALUES(dock_group), capacity = VALUES(capacity), quantity = VALUES(quantity),
+    items = VALUES(items)"""
+
+# Version of the dock calendar, see migrations/004_dock_slots_version.sql. Raised in the transaction of every dock
+# upload, so reading it is enough to know whether a cached calendar is still current.
+DOCK_SLOTS_VERSION = "SELECT version FROM po_scheduler.dock_slots_version WHERE id = 1;"
+RAISE_DOCK_SLOTS_VERSION = "UPDATE po_scheduler.dock_slots_version SET version = version + 1 WHERE id = 1"
+
+# Columns of the report of items no dock can ever take
+REJECTED_FIELDS = ("po_id", "item_id", "quantity", "reason")
+
+# Files every run writes into its own directory, see run_output
+INBOUND_FILE = "po_schedular_output"
+PERFORMANCE_FILE = "slot_performances"
+REJECTED_FILE = "rejected_items"
+PERFORMANCE_FIELDS = ("slot_start_date", "slot_end_date", "performance")
+
+# Schedule new POs only into what is left of future slots, so earlier uploads are never double booked
+INCREMENTAL_SCHEDULING = os.environ.get("INCREMENTAL_SCHEDULING", "1") == "1"
+
+# Incremental uploads take turns reading what is left of the slots and saving into it, see schedule_lock
+SCHEDULE_LOCK = "po_scheduler.schedule"
+SCHEDULE_LOCK_TIMEOUT = int(os.environ.get("SCHEDULE_LOCK_TIMEOUT", "600"))
+
+# Slot time in seconds scheduled and saved at once by calculate_schedules_windowed
+SCHEDULE_WINDOW = int(os.environ.get("SCHEDULE_WINDOW", str(24 * 3600)))
+
+# Uploads against a calendar spanning more seconds than this are scheduled and saved window by window (python engine,
+# one dock group). 0 schedules every upload in one go.
+WINDOWED_MIN_SPAN = int(os.environ.get("WINDOWED_MIN_SPAN", str(7 * 24 * 3600)))
+
+# Dock groups scheduled at the same time, each in a process of its own. 1 schedules them one after another.
+SHARD_WORKERS = int(os.environ.get("SHARD_WORKERS", str(min(os.cpu_count() or 1, 4))))
+
+# Starting worker processes takes a while, uploads with fewer PO items than this schedule their groups in process
+SHARD_MIN_ITEMS = int(os.environ.get("SHARD_MIN_ITEMS", "20000"))
+
+# History is read page by page. Dock ids and dates for its filters are cached for a while.
+HISTORY_PAGE_SIZE = 100
+HISTORY_FILTERS_TTL = 60
+_history_filters = {"expires": 0, "value": ([], [])}
+
+# Arranged dock calendar, read again only when dock_slots has changed
+_slot_calendar = {"value": None}
+_slot_calendar_lock = Lock()
+
+# Schedules of earlier uploads, answered again when the same POs come in against the same dock calendar
+result_cache = ResultCache() if RESULT_CACHE_ENABLED else None
+
+
+class DocksMissingError(ValueError):
+    """There are no dock slots to schedule into"""
+
+
+class NoOpenSlotsError(DocksMissingError):
+    """There are dock slots, but all of them have ended"""
 
 
-def parse_file(file=None):
-    """
-    Takes file's path or filestorage obj if its an upload and returns its content in list
-    :param file: str or bytes
-    :return: list | file content
-    """
-
-    try:
-        if type(file) == bytes:
-            decoded_file = file.decode('utf-8')
-            io_string = io.StringIO(decoded_file)
-            reader = csv.DictReader(io_string)
-            return list(reader)
-        else:
-            with open(file, newline='') as csv_file:
-                reader = csv.DictReader(csv_file)
-                return list(reader)
-    except FileNotFoundError:
-        return []
-    except OSError:
-        return []
+class ScheduleNotSavedError(DBWriteError):
+    """A schedule was calculated but (part of it) couldn't be saved. Capacity of what wasn't saved isn't booked."""
 
 
 def po_from_csv(file, save_to_db=False):
     """
-    Takes a CSV file as input and return its content as list. Saves them in db is save_to_db is true
-    :param file: str po file
+    Takes a CSV file as input and returns its rows one by one. Saves them in db chunk by chunk if save_to_db is true
+    :param file: str path, bytes or FileStorage obj of the po file
     :param save_to_db: boolean
-    :return: list | po data
+    :raises InvalidFileError: if the file doesn't have po_id, item_id and quantity columns
+    :return: generator | po rows with int quantity
     """
-    po_data = parse_file(file)
+    po_rows = read_pos(file)
 
     if not save_to_db:
-        return po_data
-
-    query = "INSERT INTO po_scheduler.po_items (item_id, po_id, quantity) VALUES {values}"
-    values = []
+        return po_rows
 
-    if len(list(set(['po_id', 'item_id', 'quantity']) & set(po_data[0].keys()))) != 3:
-        return []
+    return _save_pos_to_db(po_rows)
 
-    for data in po_data:
-        values.append("({}, {}, {})".format(data['item_id'], data['po_id'], data['quantity']))
 
-    if not values:
-        return []
+def _save_pos_to_db(po_rows):
+    # All chunks go in one transaction, which is committed once the last row has been handed over
+    with bulk_writer() as writer:
+        for chunk in chunks(po_rows, writer.batch_size):
+            writer.insert("po_scheduler.po_items", PO_ITEM_COLUMNS, chunk)
 
-    write_to_db(query.format(values=", ".join(values)))
-    return po_data
+            for data in chunk:
+                yield data
 
 
 def docks_from_csv_to_db(file):
     """
-    Takes a CSV file path or FileStorage obj and returns list of all docks. Saves the docks in db.
-    :param file: str or FileStorage
-    :return: list of all docks
+    Takes a CSV file path or FileStorage obj and saves the docks in db in a single transaction.
+    :param file: str path, bytes or FileStorage obj
+    :raises InvalidFileError: if the file doesn't have dock_id, slot_start_dt, slot_end_dt and capacity columns
+    :raises DBWriteError: if the docks couldn't be saved, nothing is saved then
+    :return: int | number of docks saved
     """
+    days = {}
+
+    with stage("save_docks"), bulk_writer() as writer:
+        saved = writer.insert("po_scheduler.dock_slots", DOCK_SLOT_COLUMNS, track_slot_days(read_docks(file), days))
+
+        # Capacity of these days changed
+        if days:
+            writer.execute(REFRESH_DAILY_UTILISATION, day_range(days))
+
+        # Calendars cached by any process are out of date once this commits
+        if saved:
+            writer.execute(RAISE_DOCK_SLOTS_VERSION)
+
+    # Cached schedules were made for the old calendar. Their keys wouldn't match anymore anyway, this frees the space.
+    if saved:
+        _slot_calendar['value'] = None
+
+        if result_cache is not None:
+            result_cache.clear()
+
+    return saved
+
+
+def get_dock_slots_version():
+    """
+    Stamp of the dock_slots table, raised by docks_from_csv_to_db with every dock upload. Reads a single row.
+    :return: str
+    """
+    rows = get_results_as_dict(DOCK_SLOTS_VERSION)
+    return str(rows[0]['version']) if rows else "0"
+
+
+def get_slot_calendar(version=None):
+    """
+    dock_slots arranged into slots. Read and arranged once and kept until the table changes.
+    :param version: stamp from get_dock_slots_version if the caller already has one
+    :return: SlotCalendar
+    """
+    if version is None:
+        version = get_dock_slots_version()
+
+    calendar = _slot_calendar['value']
+
+    if calendar is None or calendar.version != version:
+        with _slot_calendar_lock:
+            # Another thread might have read it meanwhile
+            calendar = _slot_calendar['value']
+
+            if calendar is None or calendar.version != version:
+                with stage("read_docks"):
+                    rows = get_results_as_dict("SELECT * FROM po_scheduler.dock_slots;")
 
-    dock_data = parse_file(file)
-    query = "INSERT INTO po_scheduler.dock_slots (dock_id, slot_start_date, slot_end_date, capacity) VALUES {values};"
-    values = []
+                calendar = _slot_calendar['value'] = SlotCalendar(arrange_slots(rows), version)
 
-    if len(list(set(['dock_id', 'slot_start_dt', 'slot_end_dt', 'capacity']) & set(dock_data[0].keys()))) != 4:
-        return []
+    return calendar
 
-    for data in dock_data:
-        values.append("({}, '{}', '{}', {})".format(
-            data['dock_id'],
-            data['slot_start_dt'].replace("T", " "),
-            data['slot_end_dt'].replace("T", " "),
-            data['capacity'])
+
+def get_used_capacities(now):
+    """
+    Quantity already inbounded into every slot which hasn't ended yet. Read through the slot_end_date index of
+    migration 005.
+    :param now: datetime
+    :return: dict | quantity by (dock_id, slot start, slot end) with epoch times
+    """
+    query = """SELECT dock_id, slot_start_date, slot_end_date, SUM(quantity) AS used
+    FROM po_scheduler.item_inbound
+    WHERE slot_end_date > :now
+    GROUP BY dock_id, slot_start_date, slot_end_date;"""
+
+    with stage("read_used_capacity"):
+        rows = get_results_as_dict(query, {"now": now})
+
+    return {
+        (row['dock_id'], to_epoch(row['slot_start_date']), to_epoch(row['slot_end_date'])): int(row['used'])
+        for row in rows
+    }
+
+
+def get_scheduling_slots(incremental=None, now=None, version=None):
+    """
+    Arranged slots to schedule an upload into, from the cached calendar. Only the capacity used by earlier inbounds is
+    read for every upload.
+    :param incremental: boolean | defaults to INCREMENTAL_SCHEDULING
+    :param now: datetime | slots ending before this are left out in incremental mode, defaults to current time
+    :param version: stamp from get_dock_slots_version if the caller already has one
+    :return: list | arranged slots
+    """
+    if incremental is None:
+        incremental = INCREMENTAL_SCHEDULING
+
+    calendar = get_slot_calendar(version)
+
+    if not incremental:
+        return calendar.slots
+
+    now = now or datetime.now()
+    return calendar.residual(get_used_capacities(now), to_epoch(now))
+
+
+def get_inbounds_from_db(dock_id=None, date_from=None, date_to=None, after=None, limit=HISTORY_PAGE_SIZE):
+    """
+    Returns one page of inbound records created with previous PO uploads. Filtering happens in SQL and pages
+    are read with a keyset on (slot_start_date, dock_id, po_id, item_id), so deep pages cost as much as the first.
+    :param dock_id: only this dock
+    :param date_from: date | only slots ending on or after this day
+    :param date_to: date | only slots starting on or before this day
+    :param after: str | cursor of the previous page
+    :param limit: int | rows per page
+    :return: list of rows, cursor of the next page or None if this is the last one
+    """
+    conditions, params = _history_conditions(dock_id, date_from, date_to)
+    params['limit'] = limit + 1
+
+    if after:
+        conditions.append(
+            "(slot_start_date, dock_id, po_id, item_id) > (:after_start, :after_dock, :after_po, :after_item)"
         )
+        params.update(zip(('after_start', 'after_dock', 'after_po', 'after_item'), decode_cursor(after)))
 
-    if not values:
-        return []
+    query = """SELECT * FROM po_scheduler.item_inbound {where}
+    ORDER BY slot_start_date, dock_id, po_id, item_id LIMIT :limit""".format(
+        where="WHERE " + " AND ".join(conditions) if conditions else ""
+    )
 
-    write_to_db(query.format(values=", ".join(values)))
-    return dock_data
+    with stage("read_history"):
+        results = get_results_as_dict(query, params)
 
+    if len(results) <= limit:
+        return results, None
 
-def get_docks_from_db():
+    results = results[:limit]
+    last = results[-1]
+    return results, encode_cursor(last['slot_start_date'], last['dock_id'], last['po_id'], last['item_id'])
+
+
+def _history_conditions(dock_id, date_from, date_to):
     """
-    Returns dock slots saved in db
-    :return: list
+    :return: list of SQL conditions for the history filters, dict of their parameters
     """
-    query = "SELECT * FROM po_scheduler.dock_slots;"
+    conditions = []
+    params = {}
+
+    if dock_id:
+        conditions.append("dock_id = :dock_id")
+        params['dock_id'] = dock_id
+
+    if date_from:
+        conditions.append("slot_end_date >= :date_from")
+        params['date_from'] = date_from
+
+    if date_to:
+        conditions.append("slot_start_date < :date_to")
+        params['date_to'] = date_to + timedelta(days=1)
 
-    return get_results_as_dict(query)
+    return conditions, params
 
 
-def get_inbounds_from_db():
+def encode_cursor(slot_start_date, dock_id, po_id, item_id):
+    """Opaque, url safe page cursor"""
+    value = json.dumps([slot_start_date.isoformat(), dock_id, po_id, item_id])
+    return base64.urlsafe_b64encode(value.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
     """
-    Returns history of inbound records created with previous PO uploads
-    :return: list
+    :param cursor: str from encode_cursor
+    :raises ValueError: if the cursor wasn't made by encode_cursor
+    :return: tuple of slot_start_date, dock_id, po_id, item_id
     """
-    query = "SELECT * FROM po_scheduler.item_inbound;"
+    try:
+        slot_start_date, dock_id, po_id, item_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return datetime.fromisoformat(slot_start_date), dock_id, po_id, item_id
+    except (TypeError, ValueError, UnicodeError, binascii.Error):
+        raise ValueError("Invalid cursor")
 
-    return get_results_as_dict(query)
 
+def iter_inbounds_from_db(dock_id=None, date_from=None, date_to=None):
+    """
+    All inbounds matching the history filters, in history order, read from a server side cursor one row at a time
+    :param dock_id: only inbounds of this dock
+    :param date_from: date | only slots ending on or after this day
+    :param date_to: date | only slots starting on or before this day
+    :return: generator of inbound rows
+    """
+    conditions, params = _history_conditions(dock_id, date_from, date_to)
+
+    query = """SELECT * FROM po_scheduler.item_inbound {where}
+    ORDER BY slot_start_date, dock_id, po_id, item_id""".format(
+        where="WHERE " + " AND ".join(conditions) if conditions else ""
+    )
 
-def save_inbound_to_db(inbounds):
+    return get_results_as_dict_iter(query, DB_CONNECTION, params, stream=True)
+
+
+def get_history_filters():
     """
-    Saves our scheduled POs to DB
-    :param inbounds: list of inbound schedules
-    :return: None
-    """
-    query = """INSERT INTO po_scheduler.item_inbound (
-    dock_id, 
-    item_id, 
-    po_id, 
-    quantity, 
-    slot_start_date, 
-    slot_end_date) VALUES {values} ON DUPLICATE KEY UPDATE quantity=quantity;"""
-
-    values = []
-
-    for inbound in inbounds:
-        values.append("({}, {}, {}, {}, '{}', '{}')".format(
-            inbound['dock_id'],
-            inbound['item_id'],
-            inbound['po_id'],
-            inbound['quantity'],
-            inbound['slot_start_date'],
-            inbound['slot_end_date'])
+    Dock ids and slot dates to choose from on the history page. Kept for HISTORY_FILTERS_TTL seconds
+    and refreshed whenever new inbounds are saved.
+    :return: list of dates, list of dock ids
+    """
+    if _history_filters['expires'] < time.monotonic():
+        dock_dates = get_results_as_dict(
+            "SELECT DISTINCT DATE(slot_start_date) AS slot_date FROM po_scheduler.item_inbound ORDER BY slot_date;")
+        dock_ids = get_results_as_dict("SELECT DISTINCT dock_id FROM po_scheduler.item_inbound ORDER BY dock_id;")
+
+        _history_filters['value'] = (
+            [row['slot_date'] for row in dock_dates],
+            [row['dock_id'] for row in dock_ids]
         )
+        _history_filters['expires'] = time.monotonic() + HISTORY_FILTERS_TTL
 
-        if not values:
-            return []
+    return _history_filters['value']
 
-    write_to_db(query.format(values=", ".join(values)))
 
+def save_inbound_to_db(inbounds, performances=(), dock_group=""):
+    """
+    Saves our scheduled POs to DB. Slot performances and the daily utilisation of the docks are updated in the same
+    transaction, so the summary tables always agree with item_inbound.
+    :param inbounds: list of inbound schedules
+    :param performances: list of slot performances of the same schedule, the latest one of a slot is kept
+    :param dock_group: str | dock group of performances without a dock_group of their own
+    :return: int | rows saved, False if they couldn't be saved
+    """
+    days = {}
 
-def arrange_pos(pos):
+    try:
+        with bulk_writer() as writer:
+            saved = writer.insert(
+                "po_scheduler.item_inbound",
+                ITEM_INBOUND_COLUMNS,
+                track_slot_days(inbounds, days),
+                ignore_duplicates=True
+            )
+            writer.insert(
+                "po_scheduler.slot_performance",
+                SLOT_PERFORMANCE_COLUMNS,
+                (dict(row, dock_group=row.get('dock_group', dock_group)) for row in performances),
+                replace_duplicates=True
+            )
+
+            if days:
+                writer.execute(REFRESH_DAILY_UTILISATION, day_range(days))
+    except DBWriteError:
+        return False
+
+    # New slot dates or docks might show up in history now
+    _history_filters['expires'] = 0
+    return saved
+
+
+def track_slot_days(rows, days):
     """
-    Takes pos as list, Instantiates PurchaseOrder modules object and returns a dict will all PO objects
-    :param pos: list | of all POs (directly taken from file)
-    :return: dict | PO objects arranged by po_ids
+    Hands rows on while noting the first and last slot start in days
+    :param rows: iterable of dicts with slot_start_date as datetime or str
+    :param days: dict | first and last are set once all rows are read, nothing is set without rows
+    :return: generator of the same rows
     """
-    arranged_pos = defaultdict(list)
-    po_objects = []
+    first = last = None
+
+    for row in rows:
+        start = row['slot_start_date']
+
+        # Formatted times sort the same as the times themselves
+        if first is None or start < first:
+            first = start
+
+        if last is None or start > last:
+            last = start
+
+        yield row
+
+    if first is not None:
+        days['first'] = first
+        days['last'] = last
+
+
+def day_range(days):
+    """
+    :param days: dict from track_slot_days
+    :return: dict | date_from and date_to (exclusive) of every day between the first and last slot start
+    """
+    first, last = [value if isinstance(value, datetime) else parse_datetime(value)
+                   for value in (days['first'], days['last'])]
+    return {"date_from": first.date(), "date_to": last.date() + timedelta(days=1)}
+
+
+def get_utilisation(date_from=None, date_to=None, dock_id=None):
+    """
+    Dock utilisation from the summary table, item_inbound isn't read at all
+    :param date_from: date | first day
+    :param date_to: date | last day
+    :param dock_id: only this dock
+    :return: list of rows per dock and day, list of rows per dock over all the days. Rows have capacity, quantity
+    inbounded, items and utilisation (quantity / capacity, None without capacity).
+    """
+    conditions, params = [], {}
+
+    if dock_id:
+        conditions.append("dock_id = :dock_id")
+        params['dock_id'] = dock_id
+
+    if date_from:
+        conditions.append("day >= :date_from")
+        params['date_from'] = date_from
+
+    if date_to:
+        conditions.append("day <= :date_to")
+        params['date_to'] = date_to
+
+    where = "WHERE " + " AND ".join(conditions) if conditions else ""
+
+    days_query = """SELECT day, dock_id, dock_group, capacity, quantity, items
+    FROM po_scheduler.dock_daily_utilisation {where}
+    ORDER BY day, dock_id""".format(where=where)
+
+    docks_query = """SELECT dock_id, MAX(dock_group) AS dock_group, SUM(capacity) AS capacity,
+    SUM(quantity) AS quantity, SUM(items) AS items, COUNT(*) AS days
+    FROM po_scheduler.dock_daily_utilisation {where}
+    GROUP BY dock_id ORDER BY dock_id""".format(where=where)
+
+    with stage("read_utilisation"):
+        days = [utilisation_row(row) for row in get_results_as_dict(days_query, params)]
+        docks = [utilisation_row(row) for row in get_results_as_dict(docks_query, params)]
+
+    return days, docks
+
+
+def utilisation_row(row):
+    """
+    :param row: db row with capacity, quantity and items
+    :return: dict | the row with plain ints and its utilisation
+    """
+    row = dict(row)
+
+    for column in ("capacity", "quantity", "items", "days"):
+        if column in row:
+            row[column] = int(row[column] or 0)
+
+    row['utilisation'] = row['quantity'] / row['capacity'] if row['capacity'] else None
+    return row
+
+
+def get_slot_performances(date_from=None, date_to=None, dock_group=None):
+    """
+    Saved slot performances, see save_inbound_to_db
+    :param date_from: date | only slots ending on or after this day
+    :param date_to: date | only slots starting on or before this day
+    :param dock_group: only slots of this dock group
+    :return: list of rows in slot order
+    """
+    conditions, params = _history_conditions(None, date_from, date_to)
+
+    if dock_group is not None:
+        conditions.append("dock_group = :dock_group")
+        params['dock_group'] = dock_group
+
+    query = """SELECT slot_start_date, slot_end_date, dock_group, performance FROM po_scheduler.slot_performance {where}
+    ORDER BY slot_start_date, slot_end_date, dock_group""".format(
+        where="WHERE " + " AND ".join(conditions) if conditions else ""
+    )
+
+    with stage("read_utilisation"):
+        return get_results_as_dict(query, params)
 
-    for po in pos:
-        # First we combine all items belonging to different POs
-        # So it'll look like {'1': [{item1}, {item2}, {item3}], '2': [{item4}]}
-        arranged_pos[po['po_id']].append({
-            "item_id": po['item_id'],
-            "quantity": int(po['quantity'])
-        })
 
-    for po in arranged_pos.items():
-        # Now we instantiate PurchaseOrder object. tupple po has ID on 0th Index and items on 1st index
-        po_obj = PurchaseOrder(po[0])
+def arrange_pos(pos, item_ids):
+    """
+    Takes pos as list, Instantiates PurchaseOrder modules object and returns a list will all PO objects
+    :param pos: list or iterable | of all POs (directly taken from file)
+    :param item_ids: Interner | item ids of the file are stored as ints handed out by it
+    :return: list | PO objects in the order they first show up in the file. A PO belongs to the dock group of its
+    first row.
+    """
+    arranged_pos = {}
+
+    for po in pos:
+        # Combine all items belonging to the same PO. Every PO keeps its item ids and quantities in int arrays.
+        po_obj = arranged_pos.get(po['po_id'])
 
-        # Add Items to it
-        po_obj.insert_multiple_items(po[1])
+        if po_obj is None:
+            po_obj = arranged_pos[po['po_id']] = PurchaseOrder(po['po_id'], po.get('dock_group') or "")
 
-        # Finally Add our newly created PurchaseOrder to out Po list
-        po_objects.append(po_obj)
+        po_obj.insert_item(item_ids.intern(po['item_id']), int(po['quantity']))
 
-    return po_objects
+    return list(arranged_pos.values())
 
 
 def arrange_slots(slots):
     """
     Arranging all docks according to different slots. We are not instantiating Dock objects yet.
     Reason for that is to reuse same Dock objects across different slots.
-    :param slots: list of all slots
-    :return: sorted list of all Slots with docks in them
+    :param slots: list or iterable of all slots
+    :return: sorted list of all Slots with DockSlot objects in them
     """
     arranged_slots = defaultdict(list)
 
     # We need the maximum capacity of all docks across all the slots.
     dock_max_capacities = {}
 
-    # Why 2 loops? Well we need the max capacity prior to organizing the docks in slots
+    # Rows are read only once, so they can come straight from a file or db cursor
     for slot in slots:
-        slot['capacity'] = int(slot['capacity'])
-        if dock_max_capacities.get(slot['dock_id'], 0) < slot['capacity']:
-            dock_max_capacities[slot['dock_id']] = slot['capacity']
+        # Slots of an incremental schedule tell their original capacity apart from what is left of it.
+        # Times come as datetime from the db or a parsed file, or as strings, and are all turned into epochs here.
+        dock = DockSlot(
+            slot['dock_id'],
+            to_epoch(slot['slot_start_date']),
+            to_epoch(slot['slot_end_date']),
+            int(slot['capacity']),
+            int(slot['slot_capacity']) if 'slot_capacity' in slot else None,
+            slot.get('dock_group') or ""
+        )
 
-    for slot in slots:
-        arranged_slots["{}:{}".format(
-            slot['slot_start_date'],
-            slot['slot_end_date']
-        )].append({
-            **slot,
-            'max_capacity': dock_max_capacities.get(slot['dock_id'])
-        })
+        if dock_max_capacities.get(dock.dock_id, 0) < dock.capacity:
+            dock_max_capacities[dock.dock_id] = dock.capacity
+
+        arranged_slots[(dock.slot_start_date, dock.slot_end_date)].append(dock)
+
+    # Max capacity is only known once all slots have been seen
+    for docks in arranged_slots.values():
+        for dock in docks:
+            dock.max_capacity = dock_max_capacities.get(dock.dock_id, 0)
 
-    # It'll look like as below:
+    # It'll look like as below, slots sorted by start and then end:
     # [
-    #   ('2018-08-01T00:00:00:2018-08-01T01:00:00',
-    #       [{
-    #           'dock_id': '1',
-    #           'slot_start_date': '2018-08-01T00:00:00',
-    #           'slot_end_date': '2018-08-01T01:00:00',
-    #           'capacity': 183,
-    #           'max_capacity': 236
-    #       }]
+    #   ((1533081600, 1533085200),
+    #       [DockSlot(
+    #           dock_id='1',
+    #           slot_start_date=1533081600,
+    #           slot_end_date=1533085200,
+    #           capacity=183,
+    #           slot_capacity=183,
+    #           max_capacity=236
+    #       )]
     #   )
     # ]
     return sorted(arranged_slots.items())
 
 
-def get_dock_for_po(items, docks):
+def get_dock_for_po(po, dock_index, solver_cache):
     """
     This takes in items of a PO and checks with Knapsack algorithm to figure out
     which Dock has the best capacity available to organize item with least unused space for a given slot.
-    :param items: list of items in a PO
-    :param docks: dict | all the docks in current slot
-    :return: Dock obj or None, list of best combination to fill the dock
+    Free docks are grouped by capacity, so every distinct capacity is only solved once.
+    :param po: PurchaseOrder whose items need a dock
+    :param dock_index: DockIndex | free docks in current slot
+    :param solver_cache: SolverCache shared by the whole schedule calculation
+    :return: Dock obj or None, list of item positions of the best combination to fill the dock
     """
-    possible_docks = {}
-    possible_dock_objects = {}
-    items_in_dock = {}
+    fingerprint = po.fingerprint()
+    best_capacity = None
+    best_unused = None
+    best_items = []
+
+    if not fingerprint.quantities:
+        return None, []
+
+    # Smallest capacities first. On a tie the smaller dock wins and bigger ones stay free for bigger POs.
+    # Docks the smallest item doesn't fit into would only hold the PO without taking anything, they are skipped.
+    for capacity in dock_index.capacities[bisect_left(dock_index.capacities, fingerprint.quantities[0]):]:
+        # Even if all items fit, this much space stays unused. Bigger docks can only leave more.
+        if best_unused is not None and capacity - fingerprint.total >= best_unused:
+            break
 
-    for id, dock in docks.items():
-        possible_dock_objects[dock.dock_id] = dock
+        # We're looking for best Item combination here. This will determine which dock to select
+        # and which items to unload
+        dock_items = solver_cache.solve(po.quantities, capacity, fingerprint)
 
-        if dock.po_id is None and dock.capacity > 0:
-            # We're looking for best Item combination here. This will determine which dock to select
-            # and which items to unload
-            dock_items = fill_items_in_dock(items, dock.capacity)
+        # We're checking how much unused space is left in a dock after items have been filled.
+        unused = capacity - sum([po.quantities[i] for i in dock_items])
 
-            # We're checking how much unused space is left in a dock after items have been filled.
-            possible_docks[dock.dock_id] = dock.capacity - sum([item['quantity'] for item in dock_items])
-            items_in_dock[dock.dock_id] = dock_items
+        if best_unused is None or unused < best_unused:
+            best_capacity, best_unused, best_items = capacity, unused, dock_items
 
-            # # If Knapsack seems too much then we can use my older but less accurate version to select a dock.
-            # for item in items:
-            #     if item['quantity'] <= min(dock.capacity, possible_docks[dock.dock_id]):
-            #         possible_docks[dock.dock_id] -= item['quantity']
+            if not unused:
+                break
 
-    # We're taking the dock with least unused space and the items to fill in it.
-    for dock_id, val in sorted(possible_docks.items(), key=itemgetter(1)):
-        return possible_dock_objects[dock_id], items_in_dock[dock_id]
+        # # If Knapsack seems too much then we can use my older but less accurate version to select a dock.
+        # for item in items:
+        #     if item['quantity'] <= min(dock.capacity, possible_docks[dock.dock_id]):
+        #         possible_docks[dock.dock_id] -= item['quantity']
 
-    return None, []
+    if best_capacity is None:
+        return None, []
+
+    # We're taking the dock with least unused space and the items to fill in it.
+    return dock_index.first_dock(best_capacity), best_items
 
 
-def remove_invalid_items(pos, docks):
+def get_first_fit_dock(po, dock_index, solver_cache):
     """
-    This is a helper function to remove all items from POs which cannot be unloaded at any dock in any slot.
-    :param pos: list | of all POs
-    :param docks: Docks objects.
-    :return: None
+    First fit alternative to get_dock_for_po. Takes the earliest added free dock any item of the PO fits into,
+    however much space is left unused.
+    :param po: PurchaseOrder whose items need a dock
+    :param dock_index: DockIndex | free docks in current slot
+    :param solver_cache: SolverCache shared by the whole schedule calculation
+    :return: Dock obj or None, list of item positions of the best combination to fill the dock
     """
-    if not docks:
-        return
+    fingerprint = po.fingerprint()
 
-    docks_max_capacities = sorted([int(dock['max_capacity']) for dock in docks[1]])
+    if not fingerprint.quantities:
+        return None, []
 
-    for po in pos:
-        po.items = [item for item in po.items if 0 < item['quantity'] <= docks_max_capacities[-1]]
+    # Only docks the smallest item fits into can take anything
+    dock = dock_index.first_fit(fingerprint.quantities[0])
 
+    if dock is None:
+        return None, []
 
-def fill_items_in_dock(items, capacity):
-    """
-    Implementation of Knapsack algorithm. Three consecutive loops to check the best possible combination
-    of items to fill in a dock.
-    A better way would have been to keep the function recursive and then check the combinations.
-    :param items: list of items
-    :param capacity: Integer capacity of the given dock.
-    :return: list of items to be filled in the dock
-    """
+    return dock, solver_cache.solve(po.quantities, dock.capacity, fingerprint)
 
-    # This holds all combinations that can be filled in the dock.
-    possible_combinations = {}
 
-    iteration = 0
+def remove_invalid_items(pos, slots, item_ids=None):
+    """
+    Feasibility pre-pass over the whole calendar. Removes all items from POs which cannot be unloaded at any dock
+    in any slot, i.e. items with no quantity, bigger than the biggest capacity in the dock group of their PO or of a
+    PO whose dock group has no docks at all. Runs again when an engine starts, which costs next to nothing once
+    invalid items are gone.
+    :param pos: list | of all POs
+    :param slots: list | slots with their docks from arrange_slots
+    :param item_ids: Interner the PO item ids were interned with, item ids of the report stay interned without it
+    :return: list | rejected items report, one dict per item with po_id, item_id, quantity and reason
+    """
+    # Every DockSlot already knows the biggest capacity of its dock across the calendar
+    group_max_capacities = {}
 
-    for i in range(len(items)):
-        if items[i]['quantity'] == capacity:
-            # We've found the one item which will take in all the capacity of the dock
-            possible_combinations[iteration] = [items[i]]
-            break
-        elif items[i]['quantity'] > capacity:
-            # This item is too large to fill in this dock in current slot
-            continue
+    for slot, docks in slots:
+        for dock in docks:
+            if group_max_capacities.get(dock.dock_group, -1) < dock.max_capacity:
+                group_max_capacities[dock.dock_group] = dock.max_capacity
 
-        for j in range(i+1, len(items)):
-            possible_combinations[iteration] = [items[i]]
-            current_total = items[i]['quantity'] + items[j]['quantity']
+    rejected = []
 
-            if current_total == capacity:
-                possible_combinations[iteration].append(items[j])
-                break
-            elif current_total > capacity:
-                continue
+    for po in pos:
+        max_capacity = group_max_capacities.get(po.dock_group)
 
-            possible_combinations[iteration].append(items[j])
+        if max_capacity is None:
+            invalid = list(range(len(po.quantities)))
+        else:
+            invalid = [i for i, quantity in enumerate(po.quantities) if not 0 < quantity <= max_capacity]
 
-            for n in range(j+1, len(items)):
-                if items[n]['quantity'] + current_total == capacity:
-                    current_total += items[n]['quantity']
-                    possible_combinations[iteration].append(items[n])
-                    break
-                elif items[n]['quantity'] + current_total < capacity:
-                    current_total += items[n]['quantity']
-                    possible_combinations[iteration].append(items[n])
-                else:
-                    continue
+        for i in invalid:
+            if po.quantities[i] <= 0:
+                reason = "no_quantity"
+            elif max_capacity is None:
+                reason = "no_docks"
+            else:
+                reason = "too_big"
 
-            iteration += 1
-        else:
-            possible_combinations[iteration] = [items[i]]
+            rejected.append({
+                "po_id": po.po_id,
+                "item_id": item_ids[po.item_ids[i]] if item_ids is not None else po.item_ids[i],
+                "quantity": po.quantities[i],
+                "reason": reason
+            })
 
-        iteration += 1
+        if invalid:
+            po.remove_items(invalid)
 
-    result = []
-    # This is to check which item has the least unused space.
-    difference = capacity
+    return rejected
 
-    for items in possible_combinations.values():
-        items_sum = sum([i['quantity'] for i in items])
-        # if items sum and capacity different is less then the currently held item then we've got a new winner.
-        if capacity - items_sum < difference:
-            difference = capacity - items_sum
-            result = items
 
-    return result
+def smallest_quantity(pos):
+    """
+    :param pos: list | POs with items
+    :return: int | smallest item quantity left in any of them, None if there are no items
+    """
+    return min((min(po.quantities) for po in pos if po.has_items()), default=None)
 
 
 def check_performance(docks):
     """
     This function checks the performance of a Slot once we've filled in all the POs in it.
+    Closed docks (no slot capacity) have nothing to leave unused and are left out.
     :param docks: all docks available in the slot
-    :return: float number with performance index
+    :return: float number with performance index, None if every dock is closed
     """
     capacity_ratio_sum = 0
+    open_docks = 0
 
     for dock in docks.values():
-        capacity_ratio_sum += dock.capacity/dock.slot_capacity
+        if dock.slot_capacity:
+            capacity_ratio_sum += dock.capacity/dock.slot_capacity
+            open_docks += 1
 
-    return capacity_ratio_sum/len(docks)
+    if not open_docks:
+        return None
 
+    return capacity_ratio_sum/open_docks
 
-def calculate_schedules(po_list, slot_list):
+
+def calculate_schedules(po_list, slot_list, solver_cache=None, engine="python", progress=None, po_order="arrival",
+                        dock_choice="best_fit", output=None):
     """
     Star function. Takes POs and Docks as input. Docks will be arranged slot wise. Calculates schedules per slot
-    and docks performances. Saves inbound data and performances in CSV files.
-    :param po_list: list of all pos to inbound
-    :param slot_list: list of all docks available sorted in slots. Slots are sorted in ascending order
-    :return: inbound results
+    and docks performances. Saves inbound data and performances in CSV files of a run directory.
+    :param po_list: list or iterable of all pos to inbound
+    :param slot_list: list or iterable of all docks available sorted in slots. Slots are sorted in ascending order
+    :param solver_cache: SolverCache to reuse knapsack results from, a fresh one is used if not given
+    :param engine: "python" to schedule with Dock/PurchaseOrder objects or "numpy" for the array based engine.
+    Both give the same results.
+    :param progress: function called after every slot with (slots done, total slots, POs fully placed so far)
+    :param po_order: one of PO_ORDERS
+    :param dock_choice: one of DOCK_CHOICES, the numpy engine only does best_fit
+    :param output: OutputRun the files are written to, a new one in OUTPUT_DIR if not given. Not opened yet.
+    :raises ScheduleNotSavedError: if the schedule couldn't be saved, no files are written then
+    :return: InboundColumns | inbound results, iterating gives them as dicts
     """
+    check_strategy(engine, po_order, dock_choice)
 
-    # Arrange our items according to their POs
-    pos = arrange_pos(po_list)
+    if output is None:
+        output = OutputRun()
 
-    # Arrange our docks according to their slots
-    slots = arrange_slots(slot_list)
+    output.info.update(engine=engine, po_order=po_order, dock_choice=dock_choice, cached=False)
 
-    docks = {}
-    outputs = []
-    performances = []
+    with output:
+        # Arrange our items according to their POs. Item ids are stored as ints and turned back into ids for the
+        # output. PO rows usually come straight from the uploaded file, so reading it is part of this stage.
+        with stage("arrange"):
+            item_ids = Interner()
+            pos = arrange_pos(po_list, item_ids)
+
+            # Arrange our docks according to their slots
+            slots = arrange_slots(slot_list)
+
+        pos = order_pos(pos, po_order)
+        outputs, performances, rejected, saved = _schedule_arranged(
+            pos, item_ids, slots, solver_cache, engine, progress, dock_choice, output
+        )
+
+        # Same as an upload, a schedule which isn't in db isn't booked
+        if saved is False:
+            raise ScheduleNotSavedError("Schedules couldn't be saved, nothing was booked")
+
+    return outputs
+
+
+def schedule_upload(po_list, solver_cache=None, engine="python", progress=None, po_order="arrival",
+                    dock_choice="best_fit", output=None):
+    """
+    calculate_schedules against the dock calendar in db, which is kept arranged between uploads. An upload with the
+    same POs and strategy as an earlier one, against an unchanged calendar, gets the earlier schedule back from
+    result_cache without calculating or saving it again.
+    :param po_list: list or iterable of all pos to inbound
+    :param solver_cache: SolverCache to reuse knapsack results from, a fresh one is used if not given
+    :param engine: "python" or "numpy"
+    :param progress: function called after every slot with (slots done, total slots, POs fully placed so far)
+    :param po_order: one of PO_ORDERS
+    :param dock_choice: one of DOCK_CHOICES
+    :param output: OutputRun the files are written to, a new one in OUTPUT_DIR if not given. Not opened yet.
+    Calendars longer than WINDOWED_MIN_SPAN are scheduled and saved window by window, with the same schedule.
+    :raises DocksMissingError: if there are no dock slots in db, NoOpenSlotsError if all of them have ended
+    :raises DBLockTimeoutError: if another upload kept scheduling for longer than SCHEDULE_LOCK_TIMEOUT seconds
+    :raises ScheduleNotSavedError: if the schedule (or a window of it) couldn't be saved
+    :return: InboundColumns with the inbound results (iterating gives them as dicts), list of slot performances,
+    list of items no dock can ever take (see remove_invalid_items)
+    """
+    check_strategy(engine, po_order, dock_choice)
+
+    if output is None:
+        output = OutputRun()
+
+    output.info.update(engine=engine, po_order=po_order, dock_choice=dock_choice, cached=False)
+
+    with output:
+        return _schedule_upload(po_list, solver_cache, engine, progress, po_order, dock_choice, output)
+
+
+def _schedule_upload(po_list, solver_cache, engine, progress, po_order, dock_choice, output):
+    """
+    Rest of schedule_upload once the run directory is open
+    """
+    with stage("arrange"):
+        item_ids = Interner()
+        pos = order_pos(arrange_pos(po_list, item_ids), po_order)
+
+    key = None
+
+    if solver_cache is None:
+        solver_cache = SolverCache()
+
+    cut_off = solver_cache.outcomes[CUT_OFF]
+
+    # Version is read before the docks, a calendar changing in between can only leave an entry nobody asks for
+    version = get_dock_slots_version()
+
+    if result_cache is not None:
+        key = result_cache.key(po_digest(pos, item_ids), "{}:{}".format(version, dock_choice))
+        cached = cached_schedule(key, output)
+
+        if cached is not None:
+            return cached
+
+    with schedule_lock():
+        if key is not None:
+            # The same upload sent again while the first one was still being scheduled (e.g. a reload after a
+            # timeout) waited for it here. Its schedule is saved by now and must not be booked a second time.
+            cached = cached_schedule(key, output)
+
+            if cached is not None:
+                return cached
+
+            RESULT_CACHE_LOOKUPS.inc(result="miss")
+
+        slots = get_scheduling_slots(version=version)
+
+        if not slots:
+            if get_slot_calendar(version).slots:
+                raise NoOpenSlotsError("No open slots left")
+
+            raise DocksMissingError("Docks missing")
+
+        if use_windows(engine, pos, slots, WINDOWED_MIN_SPAN):
+            # Long calendars are saved window by window, history fills up while later windows are calculated
+            summary, outputs, performances, rejected = _schedule_arranged_windows(
+                pos, item_ids, slots, solver_cache, SCHEDULE_WINDOW, progress, dock_choice, output, keep=True
+            )
+            output.info['summary'] = summary
+
+            if summary['failed_windows']:
+                raise ScheduleNotSavedError(
+                    "Schedules of {} items couldn't be saved, {} items of earlier windows are booked".format(
+                        summary['unsaved'], summary['saved']
+                    )
+                )
+
+            saved = summary['saved']
+        else:
+            outputs, performances, rejected, saved = _schedule_arranged(
+                pos, item_ids, slots, solver_cache, engine, progress, dock_choice, output
+            )
+
+            # Nothing is booked, the next upload would be scheduled into the same capacity
+            if saved is False:
+                raise ScheduleNotSavedError("Schedules couldn't be saved, nothing was booked")
+
+        # Schedules the time budget cut short aren't cached, with more time they can come out better.
+        # Cached before the lock is let go, so an upload waiting for it finds the entry.
+        if key is not None and outputs and solver_cache.outcomes[CUT_OFF] == cut_off:
+            result_cache.put(key, outputs, performances, rejected)
+
+    return outputs, performances, rejected
+
+
+def cached_schedule(key, output):
+    """
+    Schedule of an earlier upload from result_cache. The run still gets its files, the db already has the rows.
+    :param key: str | ResultCache key of the upload
+    :param output: OutputRun of this upload, open
+    :return: InboundColumns, list of slot performances, list of rejected items, None if nothing is cached for key
+    """
+    cached = result_cache.get(key)
+
+    if cached is None:
+        return None
+
+    RESULT_CACHE_LOOKUPS.inc(result="hit")
+    outputs, performances, rejected = cached
+    output.info['cached'] = True
+
+    with stage("output_csv"):
+        write_outputs(output, outputs, performances, rejected)
+
+    return outputs, performances, rejected
+
+
+def schedule_lock():
+    """
+    Incremental uploads read what is left of the slots, schedule into it and save. Two of them doing that at the
+    same time would both see the same free capacity and overbook it, so every process and server sharing the db
+    takes turns through a named lock. Without incremental scheduling every upload gets the whole calendar anyway.
+    :raises DBLockTimeoutError: if another upload still holds the lock after SCHEDULE_LOCK_TIMEOUT seconds
+    :return: context manager
+    """
+    if not INCREMENTAL_SCHEDULING:
+        return nullcontext()
+
+    return named_lock(SCHEDULE_LOCK, SCHEDULE_LOCK_TIMEOUT)
+
+
+def use_windows(engine, pos, slots, min_span):
+    """
+    :param engine: one of ENGINES
+    :param pos: list | PurchaseOrder objects
+    :param slots: list | arranged slots
+    :param min_span: int | seconds of calendar an upload needs to be scheduled window by window, 0 for never
+    :return: boolean | whether schedule_upload schedules and saves window by window
+    """
+    if not min_span or engine != "python" or not slots:
+        return False
+
+    return slots[-1][0][1] - slots[0][0][0] > min_span and len(dock_groups(pos, slots)) <= 1
+
+
+def calculate_schedules_windowed(po_list, slot_list, window=SCHEDULE_WINDOW, solver_cache=None, progress=None,
+                                 on_window=None, po_order="arrival", dock_choice="best_fit", output=None):
+    """
+    Rolling horizon version of calculate_schedules for long calendars. Slots are scheduled window by window and the
+    results of every window are added to the CSV files of the run and saved to db before the next one starts. Only
+    one window of results is held at a time and earlier windows show up in history while later ones are still
+    calculated.
+    Gives the same schedule as calculate_schedules with the python engine.
+    :param po_list: list or iterable of all pos to inbound
+    :param slot_list: list or iterable of all docks available
+    :param window: int | seconds of slot time per window
+    :param solver_cache: SolverCache to reuse knapsack results from, a fresh one is used if not given
+    :param progress: function called after every slot with (slots done, total slots, POs fully placed so far)
+    :param on_window: function called with (outputs, performances) once a window has been saved
+    :param po_order: one of PO_ORDERS
+    :param dock_choice: one of DOCK_CHOICES
+    :param output: OutputRun the files are written to, a new one in OUTPUT_DIR if not given. Not opened yet.
+    :raises ValueError: for an unknown strategy, a window shorter than a second or POs and docks of more than one
+    dock group
+    :return: dict | windows saved, items inbounded, rows saved, windows which couldn't be saved (the run stops at the
+    first one, 0 or 1), items of that window which weren't saved and items no dock can ever take. Solver calls cut
+    off by the time budget are in solver_cache.info().
+    """
+    check_strategy("python", po_order, dock_choice)
+
+    if window <= 0:
+        raise ValueError("Window has to be at least one second")
+
+    if solver_cache is None:
+        solver_cache = SolverCache()
+
+    if output is None:
+        output = OutputRun()
+
+    output.info.update(engine="python", po_order=po_order, dock_choice=dock_choice, window=window)
+
+    with output:
+        summary = _schedule_windowed(
+            po_list, slot_list, window, solver_cache, progress, on_window, po_order, dock_choice, output
+        )
+        output.info['summary'] = summary
+
+    return summary
+
+
+def _schedule_windowed(po_list, slot_list, window, solver_cache, progress, on_window, po_order, dock_choice, output):
+    """
+    Rest of calculate_schedules_windowed once the run directory is open
+    """
+    with stage("arrange"):
+        item_ids = Interner()
+        pos = order_pos(arrange_pos(po_list, item_ids), po_order)
+        slots = arrange_slots(slot_list)
+
+    if slots and len(dock_groups(pos, slots)) > 1:
+        raise ValueError("Windowed scheduling can't split dock groups, schedule every dock group on its own")
+
+    summary, outputs, performances, rejected = _schedule_arranged_windows(
+        pos, item_ids, slots, solver_cache, window, progress, dock_choice, output, on_window
+    )
+    return summary
+
+
+def _schedule_arranged_windows(pos, item_ids, slots, solver_cache, window, progress, dock_choice, output,
+                               on_window=None, keep=False):
+    """
+    Schedules arranged POs of one dock group window by window. Every window is saved to db and then added to the
+    files of the run. The first window which can't be saved stops the run.
+    :param keep: boolean | also give back the results of all saved windows, e.g. for the upload page. Otherwise
+    nothing is kept once a window is saved.
+    :return: summary (see calculate_schedules_windowed), InboundColumns with the inbound results, list of slot
+    performances, list of items no dock can ever take. Results are empty unless keep is set.
+    """
+    summary = {"windows": 0, "inbounded": 0, "saved": 0, "failed_windows": 0, "unsaved": 0, "rejected": 0}
+    kept_outputs = []
+    kept_performances = []
+
+    if solver_cache is None:
+        solver_cache = SolverCache()
 
     if not slots:
-        return []
+        return summary, InboundColumns(0), [], []
+
+    rejected = remove_invalid_items(pos, slots, item_ids)
+    summary['rejected'] = len(rejected)
+    record_rejected(rejected)
+
+    with stage("output_csv"):
+        output.write(REJECTED_FILE, rejected, REJECTED_FIELDS)
+
+    SCHEDULES.inc(engine="python")
+    SCHEDULE_ITEMS.observe(sum(len(po.quantities) for po in pos))
+    SCHEDULE_SLOTS.observe(len(slots))
+
+    solver_before = solver_cache.info()
+    group = single_dock_group(pos, slots)
+
+    # One budget for all windows together
+    solver_cache.start_budget()
+    windows = schedule_windows(pos, slots, item_ids, solver_cache, window, progress, dock_choice)
+
+    # Rows go to the files as every window is done
+    inbound_file = output.table(INBOUND_FILE, InboundColumns.FIELDS)
+    performance_file = output.table(PERFORMANCE_FILE, PERFORMANCE_FIELDS)
+
+    while True:
+        with stage("schedule"):
+            result = next(windows, None)
+
+        if result is None:
+            break
+
+        outputs, performances = result
+
+        with stage("save_inbound"):
+            saved = save_inbound_to_db(outputs, performances, group)
+
+        if saved is False:
+            # Later windows would be scheduled around items which never made it to db and the capacity they take
+            # wouldn't be reserved. The run stops here, this window and everything after it stays unscheduled.
+            windows.close()
+            summary['failed_windows'] += 1
+            summary['unsaved'] = len(outputs)
+            break
+
+        # Files only show what is in db
+        with stage("output_csv"):
+            inbound_file.write_rows(outputs)
+            performance_file.write_rows(performances)
+            inbound_file.flush()
+            performance_file.flush()
+
+        summary['windows'] += 1
+        summary['inbounded'] += len(outputs)
+        summary['saved'] += saved
+
+        if keep:
+            kept_outputs.append(outputs)
+            kept_performances.extend(performances)
+
+        if on_window:
+            on_window(outputs, performances)
+
+    record_solver_calls(solver_cache, solver_before)
+    output.info['solver'] = solver_cache.info()
+    return summary, InboundColumns.concat(kept_outputs), kept_performances, rejected
+
+
+def record_rejected(rejected):
+    """
+    Counts rejected items in metrics
+    :param rejected: list from remove_invalid_items
+    """
+    for row in rejected:
+        ITEMS_REJECTED.inc(reason=row['reason'])
+
+
+def record_solver_calls(solver_cache, before):
+    """
+    Counts solver calls made since before in metrics
+    :param solver_cache: SolverCache
+    :param before: solver_cache.info() from before the calculation
+    """
+    after = solver_cache.info()
+
+    # A shared cache may have been cleared meanwhile, counters never go down
+    SOLVER_CALLS.inc(max(after['hits'] - before['hits'], 0), result="hit")
+    SOLVER_CALLS.inc(max(after['misses'] - before['misses'], 0), result="miss")
+
+    for outcome in (OPTIMAL, APPROXIMATE, CUT_OFF):
+        SOLVER_OUTCOMES.inc(max(after[outcome] - before[outcome], 0), result=outcome)
+
+
+def check_strategy(engine, po_order, dock_choice):
+    """
+    :raises ValueError: for an unknown engine, PO order or dock choice or one the engine can't do
+    """
+    if engine not in ENGINES:
+        raise ValueError("Unknown scheduling engine {}".format(engine))
+    elif po_order not in PO_ORDERS:
+        raise ValueError("Unknown PO order {}".format(po_order))
+    elif dock_choice not in DOCK_CHOICES:
+        raise ValueError("Unknown dock choice {}".format(dock_choice))
+    elif engine == "numpy" and dock_choice != "best_fit":
+        raise ValueError("The numpy engine only does best_fit")
+
+
+def order_pos(pos, po_order):
+    """
+    :param pos: list | PurchaseOrder objects from arrange_pos
+    :param po_order: one of PO_ORDERS
+    :return: list | POs in the order they should get docks, POs with the same total keep their order
+    """
+    if po_order == "largest_first":
+        return sorted(pos, key=lambda po: -sum(po.quantities))
+    elif po_order == "smallest_first":
+        return sorted(pos, key=lambda po: sum(po.quantities))
+
+    return pos
+
+
+def _schedule_arranged(pos, item_ids, slots, solver_cache, engine, progress, dock_choice, output):
+    """
+    Rest of calculate_schedules once POs and slots are arranged
+    :param output: open OutputRun the files are written to
+    :return: inbound results, slot performances, rejected items, what save_inbound_to_db returned
+    """
+    if solver_cache is None:
+        solver_cache = SolverCache()
+
+    if not slots:
+        return [], [], [], None
+
+    rejected = remove_invalid_items(pos, slots, item_ids)
+    record_rejected(rejected)
+
+    SCHEDULES.inc(engine=engine)
+    SCHEDULE_ITEMS.observe(sum(len(po.quantities) for po in pos))
+    SCHEDULE_SLOTS.observe(len(slots))
+    solver_before = solver_cache.info()
+
+    # One budget for the whole calculation, engines and dock groups only start new ones per slot
+    solver_cache.start_budget()
+
+    with stage("schedule"):
+        outputs, performances = schedule_shards(pos, slots, item_ids, solver_cache, engine, progress, dock_choice)
+
+    record_solver_calls(solver_cache, solver_before)
+    output.info['solver'] = solver_cache.info()
+
+    # Now lets save our inbound results to db, slot performances and dock utilisation along with them
+    with stage("save_inbound"):
+        saved = save_inbound_to_db(outputs, performances, single_dock_group(pos, slots))
+
+    # Files only show what is in db
+    if saved is not False:
+        with stage("output_csv"):
+            write_outputs(output, outputs, performances, rejected)
+
+    return outputs, performances, rejected, saved
+
+
+def write_outputs(output, outputs, performances, rejected):
+    """
+    Writes the inbound results, slot performances and rejected items of a run to its files
+    :param output: open OutputRun
+    :param outputs: InboundColumns or iterable of inbound row dicts
+    :param performances: list of slot performances, with dock_group if dock groups were scheduled on their own
+    :param rejected: list of items no dock can ever take
+    """
+    output.write(INBOUND_FILE, outputs, InboundColumns.FIELDS)
+    output.write(PERFORMANCE_FILE, performances, list(performances[0].keys()) if performances else PERFORMANCE_FIELDS)
+    output.write(REJECTED_FILE, rejected, REJECTED_FIELDS)
+
+
+def run_engine(pos, slots, item_ids, solver_cache, engine="python", progress=None, dock_choice="best_fit"):
+    """
+    Schedules arranged POs into arranged slots with one of ENGINES
+    :raises ValueError: for a dock choice the engine can't do
+    :return: InboundColumns with the inbound results, list of slot performances
+    """
+    if engine == "numpy":
+        # Same check as check_strategy, for callers which come in here directly
+        if dock_choice != "best_fit":
+            raise ValueError("The numpy engine only does best_fit")
+
+        # Imported here as numpy is only needed for this engine
+        import numpy_engine
+        return numpy_engine.schedule_slots(pos, slots, item_ids, solver_cache, progress)
+
+    return schedule_slots(pos, slots, item_ids, solver_cache, progress, dock_choice)
+
+
+def dock_groups(pos, slots):
+    """
+    :param pos: list | PurchaseOrder objects
+    :param slots: list | arranged slots
+    :return: set | dock groups of POs and docks
+    """
+    return {po.dock_group for po in pos} | {dock.dock_group for slot, docks in slots for dock in docks}
+
+
+def single_dock_group(pos, slots):
+    """
+    :param pos: list | PurchaseOrder objects
+    :param slots: list | arranged slots
+    :return: str | the dock group of POs and docks if there is only one, slot performances don't name it then.
+    Empty with more than one.
+    """
+    groups = dock_groups(pos, slots)
+    return groups.pop() if len(groups) == 1 else ""
+
+
+def split_shards(pos, slots):
+    """
+    Splits POs and slots by dock group. Slots and docks keep their order.
+    :param pos: list | PurchaseOrder objects
+    :param slots: list | arranged slots
+    :return: list | (dock group, its POs, its slots) for every group with POs and docks, ordered by dock group
+    """
+    group_pos = defaultdict(list)
+
+    for po in pos:
+        group_pos[po.dock_group].append(po)
+
+    group_slots = defaultdict(list)
+
+    for slot, docks in slots:
+        slot_groups = defaultdict(list)
+
+        for dock in docks:
+            slot_groups[dock.dock_group].append(dock)
+
+        for group, group_docks in slot_groups.items():
+            group_slots[group].append((slot, group_docks))
+
+    return [(group, group_pos[group], group_slots[group]) for group in sorted(group_slots) if group in group_pos]
+
+
+def schedule_shards(pos, slots, item_ids, solver_cache, engine="python", progress=None, dock_choice="best_fit",
+                    workers=SHARD_WORKERS):
+    """
+    Schedules every dock group on its own, POs only get docks of their own group. Groups don't share anything, so
+    with more than one they are calculated side by side in worker processes. Results are merged the same way every
+    time: inbounds by slot, slot performances by slot with their dock_group added, ties in dock group order.
+    With a single dock group this is just run_engine.
+    :param pos: list | PurchaseOrder objects from arrange_pos
+    :param slots: list | slots with their docks from arrange_slots
+    :param item_ids: Interner the PO item ids were interned with
+    :param solver_cache: SolverCache, its budget already started. Worker processes use their own with the same time
+    budget and deadline and their counts are added to this one.
+    :param engine: one of ENGINES
+    :param progress: function called with (slots done, total slots, POs fully placed so far). With worker processes
+    it is only called once a whole group is done.
+    :param dock_choice: one of DOCK_CHOICES
+    :param workers: int | processes to schedule groups in, 1 schedules them one after another in this process
+    :return: InboundColumns with the inbound results, list of slot performances
+    """
+    if len(dock_groups(pos, slots)) <= 1:
+        return run_engine(pos, slots, item_ids, solver_cache, engine, progress, dock_choice)
+
+    shards = split_shards(pos, slots)
+    SCHEDULE_SHARDS.observe(len(shards))
+
+    slots_total = sum(len(shard_slots) for group, shard_pos, shard_slots in shards)
+    slots_done = 0
+    placed_pos = 0
+    results = []
+
+    if workers <= 1 or len(shards) <= 1 or sum(len(po.quantities) for po in pos) < SHARD_MIN_ITEMS:
+        for group, shard_pos, shard_slots in shards:
+            def shard_progress(done, total, placed):
+                if progress:
+                    progress(slots_done + done, slots_total, placed_pos + placed)
+
+            outputs, performances, placed = _run_shard(
+                shard_pos, shard_slots, item_ids, solver_cache, engine, dock_choice, shard_progress
+            )
+            results.append((outputs, performances))
+            slots_done += len(shard_slots)
+            placed_pos += placed
+    else:
+        # Spawned, not forked, as the web process runs threads
+        context = multiprocessing.get_context("spawn")
+
+        # perf_counter of another process can't be compared with ours, the deadline goes over as wall clock time
+        deadline = None
+
+        if solver_cache.deadline is not None and solver_cache.budget_scope == "request":
+            deadline = time.time() + solver_cache.deadline - time.perf_counter()
+
+        with ProcessPoolExecutor(max_workers=min(workers, len(shards)), mp_context=context) as executor:
+            futures = [
+                executor.submit(
+                    schedule_shard,
+                    shard_pos,
+                    shard_slots,
+                    item_ids,
+                    engine,
+                    dock_choice,
+                    solver_cache.budget,
+                    solver_cache.budget_scope,
+                    deadline
+                )
+                for group, shard_pos, shard_slots in shards
+            ]
+
+            # Collected in dock group order whichever finishes first
+            for (group, shard_pos, shard_slots), future in zip(shards, futures):
+                outputs, performances, placed, solver_info = future.result()
+                solver_cache.add_counts(solver_info)
+                results.append((outputs, performances))
+                slots_done += len(shard_slots)
+                placed_pos += placed
+
+                if progress:
+                    progress(slots_done, slots_total, placed_pos)
+
+    performances = []
+
+    for (group, shard_pos, shard_slots), (outputs, group_performances) in zip(shards, results):
+        performances.extend(dict(row, dock_group=group) for row in group_performances)
+
+    # Stable, so rows of the same slot stay in dock group order
+    performances.sort(key=lambda row: (row['slot_start_date'], row['slot_end_date']))
+    return InboundColumns.merge([outputs for outputs, group_performances in results]), performances
+
+
+def schedule_shard(pos, slots, item_ids, engine, dock_choice, budget, budget_scope, deadline=None):
+    """
+    Worker process side of schedule_shards
+    :param deadline: float | time.time() the budget of the whole calculation runs out at, None without one
+    :return: inbound results, slot performances, POs fully placed, info() of the solver cache used
+    """
+    solver_cache = SolverCache(budget=budget, budget_scope=budget_scope)
+
+    if deadline is not None:
+        solver_cache.deadline = time.perf_counter() + deadline - time.time()
+    outputs, performances, placed = _run_shard(pos, slots, item_ids, solver_cache, engine, dock_choice)
+    return outputs, performances, placed, solver_cache.info()
+
+
+def _run_shard(pos, slots, item_ids, solver_cache, engine, dock_choice, progress=None):
+    """
+    run_engine which also tells how many POs it fully placed
+    :return: inbound results, slot performances, POs fully placed
+    """
+    placed = [0]
+
+    def shard_progress(slots_done, slots_total, pos_placed):
+        placed[0] = pos_placed
+
+        if progress:
+            progress(slots_done, slots_total, pos_placed)
+
+    outputs, performances = run_engine(pos, slots, item_ids, solver_cache, engine, shard_progress, dock_choice)
+    return outputs, performances, placed[0]
+
+
+def schedule_slots(pos, slots, item_ids, solver_cache, progress=None, dock_choice="best_fit"):
+    """
+    Goes through the slots in order and inbounds PO items to docks using Dock and PurchaseOrder objects.
+    :param pos: list | PurchaseOrder objects from arrange_pos
+    :param slots: list | slots with their docks from arrange_slots
+    :param item_ids: Interner the PO item ids were interned with
+    :param solver_cache: SolverCache
+    :param progress: function called after every slot with (slots done, total slots, POs fully placed so far)
+    :param dock_choice: one of DOCK_CHOICES
+    :return: InboundColumns with the inbound results, list of slot performances
+    """
+    # Without a window everything comes out at once
+    return next(schedule_windows(pos, slots, item_ids, solver_cache, progress=progress, dock_choice=dock_choice))
+
+
+def window_rows(slots, first, window_end, pos, smallest, docks=()):
+    """
+    Most inbound rows a window can give: never more than the items left, and never more than its docks can take
+    of the smallest item left. Keeps the output of a window as big as the window, not as the whole upload.
+    :param slots: list | arranged slots
+    :param first: int | position of the first slot of the window
+    :param window_end: int | epoch the window ends at, None for all slots
+    :param pos: list | POs with items left
+    :param smallest: int | smallest quantity left, None if nothing is left
+    :param docks: Dock objects of earlier windows. Docks a slot doesn't list keep what is left of their capacity
+    and are still filled, so that counts as well.
+    :return: int
+    """
+    items = sum(len(po.quantities) for po in pos)
+
+    if smallest is None:
+        return 0
+
+    fits = sum(dock.capacity // smallest for dock in docks)
+
+    if fits >= items:
+        return items
+
+    for slot, docks in islice(slots, first, None):
+        if window_end is not None and slot[0] >= window_end:
+            break
+
+        fits += sum(dock.capacity // smallest for dock in docks)
+
+        if fits >= items:
+            return items
+
+    return fits
+
+
+def schedule_windows(pos, slots, item_ids, solver_cache, window=None, progress=None, dock_choice="best_fit"):
+    """
+    Same as schedule_slots, but hands out the results every window seconds of slot time. POs which aren't fully
+    inbounded and docks they occupy are carried over into the next window, so all windows together give exactly
+    what schedule_slots gives.
+    :param pos: list | PurchaseOrder objects from arrange_pos
+    :param slots: list | slots with their docks from arrange_slots
+    :param item_ids: Interner the PO item ids were interned with
+    :param solver_cache: SolverCache
+    :param window: int | seconds of slot start times in one window, None for a single window with everything
+    :param progress: function called after every slot with (slots done, total slots, POs fully placed so far)
+    :param dock_choice: one of DOCK_CHOICES
+    :return: generator of InboundColumns with the inbound results and list of slot performances, one per window
+    """
+    choose_dock = get_first_fit_dock if dock_choice == "first_fit" else get_dock_for_po
+    docks = {}
+    dock_index = DockIndex()
+    performances = []
+    placed_pos = 0
+    slots_done = 0
 
     # remove all items which can never be inbounded
-    remove_invalid_items(pos, slots[0])
+    remove_invalid_items(pos, slots)
+
+    # Only POs with items left are looked at. Once a PO is fully inbounded it is dropped from here.
+    active_pos = [po for po in pos if po.has_items()]
+
+    # Docks and slots with less capacity than this can't take anything. It only grows while items are inbounded.
+    smallest = smallest_quantity(active_pos)
+
+    # Windows are counted from the first slot
+    first_start = slots[0][0][0]
+    window_end = first_start + window if window else None
+    outputs = InboundColumns(window_rows(slots, 0, window_end, active_pos, smallest))
 
     # Loop through slots
-    for slot, docks_dict in slots:
+    for position, (slot, docks_dict) in enumerate(slots):
+        solver_cache.start_budget(slot=True)
+
+        if window_end is not None and slot[0] >= window_end:
+            outputs.trim()
+            yield outputs, performances
+
+            window_end = slot[0] - (slot[0] - first_start) % window + window
+
+            # Output of the next window only needs room for what it can take
+            outputs = InboundColumns(window_rows(slots, position, window_end, active_pos, smallest, docks.values()))
+            performances = []
 
         # Instantiate all Docks and append them in separate dic
         for dock in docks_dict:
-            if docks.get(dock['dock_id'], None):
-                docks[dock['dock_id']].set_slot_values(dock['capacity'], dock['slot_start_date'], dock['slot_end_date'])
+            if docks.get(dock.dock_id, None):
+                docks[dock.dock_id].set_slot_values(
+                    dock.capacity,
+                    dock.slot_start_date,
+                    dock.slot_end_date,
+                    dock.slot_capacity
+                )
             else:
-                docks[dock['dock_id']] = Dock(
-                    dock['dock_id'],
-                    dock['slot_start_date'],
-                    dock['slot_end_date'],
-                    dock['capacity'],
-                    dock['max_capacity']
+                docks[dock.dock_id] = Dock(
+                    dock.dock_id,
+                    dock.slot_start_date,
+                    dock.slot_end_date,
+                    dock.capacity,
+                    dock.max_capacity,
+                    dock.slot_capacity
                 )
 
-        # Loop through all pos and inbound them to docks
-        for po in pos:
-            if not po.items:
-                continue
+                # A dock which never has room for the smallest item is never offered to a PO
+                if smallest is not None and dock.max_capacity >= smallest:
+                    dock_index.add(docks[dock.dock_id])
+
+        completed_pos = False
+
+        # Closed slots (or ones where no dock has room for the smallest item left) can't change anything,
+        # POs aren't looked at. The slot still gets its performance.
+        if smallest is None or max(dock.capacity for dock in docks.values()) < smallest:
+            schedule_pos = []
+        else:
+            schedule_pos = active_pos
 
+        # Loop through all pos and inbound them to docks
+        for po in schedule_pos:
             # If a po already belongs to a Dock, which can happen if Po has items bigger then docks slot capacity,
             # then this property of po will be set already
-            if po.dock_id:
+            if po.dock_id is not None:
                 current_dock = docks.get(po.dock_id)
-                items_to_fill = fill_items_in_dock(po.items, current_dock.capacity)
+                items_to_fill = solver_cache.solve(po.quantities, current_dock.capacity, po.fingerprint())
             else:
                 # So our PO is a new one and doesn't belong to any Dock. Lets find a dock for it. And a list of items
                 # in best possible way to inbound for this slot capacity.
-                current_dock, items_to_fill = get_dock_for_po(po.items, docks)
+                current_dock, items_to_fill = choose_dock(po, dock_index, solver_cache)
 
             if not current_dock:
                 # So we couldn't find any dock for our poor po. Don't worry there's always another time to inbound.
@@ -410,9 +1537,13 @@ def calculate_schedules(po_list, slot_list):
             po.set_dock(current_dock.dock_id)
 
             # Now lets inbound items.
+            inbounded = []
+
             for item in items_to_fill:
+                quantity = po.quantities[item]
+
                 # Unloading items...
-                check, message = current_dock.inbound_item_to_dock(item['quantity'])
+                check, message = current_dock.inbound_item_to_dock(quantity)
 
                 if not check:
                     # This is rather shameful with all the checks we have done previously. Lets hope we never come here.
@@ -424,65 +1555,43 @@ def calculate_schedules(po_list, slot_list):
                         continue
                 else:
                     # Alrighty, good part is done. Now lets save our results
-                    outputs.append({
-                        "slot_start_date": current_dock.slot_start_date,
-                        "slot_end_date": current_dock.slot_end_date,
-                        "dock_id": current_dock.dock_id,
-                        "po_id": current_dock.po_id,
-                        "item_id": item["item_id"],
-                        "quantity": item["quantity"],
-                        "dock_current_capacity": current_dock.capacity
-                    })
-
-                    # This is for future development. No need for now.
-                    ItemInbound(
+                    outputs.append(
                         current_dock.slot_start_date,
                         current_dock.slot_end_date,
                         current_dock.dock_id,
                         current_dock.po_id,
-                        item["item_id"],
-                        item['quantity']
+                        item_ids[po.item_ids[item]],
+                        quantity,
+                        current_dock.capacity
                     )
 
                 # So our item was inbounded. Lets remove it from PO
-                item['remove'] = True
+                inbounded.append(item)
 
             # PO should only contain items which aren't yet inbounded
-            po.items = [item for item in po.items if not item.get('remove', False)]
+            po.remove_items(inbounded)
 
             # If all items from PO are in dock, then lets release the dock to be used further
-            if not po.items:
+            if not po.has_items():
                 current_dock.release_dock()
                 po.release_dock()
+                placed_pos += 1
+                completed_pos = True
+
+        if completed_pos:
+            active_pos = [po for po in active_pos if po.has_items()]
+            smallest = smallest_quantity(active_pos)
 
         # Calculate performances.
         performances.append({
-            "slot_start_date": docks_dict[0]['slot_end_date'],
-            "slot_end_date": docks_dict[0]['slot_start_date'],
+            "slot_start_date": format_epoch(docks_dict[0].slot_start_date),
+            "slot_end_date": format_epoch(docks_dict[0].slot_end_date),
             "performance": check_performance(docks)
         })
+        slots_done += 1
 
-    # Save our finding to files. Can be dynamic file names for daily record.
-    output_to_csv(outputs, "po_schedular_output.csv")
-    output_to_csv(performances, "slot_performances.csv")
-
-    # Now lets save our inbound results to db
-    save_inbound_to_db(outputs)
-    return outputs
-
-
-def output_to_csv(outputs, file):
-    """
-    Writes the output to a file
-    :param outputs:
-    :return:
-    """
-    if not outputs:
-        return
-
-    with open(file, 'w+') as f:
-        w = csv.DictWriter(f, outputs[0].keys())
-        w.writeheader()
+        if progress:
+            progress(slots_done, len(slots), placed_pos)
 
-        for output in outputs:
-            w.writerow(output)
+    outputs.trim()
+    yield outputs, performances
@@ -0,0 +1,99 @@
+import io
+import json
+from datetime import date, datetime
+
+import pytest
+
+import app as app_module
+from scheduler import DocksMissingError, ScheduleNotSavedError
+from utils import DBLockTimeoutError
+
+PO_FILE = b"po_id,item_id,quantity\n1000,7,5\n1000,8,3\n"
+
+
+@pytest.fixture
+def client():
+    return app_module.app.test_client()
+
+
+def lines(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def test_schedules_come_as_ndjson_records(client, monkeypatch):
+    calls = []
+
+    def schedule_upload(pos, solver_cache, po_order, dock_choice, output):
+        calls.append((list(pos), po_order, dock_choice))
+        inbound = {"slot_start_date": "2018-08-01 00:00:00", "dock_id": "1", "po_id": "1000", "item_id": "7"}
+        performance = {"slot_start_date": "2018-08-01 00:00:00", "performance": 0.25}
+        rejected = {"po_id": "1000", "item_id": "8", "quantity": 3, "reason": "too_big"}
+        return [inbound], [performance], [rejected]
+
+    monkeypatch.setattr(app_module, "schedule_upload", schedule_upload)
+    response = client.post("/api/schedules?dock_choice=first_fit", data=PO_FILE, content_type="text/csv")
+    records = lines(response)
+
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    assert [record['type'] for record in records] == ["inbound", "performance", "rejected", "solver", "run"]
+    assert records[0]['item_id'] == "7"
+    assert records[3]['cut_off'] == 0
+    assert calls[0][1:] == ("arrival", "first_fit")
+    assert [row['item_id'] for row in calls[0][0]] == ["7", "8"]
+
+
+def test_schedules_are_read_from_a_form_field_as_well(client, monkeypatch):
+    monkeypatch.setattr(app_module, "schedule_upload", lambda *args, **kwargs: ([], [], []))
+    response = client.post("/api/schedules", data={"file": (io.BytesIO(PO_FILE), "pos.csv")})
+
+    assert response.status_code == 200
+    assert [record['type'] for record in lines(response)] == ["solver", "run"]
+
+
+@pytest.mark.parametrize("error, status", [
+    (DocksMissingError("Docks missing"), 400),
+    (DBLockTimeoutError("Lock po_scheduler is busy"), 503),
+    (ScheduleNotSavedError("Schedules couldn't be saved, nothing was booked"), 500),
+    (ValueError("Unknown dock choice"), 400),
+])
+def test_schedule_errors_are_json(client, monkeypatch, error, status):
+    def schedule_upload(*args, **kwargs):
+        raise error
+
+    monkeypatch.setattr(app_module, "schedule_upload", schedule_upload)
+    response = client.post("/api/schedules", data=PO_FILE, content_type="text/csv")
+
+    assert response.status_code == status
+    assert response.get_json()['status'] == status
+
+
+@pytest.mark.parametrize("content, message", [
+    (b"po_id,item_id,quantity\n", "No POs in file"),
+    (b"po_id,item_id\n1000,7\n", "Missing columns: quantity"),
+])
+def test_bad_po_files_are_refused(client, content, message):
+    response = client.post("/api/schedules", data=content, content_type="text/csv")
+
+    assert response.status_code == 400
+    assert message in response.get_json()['message']
+
+
+def test_history_is_streamed_in_batches(client, monkeypatch):
+    rows = [
+        {"slot_start_date": datetime(2018, 8, 1, n // 60, n % 60), "dock_id": "1", "item_id": str(n)}
+        for n in range(app_module.NDJSON_BATCH * 2 + 3)
+    ]
+    filters = []
+
+    def iter_inbounds_from_db(dock_id, date_from, date_to):
+        filters.append((dock_id, date_from, date_to))
+        return iter(rows)
+
+    monkeypatch.setattr(app_module, "iter_inbounds_from_db", iter_inbounds_from_db)
+    response = client.get("/api/history?dock_id=1&date_from=2018-08-01&date_to=bad")
+    records = lines(response)
+
+    assert filters == [("1", date(2018, 8, 1), None)]
+    assert len(records) == len(rows)
+    assert records[61] == {"slot_start_date": "2018-08-01 01:01:00", "dock_id": "1", "item_id": "61"}
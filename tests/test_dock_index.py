@@ -0,0 +1,57 @@
+import random
+
+import pytest
+
+from models import Dock, DockIndex
+
+
+def free_docks(docks):
+    return [dock for dock in docks if dock.is_free()]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_index_follows_docks_as_they_change(seed):
+    rand = random.Random(seed)
+    index = DockIndex()
+    docks = []
+
+    for step in range(300):
+        action = rand.random()
+
+        if action < 0.2 or not docks:
+            dock = Dock(str(len(docks)), 0, 3600, rand.choice((0, rand.randint(1, 50))), max_capacity=50)
+            index.add(dock)
+            docks.append(dock)
+        else:
+            dock = rand.choice(docks)
+
+            if action < 0.4:
+                dock.occupy_dock("po")
+            elif action < 0.6:
+                dock.release_dock()
+            elif action < 0.8:
+                if dock.capacity:
+                    dock.inbound_item_to_dock(rand.randint(1, dock.capacity))
+            else:
+                dock.set_slot_values(rand.randint(0, 50), 3600, 7200)
+
+        free = free_docks(docks)
+        assert index.capacities == sorted({dock.capacity for dock in free})
+
+        # Earliest added dock wins, whichever order docks changed in
+        for capacity in index.capacities:
+            assert index.first_dock(capacity) is min(
+                (dock for dock in free if dock.capacity == capacity), key=lambda dock: dock.rank
+            )
+
+        for capacity in range(0, 52, 3):
+            fitting = [dock for dock in free if dock.capacity >= capacity]
+            expected = min(fitting, key=lambda dock: dock.rank) if fitting else None
+            assert index.first_fit(capacity) is expected
+
+
+def test_empty_index_has_no_dock():
+    index = DockIndex()
+
+    assert index.capacities == []
+    assert index.first_fit(1) is None
@@ -0,0 +1,42 @@
+import pytest
+
+from benchmarks.generators import dock_rows, po_rows
+from knapsack import SolverCache
+from models import Interner
+from scheduler import arrange_pos, arrange_slots, remove_invalid_items, run_engine
+
+# Only the numpy engine needs it, everything else runs without
+pytest.importorskip("numpy")
+
+
+def schedule(engine, pos, docks):
+    item_ids = Interner()
+    arranged = arrange_pos(pos, item_ids)
+    slots = arrange_slots(docks)
+    rejected = remove_invalid_items(arranged, slots, item_ids)
+    outputs, performances = run_engine(arranged, slots, item_ids, SolverCache(), engine)
+    return list(outputs), performances, rejected
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("calendar", [
+    {},
+    {"closed_fraction": 0.2},
+    {"missing_fraction": 0.5, "capacity": (0, 300)},
+])
+def test_numpy_engine_gives_the_same_schedule(seed, calendar):
+    pos = list(po_rows(pos=80, lines=(1, 8), max_quantity=300, invalid_fraction=0.05, seed=seed))
+    docks = list(dock_rows(docks=6, slots_per_day=6, days=2, seed=seed, **calendar))
+
+    python_outputs, python_performances, python_rejected = schedule("python", pos, docks)
+    numpy_outputs, numpy_performances, numpy_rejected = schedule("numpy", pos, docks)
+
+    assert python_outputs
+    assert numpy_outputs == python_outputs
+    assert numpy_performances == python_performances
+    assert numpy_rejected == python_rejected
+
+
+def test_numpy_engine_only_does_best_fit():
+    with pytest.raises(ValueError):
+        run_engine([], [], Interner(), SolverCache(), "numpy", dock_choice="first_fit")
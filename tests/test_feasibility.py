@@ -0,0 +1,68 @@
+import pytest
+
+from benchmarks.generators import dock_rows, po_rows
+from knapsack import SolverCache
+from models import Interner
+from scheduler import arrange_pos, arrange_slots, remove_invalid_items, run_engine
+
+DOCKS = [
+    {"dock_id": "1", "slot_start_date": "2018-08-01 00:00:00", "slot_end_date": "2018-08-01 01:00:00",
+     "capacity": 100, "dock_group": "A"},
+    {"dock_id": "1", "slot_start_date": "2018-08-01 01:00:00", "slot_end_date": "2018-08-01 02:00:00",
+     "capacity": 0, "dock_group": "A"},
+    {"dock_id": "2", "slot_start_date": "2018-08-01 00:00:00", "slot_end_date": "2018-08-01 01:00:00",
+     "capacity": 40, "dock_group": "B"},
+]
+
+
+def test_items_no_dock_can_ever_take_are_rejected_with_a_reason():
+    item_ids = Interner()
+    pos = arrange_pos([
+        {"po_id": "1000", "item_id": "a", "quantity": 100, "dock_group": "A"},
+        {"po_id": "1000", "item_id": "b", "quantity": 101, "dock_group": "A"},
+        {"po_id": "1000", "item_id": "c", "quantity": 0, "dock_group": "A"},
+        {"po_id": "1001", "item_id": "d", "quantity": 41, "dock_group": "B"},
+        {"po_id": "1001", "item_id": "e", "quantity": 40, "dock_group": "B"},
+        {"po_id": "1002", "item_id": "f", "quantity": 5, "dock_group": "C"},
+    ], item_ids)
+
+    rejected = remove_invalid_items(pos, arrange_slots(DOCKS), item_ids)
+
+    assert rejected == [
+        {"po_id": "1000", "item_id": "b", "quantity": 101, "reason": "too_big"},
+        {"po_id": "1000", "item_id": "c", "quantity": 0, "reason": "no_quantity"},
+        {"po_id": "1001", "item_id": "d", "quantity": 41, "reason": "too_big"},
+        {"po_id": "1002", "item_id": "f", "quantity": 5, "reason": "no_docks"},
+    ]
+
+    # Whatever is left can go into some dock of its group
+    assert [[(item_ids[item_id], quantity) for item_id, quantity in po.get_items()] for po in pos] == [
+        [("a", 100)], [("e", 40)], []
+    ]
+
+
+def test_item_ids_stay_interned_without_an_interner():
+    item_ids = Interner()
+    pos = arrange_pos([{"po_id": "1000", "item_id": "a", "quantity": 0, "dock_group": "A"}], item_ids)
+
+    assert remove_invalid_items(pos, arrange_slots(DOCKS))[0]['item_id'] == item_ids.intern("a")
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_pre_pass_doesnt_change_the_schedule(seed):
+    pos = list(po_rows(pos=80, lines=(1, 8), max_quantity=300, invalid_fraction=0.1, seed=seed))
+    docks = list(dock_rows(docks=6, slots_per_day=6, days=2, closed_fraction=0.2, seed=seed))
+    schedules = []
+
+    for pre_pass in (True, False):
+        item_ids = Interner()
+        arranged = arrange_pos(pos, item_ids)
+        slots = arrange_slots(docks)
+
+        if pre_pass:
+            remove_invalid_items(arranged, slots, item_ids)
+
+        outputs, performances = run_engine(arranged, slots, item_ids, SolverCache())
+        schedules.append((list(outputs), performances))
+
+    assert schedules[0] == schedules[1]
@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import scheduler
+from scheduler import decode_cursor, encode_cursor, get_inbounds_from_db
+
+
+def inbound_rows():
+    """item_inbound rows in history order, many share a slot and dock so only the whole key tells them apart"""
+    start = datetime(2018, 8, 1)
+    rows = []
+
+    for slot in range(4):
+        for dock_id in ("1", "10", "2"):
+            for po_id in ("1000", "1001"):
+                for item_id in ("7", "70", "8"):
+                    rows.append({
+                        "slot_start_date": start + timedelta(hours=slot),
+                        "slot_end_date": start + timedelta(hours=slot + 1),
+                        "dock_id": dock_id,
+                        "po_id": po_id,
+                        "item_id": item_id,
+                        "quantity": 1
+                    })
+
+    return sorted(rows, key=lambda row: (row['slot_start_date'], row['dock_id'], row['po_id'], row['item_id']))
+
+
+def fake_item_inbound(rows, queries):
+    """Answers the history page query the way MySQL would, from rows already in history order"""
+    def get_results_as_dict(query, params=None):
+        queries.append((query, params))
+        found = rows
+
+        if 'after_start' in params:
+            after = (params['after_start'], params['after_dock'], params['after_po'], params['after_item'])
+            found = [
+                row for row in found
+                if (row['slot_start_date'], row['dock_id'], row['po_id'], row['item_id']) > after
+            ]
+
+        return [dict(row) for row in found[:params['limit']]]
+
+    return get_results_as_dict
+
+
+@pytest.mark.parametrize("limit", [1, 5, 18, 72, 100])
+def test_pages_go_through_history_once(limit, monkeypatch):
+    rows = inbound_rows()
+    queries = []
+    monkeypatch.setattr(scheduler, "get_results_as_dict", fake_item_inbound(rows, queries))
+
+    seen = []
+    after = None
+
+    while True:
+        page, after = get_inbounds_from_db(after=after, limit=limit)
+        assert len(page) <= limit
+        seen.extend(page)
+
+        if after is None:
+            break
+
+    assert seen == rows
+
+    # One row more than a page is read, so the last page is known without reading an empty one after it
+    assert len(queries) == -(-len(rows) // limit)
+
+
+def test_cursor_round_trip():
+    key = (datetime(2018, 8, 1, 13, 30), "dock 1", "PO/1", "é-7")
+    cursor = encode_cursor(*key)
+
+    assert decode_cursor(cursor) == key
+    assert cursor.isascii()
+    assert "/" not in cursor and "+" not in cursor
+
+
+@pytest.mark.parametrize("cursor", ["", "abc", "!!!!", encode_cursor(datetime(2018, 8, 1), "1", "2", "3")[:-4],
+                                    "WyIyMDE4Il0=", "bm90IGpzb24=", "é"])
+def test_broken_cursors_are_refused(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
@@ -0,0 +1,81 @@
+import random
+
+import pytest
+
+import scheduler
+from benchmarks.generators import dock_rows
+from ingest import to_epoch
+from models import SlotCalendar
+from scheduler import arrange_slots
+
+
+def calendar_state(slots):
+    return [
+        (slot, [(d.dock_id, d.capacity, d.slot_capacity, d.max_capacity, d.dock_group) for d in docks])
+        for slot, docks in slots
+    ]
+
+
+@pytest.fixture
+def docks():
+    return list(dock_rows(docks=5, slots_per_day=4, days=3, groups=2, seed=8))
+
+
+def used_capacities(docks, seed):
+    """Random quantities already inbounded into some slots, a few of them more than the slot had"""
+    rand = random.Random(seed)
+    used = {}
+
+    for row in docks:
+        if rand.random() < 0.5:
+            key = (row['dock_id'], to_epoch(row['slot_start_date']), to_epoch(row['slot_end_date']))
+            used[key] = rand.randint(0, row['capacity'] + 50)
+
+    return used
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_residual_is_what_earlier_inbounds_left_of_open_slots(docks, seed):
+    used = used_capacities(docks, seed)
+    slots = arrange_slots(docks)
+    after = slots[len(slots) // 3][0][1]
+
+    # What the residual capacity query of dock_slots and item_inbound would give
+    rows = []
+
+    for row in docks:
+        key = (row['dock_id'], to_epoch(row['slot_start_date']), to_epoch(row['slot_end_date']))
+
+        if key[2] > after:
+            rows.append(dict(row, slot_capacity=row['capacity'], capacity=max(row['capacity'] - used.get(key, 0), 0)))
+
+    residual = SlotCalendar(slots, "1").residual(used, after)
+
+    assert calendar_state(residual) == calendar_state(arrange_slots(rows))
+    assert all(end > after for (start, end), slot_docks in residual)
+
+
+def test_residual_leaves_the_calendar_as_it_is(docks):
+    slots = arrange_slots(docks)
+    before = calendar_state(slots)
+
+    SlotCalendar(slots, "1").residual(used_capacities(docks, 1), 0)
+
+    assert calendar_state(slots) == before
+
+
+def test_incremental_slots_come_from_the_cached_calendar(docks, monkeypatch):
+    used = used_capacities(docks, 2)
+    calendar = SlotCalendar(arrange_slots(docks), "1")
+
+    monkeypatch.setattr(scheduler, "get_slot_calendar", lambda version=None: calendar)
+    monkeypatch.setattr(scheduler, "get_used_capacities", lambda now: used)
+
+    now = max(row['slot_start_date'] for row in docks)
+
+    assert scheduler.get_scheduling_slots(incremental=False) is calendar.slots
+
+    slots = scheduler.get_scheduling_slots(incremental=True, now=now)
+
+    assert 0 < len(slots) < len(calendar.slots)
+    assert calendar_state(slots) == calendar_state(calendar.residual(used, to_epoch(now)))
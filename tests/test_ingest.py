@@ -0,0 +1,114 @@
+import csv
+import io
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from ingest import InvalidFileError, format_epoch, read_docks, read_pos, to_epoch
+from scheduler import arrange_slots
+
+GOOD_ROWS = 20000
+
+
+def po_file(*lines, rows=GOOD_ROWS):
+    """PO upload with rows good rows first, far more than any read buffer, then lines"""
+    good = "".join("1000,{},5\n".format(n) for n in range(rows)).encode('utf-8')
+    return b"po_id,item_id,quantity\n" + good + b"".join(lines)
+
+
+class Upload:
+    """Same as a werkzeug FileStorage as far as reading goes"""
+
+    def __init__(self, content):
+        self.stream = io.BytesIO(content)
+
+
+@pytest.mark.parametrize("as_upload", [False, True])
+def test_rows_are_read_as_they_come(as_upload):
+    content = b"po_id,item_id,quantity,dock_group\n1000,7,5, B1 \n1000,8,3,\n"
+    rows = list(read_pos(Upload(content) if as_upload else content))
+
+    assert rows == [
+        {"po_id": "1000", "item_id": "7", "quantity": 5, "dock_group": "B1"},
+        {"po_id": "1000", "item_id": "8", "quantity": 3, "dock_group": ""},
+    ]
+
+
+def test_dock_rows_get_dates_and_ints():
+    content = b"dock_id,slot_start_dt,slot_end_dt,capacity\n1,2018-08-01T00:00:00,2018-08-01 01:00:00,100\n"
+
+    assert list(read_docks(content)) == [{
+        "dock_id": "1",
+        "slot_start_date": datetime(2018, 8, 1),
+        "slot_end_date": datetime(2018, 8, 1, 1),
+        "capacity": 100,
+        "dock_group": ""
+    }]
+
+
+def test_missing_columns_are_refused_before_any_row_is_read():
+    with pytest.raises(InvalidFileError, match="Missing columns: quantity"):
+        read_pos(b"po_id,item_id\n1000,7\n")
+
+
+@pytest.mark.parametrize("content", [b"\xff\xfepo_id,item_id,quantity\n", b"po_id,item_id,quantity\n\xff,1,2\n"])
+def test_bytes_which_arent_utf8_are_refused(content):
+    with pytest.raises(InvalidFileError):
+        list(read_pos(content))
+
+
+def test_bad_value_tells_the_line():
+    with pytest.raises(InvalidFileError, match="line {}".format(GOOD_ROWS + 2)):
+        list(read_pos(po_file(b"1000,x,many\n")))
+
+
+def test_bad_bytes_deep_in_an_upload_are_an_invalid_file():
+    rows = read_pos(Upload(po_file(b"1000,\xff\xfe,5\n")))
+
+    with pytest.raises(InvalidFileError, match="not utf-8"):
+        list(rows)
+
+
+def test_broken_csv_deep_in_an_upload_is_an_invalid_file():
+    # One field bigger than the csv module takes
+    huge = b"1000," + b"7" * (csv.field_size_limit() + 1) + b",5\n"
+    rows = read_pos(Upload(po_file(huge)))
+
+    with pytest.raises(InvalidFileError, match="Invalid CSV on line"):
+        list(rows)
+
+
+@pytest.mark.parametrize("value", [
+    "2018-08-01T09:30:00",
+    " 2018-08-01 09:30:00",
+    datetime(2018, 8, 1, 9, 30),
+    datetime(2018, 8, 1, 11, 30, tzinfo=timezone(timedelta(hours=2))),
+])
+def test_times_of_every_kind_give_the_same_epoch(value):
+    epoch = to_epoch(value)
+
+    assert epoch == to_epoch(epoch) == 1533115800
+    assert format_epoch(epoch) == "2018-08-01 09:30:00"
+
+
+def test_slots_are_sorted_by_time_not_by_text():
+    # As text "2018-08-01T..." sorts after "2018-08-01 ..." and a 9 o'clock slot after a 10 o'clock one
+    docks = [
+        {"dock_id": "1", "slot_start_date": "2018-08-01T09:00:00", "slot_end_date": "2018-08-01T10:00:00",
+         "capacity": 5},
+        {"dock_id": "1", "slot_start_date": "2018-08-01 10:00:00", "slot_end_date": "2018-08-01 11:00:00",
+         "capacity": 5},
+        {"dock_id": "2", "slot_start_date": datetime(2018, 8, 1, 8), "slot_end_date": datetime(2018, 8, 1, 10),
+         "capacity": 5},
+        {"dock_id": "2", "slot_start_date": datetime(2018, 8, 1, 8), "slot_end_date": datetime(2018, 8, 1, 9),
+         "capacity": 5},
+    ]
+
+    slots = arrange_slots(docks)
+
+    assert [(format_epoch(start), format_epoch(end)) for (start, end), slot_docks in slots] == [
+        ("2018-08-01 08:00:00", "2018-08-01 09:00:00"),
+        ("2018-08-01 08:00:00", "2018-08-01 10:00:00"),
+        ("2018-08-01 09:00:00", "2018-08-01 10:00:00"),
+        ("2018-08-01 10:00:00", "2018-08-01 11:00:00"),
+    ]
@@ -0,0 +1,110 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import jobs
+import run_output
+import scheduler
+from jobs import JobQueue, run_schedule_job
+
+
+class DictManager:
+    """Same as a multiprocessing manager as far as the queue goes, for workers in this process"""
+
+    def dict(self, **values):
+        return dict(values)
+
+
+@pytest.fixture
+def queue():
+    """JobQueue with worker threads instead of spawned processes"""
+    job_queue = JobQueue(workers=1)
+    job_queue._executor = ThreadPoolExecutor(max_workers=1)
+    job_queue._manager = DictManager()
+
+    yield job_queue
+
+    job_queue._executor.shutdown(wait=True)
+
+
+def wait(job_queue, job_id):
+    job_queue._jobs[job_id]['future'].exception()
+    return job_queue.status(job_id)
+
+
+def test_finished_job_gives_its_progress_and_result(queue, monkeypatch):
+    def run(po_file, progress):
+        progress.update(status="running", slots_done=3, slots_total=3, pos_placed=2)
+        return ["inbound"], ["performance"], []
+
+    monkeypatch.setattr(jobs, "run_schedule_job", run)
+    job_id = queue.submit("pos.csv")
+    status = wait(queue, job_id)
+
+    assert status == {
+        "job_id": job_id, "status": "done", "slots_done": 3, "slots_total": 3, "pos_placed": 2
+    }
+    assert queue.result(job_id) == (["inbound"], ["performance"], [])
+
+
+def test_failed_job_tells_why_and_has_no_result(queue, monkeypatch):
+    def run(po_file, progress):
+        raise scheduler.ScheduleNotSavedError("Schedules couldn't be saved, nothing was booked")
+
+    monkeypatch.setattr(jobs, "run_schedule_job", run)
+    job_id = queue.submit("pos.csv")
+    status = wait(queue, job_id)
+
+    assert status['status'] == "failed"
+    assert status['error'] == "Schedules couldn't be saved, nothing was booked"
+    assert queue.result(job_id) is None
+
+
+def test_unknown_jobs_have_no_status(queue):
+    assert queue.status("missing") is None
+    assert queue.result("missing") is None
+
+
+def test_finished_jobs_are_forgotten_after_a_while(queue, monkeypatch):
+    monkeypatch.setattr(jobs, "run_schedule_job", lambda po_file, progress: ([], [], []))
+    monkeypatch.setattr(jobs, "JOB_RESULTS_TTL", -1)
+
+    first = queue.submit("pos.csv")
+    wait(queue, first)
+    second = queue.submit("pos.csv")
+
+    assert queue.status(first) is None
+    assert queue.status(second) is not None
+
+
+@pytest.mark.parametrize("fails", [False, True])
+def test_worker_reports_progress_and_removes_the_upload(tmp_path, monkeypatch, fails):
+    po_file = tmp_path / "pos.csv"
+    po_file.write_bytes(b"po_id,item_id,quantity\n1000,7,5\n")
+    progress = {}
+
+    def schedule_upload(pos, solver_cache, progress=None, output=None):
+        assert list(pos) == [{"po_id": "1000", "item_id": "7", "quantity": 5, "dock_group": ""}]
+        progress(1, 4, 0)
+
+        if fails:
+            raise scheduler.DocksMissingError("No docks")
+
+        return [], [], []
+
+    monkeypatch.setattr(scheduler, "schedule_upload", schedule_upload)
+    output_run = run_output.OutputRun
+    monkeypatch.setattr(run_output, "OutputRun", lambda: output_run(str(tmp_path / "runs")))
+
+    if fails:
+        with pytest.raises(scheduler.DocksMissingError):
+            run_schedule_job(str(po_file), progress)
+    else:
+        assert run_schedule_job(str(po_file), progress) == ([], [], [])
+        assert progress['solver_optimal'] == 0
+
+    assert progress['status'] == "running"
+    assert (progress['slots_done'], progress['slots_total'], progress['pos_placed']) == (1, 4, 0)
+    assert progress['output_path'].startswith(str(tmp_path / "runs"))
+    assert not os.path.exists(po_file)
@@ -0,0 +1,179 @@
+import random
+import time
+from itertools import combinations
+
+import pytest
+
+import knapsack
+from benchmarks.generators import dock_rows, po_rows
+from knapsack import APPROXIMATE, CUT_OFF, OPTIMAL, SolverCache, solve, solve_anytime
+from models import Interner
+from scheduler import arrange_pos, arrange_slots, run_engine
+
+
+def best_fill(quantities, capacity):
+    """Biggest sum of any subset of quantities which fits, tried one subset after another"""
+    best = 0
+
+    for size in range(len(quantities) + 1):
+        for subset in combinations(quantities, size):
+            total = sum(subset)
+
+            if best < total <= capacity:
+                best = total
+
+    return best
+
+
+def filled(quantities, chosen):
+    assert chosen == sorted(set(chosen))
+    return sum(quantities[i] for i in chosen)
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_exact_solver_finds_best_fill(seed):
+    rand = random.Random(seed)
+    quantities = [rand.choice((0, rand.randint(1, 60))) for n in range(rand.randint(1, 10))]
+    capacity = rand.randint(0, 150)
+
+    chosen, how = solve_anytime(quantities, capacity)
+
+    assert how == OPTIMAL
+    assert filled(quantities, chosen) == best_fill(quantities, capacity)
+
+
+def test_items_which_can_never_fit_are_left_out():
+    assert solve([0, 5, 11, 3], 10) == [1, 3]
+    assert solve([4, 4], 0) == []
+
+
+def test_cache_maps_results_back_to_the_order_items_came_in():
+    cache = SolverCache()
+    quantities = [7, 3, 5, 9]
+
+    first = cache.solve(quantities, 12)
+    again = cache.solve(list(reversed(quantities)), 12)
+
+    assert filled(quantities, first) == 12
+    assert filled(list(reversed(quantities)), again) == 12
+    assert cache.hits == 1
+
+
+@pytest.mark.parametrize("epsilon", [0.01, 0.2, 0.5])
+@pytest.mark.parametrize("seed", range(50))
+def test_approximate_solver_is_within_epsilon_of_best_fill(seed, epsilon, monkeypatch):
+    # Small enough limit that every problem here is approximated
+    monkeypatch.setattr(knapsack, "EXACT_SOLVER_LIMIT", 50)
+    monkeypatch.setattr(knapsack, "SOLVER_EPSILON", epsilon)
+    rand = random.Random(seed)
+    quantities = [rand.randint(1, 400) for n in range(rand.randint(3, 12))]
+    capacity = rand.randint(max(quantities), sum(quantities) - 1)
+
+    chosen, how = solve_anytime(quantities, capacity)
+
+    assert how in (APPROXIMATE, OPTIMAL)
+    assert (1 - epsilon) * best_fill(quantities, capacity) <= filled(quantities, chosen) <= capacity
+
+
+def test_approximate_solver_does_better_than_greedy(monkeypatch):
+    monkeypatch.setattr(knapsack, "EXACT_SOLVER_LIMIT", 50)
+
+    # Biggest first only gets to 85
+    chosen, how = solve_anytime([51, 34, 33, 33, 50], 100)
+
+    assert how == APPROXIMATE
+    assert filled([51, 34, 33, 33, 50], chosen) == 100
+
+
+@pytest.mark.parametrize("limit", [knapsack.EXACT_SOLVER_LIMIT, 50])
+@pytest.mark.parametrize("seed", range(50))
+def test_cut_off_solver_never_overfills(seed, limit, monkeypatch):
+    # A deadline which has already passed stops the DP before its first item, exact or approximate
+    monkeypatch.setattr(knapsack, "EXACT_SOLVER_LIMIT", limit)
+    rand = random.Random(seed)
+    quantities = [rand.randint(1, 400) for n in range(rand.randint(3, 12))]
+    capacity = rand.randint(max(quantities), sum(quantities) - 1)
+
+    chosen, how = solve_anytime(quantities, capacity, deadline=time.perf_counter() - 1)
+
+    assert filled(quantities, chosen) <= capacity
+    assert filled(quantities, chosen) <= best_fill(quantities, capacity)
+
+    if how == OPTIMAL:
+        # Greedy already filled the dock completely
+        assert filled(quantities, chosen) == capacity
+    elif how == APPROXIMATE:
+        # Greedy already came within epsilon of a full dock
+        assert filled(quantities, chosen) * (1 + knapsack.SOLVER_EPSILON) >= capacity
+
+
+def test_solver_with_time_left_still_finds_best_fill():
+    quantities = [31, 17, 29, 5, 44, 12]
+    chosen, how = solve_anytime(quantities, 90, deadline=time.perf_counter() + 60)
+
+    assert how == OPTIMAL
+    assert filled(quantities, chosen) == best_fill(quantities, 90)
+
+
+def test_cut_off_results_are_not_cached():
+    cache = SolverCache(budget=0.5)
+    cache.deadline = time.perf_counter() - 1
+    quantities = [31, 17, 29, 5, 44, 12]
+
+    cache.solve(quantities, 90)
+    assert cache.outcomes[CUT_OFF] == 1
+
+    # With time again the same call is solved for real instead of answered from the cut off result
+    cache.deadline = None
+    chosen = cache.solve(quantities, 90)
+
+    assert cache.hits == 0
+    assert filled(quantities, chosen) == best_fill(quantities, 90)
+
+
+def test_least_recently_used_results_are_dropped_first():
+    cache = SolverCache(maxsize=2)
+
+    cache.solve([5, 7], 10)
+    cache.solve([3, 9], 10)
+    cache.solve([7, 5], 10)
+    cache.solve([4, 8], 10)
+
+    # [3, 9] was used longest ago
+    assert (cache.hits, cache.misses) == (1, 3)
+    assert cache.info()['size'] == 2
+
+    cache.solve([5, 7], 10)
+    cache.solve([3, 9], 10)
+
+    assert (cache.hits, cache.misses) == (2, 4)
+
+
+def test_cleared_cache_starts_over():
+    cache = SolverCache()
+    cache.solve([5, 7], 10)
+    cache.solve([5, 7], 10)
+
+    cache.clear()
+
+    assert cache.info() == {
+        "hits": 0, "misses": 0, "size": 0, "maxsize": cache.maxsize, OPTIMAL: 0, APPROXIMATE: 0, CUT_OFF: 0
+    }
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_cached_results_give_the_same_schedule(seed):
+    # Small POs and docks which all start with the same capacity, the same items meet the same capacity again
+    pos = list(po_rows(pos=150, lines=(1, 3), max_quantity=60, seed=seed))
+    docks = list(dock_rows(docks=4, slots_per_day=6, days=2, capacity=(100, 100), seed=seed))
+    schedules = []
+
+    # Nothing is kept with maxsize 0, every call is solved again
+    for cache in (SolverCache(), SolverCache(maxsize=0)):
+        item_ids = Interner()
+        outputs, performances = run_engine(arrange_pos(pos, item_ids), arrange_slots(docks), item_ids, cache)
+        schedules.append((list(outputs), performances, cache.hits))
+
+    assert schedules[0][:2] == schedules[1][:2]
+    assert schedules[0][2] > 0
+    assert schedules[1][2] == 0
@@ -0,0 +1,74 @@
+import pytest
+
+import metrics
+from metrics import Counter, Histogram
+
+
+@pytest.fixture(autouse=True)
+def registry(monkeypatch):
+    """Metrics made by a test only show up while it runs"""
+    monkeypatch.setattr(metrics, "_registry", list(metrics._registry))
+
+
+def test_counter_adds_up_per_label():
+    counter = Counter("test_rows_total", "Rows", ["table"])
+    counter.inc(table="item_inbound")
+    counter.inc(4, table="item_inbound")
+    counter.inc(table='dock "slots"')
+
+    assert counter.render() == [
+        "# HELP test_rows_total Rows",
+        "# TYPE test_rows_total counter",
+        'test_rows_total{table="dock \\"slots\\""} 1',
+        'test_rows_total{table="item_inbound"} 5',
+    ]
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("test_seconds", "Seconds", buckets=(1, 5))
+
+    for value in (0.5, 1, 3, 7):
+        histogram.observe(value)
+
+    assert histogram.render()[2:] == [
+        'test_seconds_bucket{le="1"} 2',
+        'test_seconds_bucket{le="5"} 3',
+        'test_seconds_bucket{le="+Inf"} 4',
+        "test_seconds_sum 11.5",
+        "test_seconds_count 4",
+    ]
+
+
+def test_nothing_is_recorded_when_disabled(monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_ENABLED", False)
+    counter = Counter("test_disabled_total", "Disabled")
+    counter.inc()
+
+    assert counter.render() == ["# HELP test_disabled_total Disabled", "# TYPE test_disabled_total counter"]
+
+
+def test_stages_are_timed():
+    def count(stage):
+        counts = metrics.STAGE_SECONDS._values.get((stage,))
+        return sum(counts[:-1]) if counts else 0
+
+    before = count("test_stage")
+
+    with metrics.stage("test_stage"):
+        pass
+
+    assert count("test_stage") == before + 1
+
+
+def test_metrics_route_shows_request_latencies():
+    from app import app
+
+    client = app.test_client()
+    client.get("/metrics")
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    assert 'po_scheduler_http_request_seconds_count{endpoint="metrics_view",method="GET",status="200"}' in (
+        response.get_data(as_text=True)
+    )
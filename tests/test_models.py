@@ -0,0 +1,99 @@
+import pickle
+
+import pytest
+
+from ingest import to_epoch
+from models import Dock, InboundColumns, Interner, PurchaseOrder
+from scheduler import arrange_pos
+
+START = to_epoch("2018-08-01 00:00:00")
+END = to_epoch("2018-08-01 01:00:00")
+
+
+def inbounds(rows, max_rows=None):
+    columns = InboundColumns(len(rows) if max_rows is None else max_rows)
+
+    for row in rows:
+        columns.append(*row)
+
+    return columns
+
+
+def test_models_have_no_instance_dict():
+    for obj in (Dock("1", START, END, 10), PurchaseOrder("1000"), InboundColumns(0), Interner()):
+        with pytest.raises(AttributeError):
+            obj.anything = 1
+
+
+def test_pos_keep_interned_items_in_order():
+    item_ids = Interner()
+    pos = arrange_pos([
+        {"po_id": "1000", "item_id": "a", "quantity": "5", "dock_group": "B1"},
+        {"po_id": "1001", "item_id": "b", "quantity": 3},
+        {"po_id": "1000", "item_id": "b", "quantity": 7, "dock_group": "B2"},
+    ], item_ids)
+
+    assert [(po.po_id, po.dock_group) for po in pos] == [("1000", "B1"), ("1001", "")]
+    assert [(item_ids[item_id], quantity) for item_id, quantity in pos[0].get_items()] == [("a", 5), ("b", 7)]
+    assert pos[0].item_ids.typecode == pos[0].quantities.typecode == 'q'
+    assert item_ids.intern("b") == pos[1].item_ids[0]
+
+
+def test_removed_items_drop_the_fingerprint():
+    po = PurchaseOrder("1000")
+
+    for item_id, quantity in enumerate((9, 4, 6, 2)):
+        po.insert_item(item_id, quantity)
+
+    assert po.fingerprint().quantities == (2, 4, 6, 9)
+
+    po.remove_items([0, 2])
+
+    assert po.get_items() == [(1, 4), (3, 2)]
+    assert po.fingerprint().quantities == (2, 4)
+    assert po.fingerprint() is po.fingerprint()
+
+
+def test_rows_come_with_formatted_times():
+    columns = inbounds([(START, END, "D1", "1000", "a", 5, 95)], max_rows=4)
+    row = {
+        "slot_start_date": "2018-08-01 00:00:00",
+        "slot_end_date": "2018-08-01 01:00:00",
+        "dock_id": "D1",
+        "po_id": "1000",
+        "item_id": "a",
+        "quantity": 5,
+        "dock_current_capacity": 95
+    }
+
+    assert len(columns) == 1
+    assert list(columns) == [row]
+    assert columns[0] == columns[-1] == row
+
+    with pytest.raises(IndexError):
+        columns[1]
+
+
+def test_extend_adds_the_rows_of_one_dock_and_po():
+    columns = InboundColumns(5)
+    columns.extend(START, END, "D1", "1000", ["a", "b"], [5, 3], [95, 92])
+
+    assert [(row['item_id'], row['quantity'], row['dock_current_capacity']) for row in columns] == [
+        ("a", 5, 95), ("b", 3, 92)
+    ]
+
+
+def test_only_rows_are_trimmed_pickled_and_joined():
+    first = inbounds([(START, END, "D1", "1000", "a", 5, 95)], max_rows=3)
+    second = inbounds([(START, END, "D2", "1001", "b", 4, 6), (END, END + 3600, "D2", "1001", "c", 1, 5)], 4)
+
+    copy = pickle.loads(pickle.dumps(second))
+    assert len(copy.dock_id) == 2
+    assert list(copy) == list(second)
+
+    joined = InboundColumns.concat([first, second])
+    assert list(joined) == list(first) + list(second)
+    assert list(InboundColumns.from_columns(joined.to_columns())) == list(joined)
+
+    second.trim()
+    assert len(second.quantity) == 2
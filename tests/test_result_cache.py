@@ -0,0 +1,105 @@
+from contextlib import contextmanager
+
+import pytest
+
+import scheduler
+from benchmarks.generators import dock_rows, po_rows
+from knapsack import SolverCache
+from result_cache import ResultCache
+from run_output import OutputRun
+
+
+@pytest.fixture
+def upload(tmp_path, monkeypatch):
+    """schedule_upload against an in memory calendar, counting saves. The calendar version can be changed."""
+    docks = list(dock_rows(docks=4, slots_per_day=6, days=2, seed=5))
+    state = {"version": "1", "saves": 0}
+
+    def save(outputs, *args):
+        state['saves'] += 1
+        return False if state.get('failing') else len(outputs)
+
+    monkeypatch.setattr(scheduler, "result_cache", ResultCache(str(tmp_path / "cache")))
+    monkeypatch.setattr(scheduler, "named_lock", lambda *args: scheduler.nullcontext())
+    monkeypatch.setattr(scheduler, "get_dock_slots_version", lambda: state['version'])
+    monkeypatch.setattr(scheduler, "get_scheduling_slots", lambda version=None: scheduler.arrange_slots(docks))
+    monkeypatch.setattr(scheduler, "save_inbound_to_db", save)
+
+    def run(solver_cache=None):
+        output = OutputRun(str(tmp_path / "runs"))
+        outputs, performances, rejected = scheduler.schedule_upload(
+            list(po_rows(pos=40, lines=(1, 6), max_quantity=300, seed=5)), solver_cache, output=output
+        )
+        return list(outputs), output.info['cached']
+
+    run.state = state
+    return run
+
+
+def test_same_upload_is_answered_from_the_cache(upload):
+    first, cached = upload()
+    again, cached_again = upload()
+
+    assert first and again == first
+    assert (cached, cached_again) == (False, True)
+    assert upload.state['saves'] == 1
+
+
+def test_new_dock_calendar_version_is_scheduled_again(upload):
+    upload()
+    upload.state['version'] = "2"
+
+    rows, cached = upload()
+
+    assert rows
+    assert not cached
+    assert upload.state['saves'] == 2
+
+
+def test_upload_waiting_for_the_same_upload_takes_its_schedule(upload, monkeypatch):
+    first = []
+    waiting = []
+
+    @contextmanager
+    def busy(*args):
+        # The first upload still holds the lock when this one comes in and finishes while it waits
+        if not waiting:
+            waiting.append(True)
+            first.append(upload())
+
+        yield
+
+    monkeypatch.setattr(scheduler, "named_lock", busy)
+    rows, cached = upload()
+
+    assert cached
+    assert rows == first[0][0]
+    assert upload.state['saves'] == 1
+
+
+def test_schedules_cut_short_by_the_time_budget_are_not_cached(upload, monkeypatch):
+    solver_cache = SolverCache(budget=1)
+
+    # Every solver call runs out of time
+    monkeypatch.setattr(solver_cache, "start_budget", lambda slot=False: setattr(solver_cache, "deadline", 0))
+    upload(solver_cache)
+    assert solver_cache.outcomes['cut_off']
+
+    rows, cached = upload()
+
+    assert not cached
+    assert upload.state['saves'] == 2
+
+
+def test_schedules_which_arent_saved_fail_and_are_not_cached(upload):
+    upload.state['failing'] = True
+
+    with pytest.raises(scheduler.ScheduleNotSavedError):
+        upload()
+
+    upload.state['failing'] = False
+    rows, cached = upload()
+
+    assert rows
+    assert not cached
+    assert upload.state['saves'] == 2
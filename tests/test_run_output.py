@@ -0,0 +1,98 @@
+import csv
+import gzip
+import json
+import os
+import time
+
+import pytest
+
+from run_output import MANIFEST, OutputRun, directory_size, file_checksum, rotate_runs
+
+
+def manifest(run):
+    with open(os.path.join(run.path, MANIFEST)) as f:
+        return json.load(f)
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_run_writes_its_files_and_a_manifest(tmp_path, compress):
+    run = OutputRun(str(tmp_path), compress=compress)
+    run.info['engine'] = "python"
+
+    with run:
+        run.write("inbound", iter([{"po_id": "1000", "quantity": 5}, {"po_id": "1001", "quantity": 3}]))
+        run.write("inbound", [{"po_id": "1002", "quantity": 1}])
+        run.write("rejected", [], ["po_id", "reason"])
+
+    name = "inbound.csv.gz" if compress else "inbound.csv"
+    path = os.path.join(run.path, name)
+
+    with (gzip.open(path, 'rt', newline='') if compress else open(path, newline='')) as f:
+        assert list(csv.DictReader(f)) == [
+            {"po_id": "1000", "quantity": "5"}, {"po_id": "1001", "quantity": "3"}, {"po_id": "1002", "quantity": "1"}
+        ]
+
+    files = manifest(run)['files']
+    assert files[name]['rows'] == 3
+    assert files[name]['sha256'] == file_checksum(path)
+    assert files["rejected.csv.gz" if compress else "rejected.csv"]['rows'] == 0
+    assert manifest(run)['status'] == "done"
+    assert manifest(run)['info'] == {"engine": "python"}
+
+
+def test_runs_never_share_a_directory(tmp_path):
+    assert OutputRun(str(tmp_path)).path != OutputRun(str(tmp_path)).path
+
+
+def test_failed_run_says_so(tmp_path):
+    run = OutputRun(str(tmp_path))
+
+    with pytest.raises(RuntimeError):
+        with run:
+            run.write("inbound", [{"po_id": "1000"}])
+            raise RuntimeError("Scheduling failed")
+
+    assert manifest(run)['status'] == "failed"
+
+
+def finished_run(directory, age, size=0):
+    run = OutputRun(str(directory))
+
+    with run:
+        run.write("inbound", [{"padding": "x" * size}])
+
+    finished = time.time() - age
+    os.utime(os.path.join(run.path, MANIFEST), (finished, finished))
+    return run
+
+
+def test_old_runs_are_rotated_away(tmp_path):
+    old = finished_run(tmp_path, age=3600)
+    new = finished_run(tmp_path, age=0)
+    running = OutputRun(str(tmp_path))
+    running.__enter__()
+
+    rotate_runs(str(tmp_path), max_age=60, max_bytes=10 ** 9)
+
+    # Runs without a manifest are still going
+    assert old.run_id not in os.listdir(tmp_path)
+    assert sorted(os.listdir(tmp_path)) == sorted([new.run_id, running.run_id])
+
+
+def test_oldest_runs_go_first_above_the_size_limit(tmp_path):
+    runs = [finished_run(tmp_path, age=age, size=1000) for age in (30, 20, 10)]
+
+    # Room for two runs only, the oldest one is kept on purpose so the middle one goes
+    max_bytes = directory_size(runs[0].path) + directory_size(runs[2].path)
+    rotate_runs(str(tmp_path), max_age=3600, max_bytes=max_bytes, keep=runs[0].run_id)
+
+    assert sorted(os.listdir(tmp_path)) == sorted([runs[0].run_id, runs[2].run_id])
+
+
+def test_rows_without_fields_take_them_from_the_first_row(tmp_path):
+    with OutputRun(str(tmp_path)) as run:
+        table = run.table("performance")
+        table.write_rows([{"slot": "1", "performance": 0.5}])
+
+    with open(table.path, newline='') as f:
+        assert f.read() == "slot,performance\r\n1,0.5\r\n"
@@ -0,0 +1,68 @@
+import pytest
+
+from benchmarks.generators import dock_rows, po_rows
+from knapsack import SolverCache
+from models import Interner
+from scenarios import STRATEGIES, mean_performance, run_scenarios
+from scheduler import arrange_pos, arrange_slots, order_pos, remove_invalid_items, schedule_shards
+
+
+@pytest.fixture
+def pos():
+    return list(po_rows(pos=60, lines=(1, 8), max_quantity=300, invalid_fraction=0, seed=6))
+
+
+@pytest.fixture
+def slots():
+    return arrange_slots(dock_rows(docks=4, slots_per_day=6, days=2, seed=6))
+
+
+def test_every_strategy_is_ranked(pos, slots):
+    results = run_scenarios(pos, slots, workers=1)
+
+    assert sorted((row['po_order'], row['dock_choice']) for row in results) == sorted(
+        (strategy['po_order'], strategy['dock_choice']) for strategy in STRATEGIES
+    )
+    assert [row['rank'] for row in results] == list(range(1, len(STRATEGIES) + 1))
+
+    # Fewest unplaced items first, then the least capacity left unused
+    keys = [(row['items_unplaced'], row['mean_performance']) for row in results]
+    assert keys == sorted(keys)
+
+
+@pytest.mark.parametrize("strategy", STRATEGIES)
+def test_strategy_gives_the_same_schedule_as_scheduling_with_it(pos, slots, strategy):
+    [row] = run_scenarios(pos, slots, [strategy], workers=1)
+
+    item_ids = Interner()
+    arranged = arrange_pos(pos, item_ids)
+    remove_invalid_items(arranged, slots, item_ids)
+    outputs, performances = schedule_shards(
+        order_pos(arranged, strategy['po_order']), slots, item_ids, SolverCache(),
+        dock_choice=strategy['dock_choice'], workers=1
+    )
+
+    assert row['items_placed'] == len(outputs)
+    assert row['items_placed'] + row['items_unplaced'] == len(pos)
+    assert row['mean_performance'] == mean_performance(performances)
+
+
+def test_slots_are_left_as_they_are(pos, slots):
+    before = [(slot, [(dock.dock_id, dock.capacity) for dock in docks]) for slot, docks in slots]
+    run_scenarios(pos, slots, workers=1)
+
+    assert [(slot, [(dock.dock_id, dock.capacity) for dock in docks]) for slot, docks in slots] == before
+
+
+def test_unknown_strategies_are_refused(pos, slots):
+    with pytest.raises(ValueError):
+        run_scenarios(pos, slots, [{"po_order": "random", "dock_choice": "best_fit"}], workers=1)
+
+
+def test_no_slots_no_scenarios(pos):
+    assert run_scenarios(pos, [], workers=1) == []
+
+
+def test_mean_performance_leaves_closed_slots_out():
+    assert mean_performance([{"performance": 0.5}, {"performance": None}, {"performance": 0.25}]) == 0.375
+    assert mean_performance([{"performance": None}]) is None
@@ -0,0 +1,77 @@
+import pytest
+
+import scheduler
+from benchmarks.generators import dock_rows, po_rows
+from knapsack import SolverCache
+from models import Interner
+from scheduler import arrange_pos, arrange_slots, remove_invalid_items, run_engine, schedule_shards
+
+
+@pytest.fixture
+def pos():
+    return list(po_rows(pos=90, lines=(1, 8), max_quantity=300, groups=3, seed=4))
+
+
+@pytest.fixture
+def docks():
+    return list(dock_rows(docks=9, slots_per_day=6, days=2, groups=3, seed=4))
+
+
+def arranged(pos, docks):
+    item_ids = Interner()
+    arranged_pos = arrange_pos(pos, item_ids)
+    slots = arrange_slots(docks)
+    rejected = remove_invalid_items(arranged_pos, slots, item_ids)
+    return arranged_pos, slots, item_ids, rejected
+
+
+def test_dock_groups_are_scheduled_on_their_own_and_merged_by_slot(pos, docks):
+    expected = []
+    expected_performances = []
+
+    # Every group by itself, in dock group order
+    for group in ("G0", "G1", "G2"):
+        group_pos, slots, item_ids, rejected = arranged(
+            [row for row in pos if row['dock_group'] == group], [row for row in docks if row['dock_group'] == group]
+        )
+        outputs, performances = run_engine(group_pos, slots, item_ids, SolverCache())
+        expected.extend(outputs)
+        expected_performances.extend(dict(row, dock_group=group) for row in performances)
+
+    all_pos, slots, item_ids, rejected = arranged(pos, docks)
+    outputs, performances = schedule_shards(all_pos, slots, item_ids, SolverCache(), workers=1)
+
+    # Sorting is stable, so rows of the same slot stay in dock group order
+    assert list(outputs) == sorted(expected, key=lambda row: (row['slot_start_date'], row['slot_end_date']))
+    assert performances == sorted(
+        expected_performances, key=lambda row: (row['slot_start_date'], row['slot_end_date'])
+    )
+
+
+def test_worker_processes_give_the_same_schedule(pos, docks, monkeypatch):
+    all_pos, slots, item_ids, rejected = arranged(pos, docks)
+    expected, expected_performances = schedule_shards(all_pos, slots, item_ids, SolverCache(), workers=1)
+
+    monkeypatch.setattr(scheduler, "SHARD_MIN_ITEMS", 0)
+    solver_cache = SolverCache()
+    all_pos, slots, item_ids, rejected = arranged(pos, docks)
+    outputs, performances = schedule_shards(all_pos, slots, item_ids, solver_cache, workers=2)
+
+    assert list(outputs) == list(expected)
+    assert performances == expected_performances
+
+    # Solver counts of the workers are added up here
+    assert solver_cache.misses
+
+
+def test_pos_of_a_group_without_docks_are_rejected(pos, docks):
+    all_pos, slots, item_ids, rejected = arranged(pos, [row for row in docks if row['dock_group'] != "G1"])
+    outputs, performances = schedule_shards(all_pos, slots, item_ids, SolverCache(), workers=1)
+
+    g1_pos = {row['po_id'] for row in pos if row['dock_group'] == "G1"}
+    no_docks = [row for row in rejected if row['reason'] == "no_docks"]
+
+    assert {row['po_id'] for row in no_docks} == g1_pos
+    assert len(no_docks) == len([row for row in pos if row['dock_group'] == "G1" and row['quantity'] > 0])
+    assert not [row for row in outputs if row['po_id'] in g1_pos]
+    assert {row['dock_group'] for row in performances} == {"G0", "G2"}
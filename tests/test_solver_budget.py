@@ -0,0 +1,56 @@
+import pytest
+
+import knapsack
+import scheduler
+from benchmarks.generators import dock_rows, po_rows
+from benchmarks.stub_db import StubDB
+from knapsack import SolverCache
+from run_output import OutputRun
+
+
+@pytest.fixture
+def deadlines(monkeypatch):
+    """Deadline of every solver call which isn't answered from the cache"""
+    seen = []
+    solve_anytime = knapsack.solve_anytime
+
+    def recording(quantities, capacity, deadline=None):
+        seen.append(deadline)
+        return solve_anytime(quantities, capacity, deadline)
+
+    monkeypatch.setattr(knapsack, "solve_anytime", recording)
+    return seen
+
+
+def calculate(solver_cache, tmp_path, engine="python"):
+    pos = list(po_rows(pos=60, lines=(1, 8), max_quantity=300, groups=3, seed=2))
+    docks = list(dock_rows(docks=9, slots_per_day=6, days=2, groups=3, seed=2))
+
+    with StubDB(docks).installed():
+        scheduler.calculate_schedules(pos, docks, solver_cache, engine=engine, output=OutputRun(str(tmp_path)))
+
+
+@pytest.mark.parametrize("engine", ["python", "numpy"])
+def test_request_budget_is_shared_by_all_dock_groups(engine, deadlines, tmp_path, monkeypatch):
+    if engine == "numpy":
+        pytest.importorskip("numpy")
+
+    # Dock groups one after another in this process
+    monkeypatch.setattr(scheduler, "SHARD_MIN_ITEMS", 10 ** 9)
+    calculate(SolverCache(budget=600, budget_scope="request"), tmp_path, engine)
+
+    assert deadlines
+    assert len(set(deadlines)) == 1
+
+
+def test_slot_budget_starts_again_every_slot(deadlines, tmp_path, monkeypatch):
+    monkeypatch.setattr(scheduler, "SHARD_MIN_ITEMS", 10 ** 9)
+    calculate(SolverCache(budget=600, budget_scope="slot"), tmp_path)
+
+    assert len(set(deadlines)) > 1
+
+
+def test_no_budget_no_deadline(deadlines, tmp_path):
+    calculate(SolverCache(budget=0), tmp_path)
+
+    assert set(deadlines) == {None}
@@ -0,0 +1,95 @@
+from contextlib import contextmanager
+from datetime import date, datetime
+
+import pytest
+
+import scheduler
+from scheduler import REFRESH_DAILY_UTILISATION, day_range, track_slot_days
+
+
+class RecordingWriter:
+    """Takes the same calls as utils.BulkWriter and keeps what was executed"""
+
+    batch_size = 5000
+
+    def __init__(self):
+        self.inserted = {}
+        self.executed = []
+
+    def insert(self, table, columns, rows, ignore_duplicates=False, replace_duplicates=False):
+        self.inserted[table] = list(rows)
+        return len(self.inserted[table])
+
+    def execute(self, query, params=None):
+        self.executed.append((query, params))
+        return 0
+
+
+@pytest.fixture
+def writer(monkeypatch):
+    recording = RecordingWriter()
+
+    @contextmanager
+    def bulk_writer(*args, **kwargs):
+        yield recording
+
+    monkeypatch.setattr(scheduler, "bulk_writer", bulk_writer)
+    return recording
+
+
+def refreshes(writer):
+    return [params for query, params in writer.executed if query == REFRESH_DAILY_UTILISATION]
+
+
+def test_slot_days_are_noted_while_rows_go_through():
+    rows = [
+        {"slot_start_date": "2018-08-02 10:00:00"},
+        {"slot_start_date": "2018-08-01 23:00:00"},
+        {"slot_start_date": "2018-08-04 00:00:00"},
+    ]
+    days = {}
+
+    assert list(track_slot_days(rows, days)) == rows
+    assert days == {"first": "2018-08-01 23:00:00", "last": "2018-08-04 00:00:00"}
+
+
+def test_no_rows_no_days():
+    days = {}
+
+    assert list(track_slot_days([], days)) == []
+    assert days == {}
+
+
+@pytest.mark.parametrize("first, last", [
+    ("2018-08-01 23:00:00", "2018-08-04 00:00:00"),
+    (datetime(2018, 8, 1, 23), datetime(2018, 8, 4)),
+])
+def test_day_range_covers_every_day_up_to_the_last_one(first, last):
+    assert day_range({"first": first, "last": last}) == {"date_from": date(2018, 8, 1), "date_to": date(2018, 8, 5)}
+
+
+def test_saving_inbounds_refreshes_the_days_they_are_in(writer):
+    inbounds = [
+        {"slot_start_date": "2018-08-03 08:00:00", "slot_end_date": "2018-08-03 09:00:00", "dock_id": "1"},
+        {"slot_start_date": "2018-08-02 23:00:00", "slot_end_date": "2018-08-03 00:00:00", "dock_id": "2"},
+    ]
+
+    assert scheduler.save_inbound_to_db(inbounds) == 2
+    assert refreshes(writer) == [{"date_from": date(2018, 8, 2), "date_to": date(2018, 8, 4)}]
+
+
+def test_saving_nothing_refreshes_nothing(writer):
+    assert scheduler.save_inbound_to_db([]) == 0
+    assert refreshes(writer) == []
+
+
+def test_dock_upload_refreshes_the_days_of_its_slots(writer, monkeypatch):
+    monkeypatch.setattr(scheduler, "result_cache", None)
+    content = (
+        b"dock_id,slot_start_dt,slot_end_dt,capacity\n"
+        b"1,2018-08-05 22:00:00,2018-08-05 23:00:00,100\n"
+        b"1,2018-08-01 00:00:00,2018-08-01 01:00:00,100\n"
+    )
+
+    assert scheduler.docks_from_csv_to_db(content) == 2
+    assert refreshes(writer) == [{"date_from": date(2018, 8, 1), "date_to": date(2018, 8, 6)}]
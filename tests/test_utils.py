@@ -0,0 +1,122 @@
+import os
+
+import pytest
+
+import utils
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """SQLite file standing in for MySQL, with a fresh set of engines for this test"""
+    monkeypatch.setattr(utils, "_engines", {})
+    monkeypatch.setattr(utils, "_engines_pid", None)
+    url = "sqlite:///{}".format(tmp_path / "po_scheduler.db")
+
+    yield url
+
+    utils.dispose_engines()
+
+
+def test_engine_is_shared_by_the_whole_process(db, tmp_path):
+    engine = utils.get_engine(db)
+
+    assert utils.get_engine(db) is engine
+    assert utils.get_engine("sqlite:///{}".format(tmp_path / "other.db")) is not engine
+    assert engine.pool.size() == utils.DB_POOL_SIZE
+
+
+def test_forked_process_gets_a_pool_of_its_own(db, monkeypatch):
+    inherited = utils.get_engine(db)
+    disposed = []
+    monkeypatch.setattr(inherited, "dispose", lambda close=True: disposed.append(close))
+
+    # Same as a worker forked from this process
+    pid = os.getpid() + 1
+    monkeypatch.setattr(utils.os, "getpid", lambda: pid)
+    engine = utils.get_engine(db)
+
+    assert engine is not inherited
+    assert utils.get_engine(db) is engine
+
+    # Connections of the parent are left open for the parent
+    assert disposed == [False]
+
+
+def test_rows_come_as_dicts_with_bound_parameters(db):
+    with utils.get_engine(db).begin() as connection:
+        connection.exec_driver_sql("CREATE TABLE docks (dock_id TEXT, capacity INT)")
+        connection.exec_driver_sql("INSERT INTO docks VALUES ('1', 100), ('2', 250), ('3', 40)")
+
+    query = "SELECT dock_id, capacity FROM docks WHERE capacity > :least ORDER BY dock_id"
+
+    assert list(utils.get_results_as_dict_iter(query, db, {"least": 50})) == [
+        {"dock_id": "1", "capacity": 100},
+        {"dock_id": "2", "capacity": 250},
+    ]
+    assert list(utils.get_results_as_dict_iter(query, db, {"least": 50}, stream=True)) == [
+        {"dock_id": "1", "capacity": 100},
+        {"dock_id": "2", "capacity": 250},
+    ]
+
+    # Every connection went back to the pool
+    assert utils.get_engine(db).pool.checkedout() == 0
+
+
+class RecordingConnection:
+    """Keeps the statements and parameter batches a BulkWriter sends"""
+
+    def __init__(self):
+        self.statements = []
+
+    def execute(self, query, params=None):
+        self.statements.append((str(query), params))
+
+
+def writes():
+    return utils.DB_ROUND_TRIPS._values.get(("write",), 0)
+
+
+def test_rows_are_sent_in_batches_in_one_transaction(db):
+    with utils.get_engine(db).begin() as connection:
+        connection.exec_driver_sql("CREATE TABLE item_inbound (po_id TEXT, item_id TEXT, quantity INT)")
+
+    rows = ({"po_id": "1000", "item_id": str(n), "quantity": n, "ignored": True} for n in range(7))
+    before = writes()
+
+    with utils.bulk_writer(db, batch_size=3) as writer:
+        assert writer.insert("item_inbound", ("po_id", "item_id", "quantity"), rows) == 7
+
+    assert writer.rows_written == {"item_inbound": 7}
+    assert writes() - before == 3
+
+    rows = utils.get_results_as_dict_iter("SELECT * FROM item_inbound", db)
+    assert [row['quantity'] for row in rows] == list(range(7))
+
+
+def test_failed_write_rolls_back_the_whole_transaction(db):
+    with utils.get_engine(db).begin() as connection:
+        connection.exec_driver_sql("CREATE TABLE dock_slots (dock_id TEXT, capacity INT)")
+
+    with pytest.raises(utils.DBWriteError):
+        with utils.bulk_writer(db, batch_size=2) as writer:
+            writer.insert("dock_slots", ("dock_id", "capacity"), [{"dock_id": "1", "capacity": 5}] * 5)
+            writer.execute("UPDATE missing_table SET version = version + 1")
+
+    assert list(utils.get_results_as_dict_iter("SELECT * FROM dock_slots", db)) == []
+
+
+@pytest.mark.parametrize("options, suffix", [
+    ({}, "VALUES (:po_id, :quantity)"),
+    ({"ignore_duplicates": True}, "ON DUPLICATE KEY UPDATE po_id=po_id"),
+    ({"replace_duplicates": True}, "ON DUPLICATE KEY UPDATE po_id=VALUES(po_id), quantity=VALUES(quantity)"),
+])
+def test_duplicates_are_kept_or_replaced(options, suffix):
+    connection = RecordingConnection()
+    writer = utils.BulkWriter(connection, batch_size=10, local_infile=False)
+
+    writer.insert("po_scheduler.item_inbound", ("po_id", "quantity"), [{"po_id": "1", "quantity": 2}], **options)
+
+    [(query, params)] = connection.statements
+    assert query.startswith("INSERT INTO po_scheduler.item_inbound (po_id, quantity) VALUES (:po_id, :quantity)")
+    assert query.endswith(suffix)
+    assert params == [{"po_id": "1", "quantity": 2}]
@@ -0,0 +1,158 @@
+import json
+import os
+from contextlib import nullcontext
+
+import pytest
+
+import scheduler
+from benchmarks.generators import dock_rows, po_rows
+from benchmarks.stub_db import StubDB
+from run_output import MANIFEST, OutputRun
+
+
+@pytest.fixture
+def pos():
+    return list(po_rows(pos=120, lines=(1, 8), max_quantity=300, invalid_fraction=0.05, seed=3))
+
+
+@pytest.fixture
+def docks():
+    return list(dock_rows(docks=6, slots_per_day=6, days=4, seed=3))
+
+
+def read_run(output, name):
+    with open(os.path.join(output.path, name + ".csv"), newline='') as f:
+        return f.read()
+
+
+def one_shot(pos, docks, directory):
+    output = OutputRun(str(directory))
+
+    with StubDB(docks).installed():
+        outputs = scheduler.calculate_schedules(list(pos), list(docks), output=output)
+
+    return list(outputs), output
+
+
+def test_one_shot_schedule_which_isnt_saved_fails(pos, docks, tmp_path, monkeypatch):
+    monkeypatch.setattr(scheduler, "save_inbound_to_db", lambda *args: False)
+    output = OutputRun(str(tmp_path))
+
+    with pytest.raises(scheduler.ScheduleNotSavedError):
+        scheduler.calculate_schedules(list(pos), list(docks), output=output)
+
+    with open(os.path.join(output.path, MANIFEST)) as f:
+        assert json.load(f)['status'] == "failed"
+
+    # Files only have what made it to db
+    assert not os.path.exists(os.path.join(output.path, scheduler.INBOUND_FILE + ".csv"))
+
+
+@pytest.mark.parametrize("window", [3600, 4 * 3600, 24 * 3600, 30 * 24 * 3600])
+def test_windowed_schedule_is_the_same_as_one_shot(pos, docks, window, tmp_path):
+    expected, expected_output = one_shot(pos, docks, tmp_path / "one_shot")
+    windows = []
+    output = OutputRun(str(tmp_path / "windowed"))
+
+    with StubDB(docks).installed():
+        summary = scheduler.calculate_schedules_windowed(
+            list(pos), list(docks), window=window, output=output,
+            on_window=lambda outputs, performances: windows.append(list(outputs))
+        )
+
+    assert [row for rows in windows for row in rows] == expected
+    assert summary['inbounded'] == summary['saved'] == len(expected)
+    assert summary['failed_windows'] == 0
+
+    for name in (scheduler.INBOUND_FILE, scheduler.PERFORMANCE_FILE, scheduler.REJECTED_FILE):
+        assert read_run(output, name) == read_run(expected_output, name)
+
+
+def test_windowed_schedule_stops_at_the_first_window_which_isnt_saved(pos, docks, tmp_path, monkeypatch):
+    saves = []
+
+    def save(outputs, performances=(), dock_group=""):
+        saves.append(len(outputs))
+        return False if len(saves) == 2 else len(outputs)
+
+    monkeypatch.setattr(scheduler, "save_inbound_to_db", save)
+    output = OutputRun(str(tmp_path))
+    summary = scheduler.calculate_schedules_windowed(list(pos), list(docks), window=24 * 3600, output=output)
+
+    assert len(saves) == 2
+    assert summary['windows'] == 1
+    assert summary['failed_windows'] == 1
+    assert summary['saved'] == summary['inbounded'] == saves[0]
+    assert summary['unsaved'] == saves[1]
+
+    # Files only have what made it to db
+    assert read_run(output, scheduler.INBOUND_FILE).count("\n") == saves[0] + 1
+
+
+def test_uploads_with_long_calendars_are_scheduled_window_by_window(pos, docks, tmp_path, monkeypatch):
+    expected, expected_output = one_shot(pos, docks, tmp_path / "one_shot")
+    saves = []
+
+    monkeypatch.setattr(scheduler, "result_cache", None)
+    monkeypatch.setattr(scheduler, "named_lock", lambda *args: nullcontext())
+    monkeypatch.setattr(scheduler, "get_dock_slots_version", lambda: "1")
+    monkeypatch.setattr(scheduler, "get_scheduling_slots", lambda version=None: scheduler.arrange_slots(docks))
+    monkeypatch.setattr(
+        scheduler, "save_inbound_to_db", lambda outputs, *args: saves.append(len(outputs)) or len(outputs)
+    )
+    monkeypatch.setattr(scheduler, "SCHEDULE_WINDOW", 24 * 3600)
+    monkeypatch.setattr(scheduler, "WINDOWED_MIN_SPAN", 2 * 24 * 3600)
+
+    output = OutputRun(str(tmp_path / "upload"))
+    outputs, performances, rejected = scheduler.schedule_upload(list(pos), output=output)
+
+    assert list(outputs) == expected
+    assert len(saves) == 4
+    assert output.info['summary']['windows'] == 4
+    assert read_run(output, scheduler.INBOUND_FILE) == read_run(expected_output, scheduler.INBOUND_FILE)
+
+
+def test_upload_with_a_window_which_isnt_saved_fails(pos, docks, tmp_path, monkeypatch):
+    saves = []
+
+    def save(outputs, *args):
+        saves.append(len(outputs))
+        return False if len(saves) == 2 else len(outputs)
+
+    monkeypatch.setattr(scheduler, "result_cache", None)
+    monkeypatch.setattr(scheduler, "named_lock", lambda *args: nullcontext())
+    monkeypatch.setattr(scheduler, "get_dock_slots_version", lambda: "1")
+    monkeypatch.setattr(scheduler, "get_scheduling_slots", lambda version=None: scheduler.arrange_slots(docks))
+    monkeypatch.setattr(scheduler, "save_inbound_to_db", save)
+    monkeypatch.setattr(scheduler, "SCHEDULE_WINDOW", 24 * 3600)
+    monkeypatch.setattr(scheduler, "WINDOWED_MIN_SPAN", 2 * 24 * 3600)
+
+    output = OutputRun(str(tmp_path))
+
+    with pytest.raises(scheduler.ScheduleNotSavedError, match="couldn't be saved"):
+        scheduler.schedule_upload(list(pos), output=output)
+
+    with open(os.path.join(output.path, MANIFEST)) as f:
+        manifest = json.load(f)
+
+    assert manifest['status'] == "failed"
+    assert manifest['info']['summary']['failed_windows'] == 1
+    assert manifest['info']['summary']['unsaved'] == saves[1]
+
+
+@pytest.mark.parametrize("seed", [42, 63, 128, 147])
+def test_docks_missing_from_a_window_still_fit_into_its_output(seed, tmp_path):
+    # Docks left out of later slots keep what is left of their capacity and POs bound to them go on filling it.
+    # Those rows have to fit into the output of the window as well.
+    pos = list(po_rows(pos=15, lines=(1, 4), max_quantity=40, seed=seed))
+    docks = list(dock_rows(docks=4, slots_per_day=24, days=1, capacity=(0, 60), missing_fraction=0.6, seed=seed))
+    expected, expected_output = one_shot(pos, docks, tmp_path / "one_shot")
+    windows = []
+
+    with StubDB(docks).installed():
+        scheduler.calculate_schedules_windowed(
+            list(pos), list(docks), window=3600, output=OutputRun(str(tmp_path / "windowed")),
+            on_window=lambda outputs, performances: windows.append(list(outputs))
+        )
+
+    assert [row for rows in windows for row in rows] == expected